@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+
+# Benchmarks run headless, they are started from root of repo: python -m benchmarks
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from filesocket.config import store_keeper
+
+import src.file_system_widget
+import src.search_index
+from src.transfer_journal import journal
+from benchmarks.cases import CASES
+
+
+RESULTS_DIR = Path("benchmarks/results")
+
+
+def _commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+    return commit + ("-dirty" if dirty else "")
+
+
+# Files which app keeps in working dir are moved to temp dir, crawler would only add noise
+def _isolate(temp_dir: str) -> None:
+    store_keeper.config_file = os.path.join(temp_dir, "config.json")
+    store_keeper.init()
+    journal.journal_file = os.path.join(temp_dir, "transfers.json")
+    src.search_index.SEARCH_INDEX_FILE = os.path.join(temp_dir, "index_{}.db")
+    src.file_system_widget.CRAWL_ENABLED = False
+
+
+def run(cases: list, repeat: int) -> dict:
+    app = QApplication(sys.argv)
+    samples = dict()
+    with TemporaryDirectory() as temp_dir:
+        _isolate(temp_dir)
+        for name in cases:
+            for _ in range(repeat):
+                for step, seconds in CASES[name](app).items():
+                    samples.setdefault(step, []).append(seconds)
+    return {step: median(values) for step, values in samples.items()}
+
+
+# Steps slower than reference by more than threshold are regressions
+def compare(results: dict, reference: dict, threshold: float) -> bool:
+    regressed = False
+    for step, seconds in results.items():
+        if step not in reference:
+            print(f"{step:28} {seconds * 1000:10.1f} ms {'new':>12}")
+            continue
+        change = seconds / reference[step] - 1 if reference[step] else 0.0
+        mark = " REGRESSION" if change > threshold else ""
+        regressed |= change > threshold
+        print(f"{step:28} {seconds * 1000:10.1f} ms {reference[step] * 1000:10.1f} ms {change:+8.1%}{mark}")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks of FileSocketGUI")
+    parser.add_argument("cases", nargs="*", help=f"cases to run, all by default: {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every case, median is saved")
+    parser.add_argument("--compare", help="commit or results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 is 20%%")
+    args = parser.parse_args()
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    reference = None
+    if args.compare is not None:
+        reference_file = Path(args.compare)
+        if not reference_file.exists():
+            reference_file = RESULTS_DIR / f"{args.compare}.json"
+        reference = json.loads(reference_file.read_text())
+
+    results = run(args.cases or list(CASES), args.repeat)
+    commit = _commit()
+    # Results of cases which were not run now are kept
+    output = RESULTS_DIR / f"{commit}.json"
+    saved = json.loads(output.read_text())["results"] if output.exists() else dict()
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"commit": commit, "date": datetime.now().isoformat(timespec="seconds"),
+                                  "results": saved | results}, indent=2))
+
+    regressed = False
+    if reference is None:
+        for step, seconds in results.items():
+            print(f"{step:28} {seconds * 1000:10.1f} ms")
+    else:
+        print(f"{commit} against {reference['commit']}")
+        regressed = compare(results, reference["results"], args.threshold)
+    print(f"Saved to {output}")
+    if regressed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import logging
+from time import perf_counter, sleep
+from typing import Callable, Dict
+
+from PyQt6.QtWidgets import QApplication, QWidget, QProgressBar, QLabel
+from filesocket import PCEntity
+from filesocket.config import store_keeper
+
+from benchmarks.fake_client import FakeClient
+from src.file_system_model import NodeState
+from src.task_thread import TaskThread
+
+
+# Every case takes running application and returns seconds of each measured step
+
+Results = Dict[str, float]
+
+
+class Host(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger('gui')
+        self.resize(800, 600)
+
+
+def wait(app: QApplication, condition: Callable[[], bool], timeout: float = 120) -> None:
+    deadline = perf_counter() + timeout
+    while not condition():
+        if perf_counter() > deadline:
+            raise TimeoutError("Benchmark step did not finish")
+        app.processEvents()
+        sleep(0.0005)
+
+
+def _file_system(app: QApplication, client: FakeClient):
+    from src.file_system_widget import FileSystemWidget
+
+    host = Host()
+    widget = FileSystemWidget(host, client)
+    widget.resize(host.size())
+    host.show()
+    wait(app, lambda: widget.root.state == NodeState.LOADED)
+    return host, widget
+
+
+def _listing(size: int) -> tuple:
+    dirs = [{"name": f"dir_{i}", "size": 0, "modification_time": 1.7e9 + i} for i in range(size // 10)]
+    files = [{"name": f"file_{i}.txt", "size": 1000 * i, "modification_time": 1.7e9 - i}
+             for i in range(size - size // 10)]
+    return dirs, files
+
+
+# Import of ready listing into model and drawing of tree
+def import_data(app: QApplication) -> Results:
+    host, widget = _file_system(app, FakeClient())
+    results = dict()
+    node = widget.root.child(0)
+    for size in (1000, 10000, 100000):
+        dirs, files = _listing(size)
+        started = perf_counter()
+        widget.import_data(node, dirs, files)
+        app.processEvents()
+        results[f"import_data_{size}"] = perf_counter() - started
+    host.close()
+    return results
+
+
+# Expanding of directory from request to shown listing, client answers with latency of real network
+def load_tree_widget(app: QApplication) -> Results:
+    host, widget = _file_system(app, FakeClient(latency=0.02, bandwidth=10 * 2 ** 20, files_per_dir=1000))
+    disk = widget.root.child(0)
+    widget.load_tree_widget(disk)
+    wait(app, lambda: disk.state == NodeState.LOADED)
+    durations = []
+    for row in range(10):
+        node = disk.child(row)
+        started = perf_counter()
+        widget.load_tree_widget(node)
+        wait(app, lambda: node.state == NodeState.LOADED)
+        durations.append(perf_counter() - started)
+    host.close()
+    return {"load_tree_widget": sum(durations) / len(durations)}
+
+
+class _BenchTask(TaskThread):
+    def execute(self) -> None:
+        self.report_progress(2 ** 20, 2 ** 20)
+        self.task_complete.emit(self.id)
+
+
+# Thousands of short tasks going through scheduler and progress area
+def taskbar(app: QApplication) -> Results:
+    from src.taskbar_processor import TaskbarProcessor
+
+    host = Host()
+    processor = TaskbarProcessor(host, QProgressBar(host), QLabel(host))
+    host.show()
+    results = dict()
+    for count in (1000, 5000):
+        started = perf_counter()
+        for _ in range(count):
+            processor.add_thread(_BenchTask(host))
+        results[f"taskbar_submit_{count}"] = perf_counter() - started
+        wait(app, lambda: not processor.threads)
+        results[f"taskbar_{count}"] = perf_counter() - started
+    host.close()
+    return results
+
+
+# PC list with many PCs, availability of every PC is probed by fake client
+def choose_pc(app: QApplication) -> Results:
+    import src.choose_pc_dialog as choose_pc_dialog
+    from src.online_checker import OnlineChecker
+
+    all_pc = tuple(PCEntity(i, f"PC {i}") for i in range(2000))
+    choose_pc_dialog.show_all_pc = lambda: all_pc
+    probe_client = FakeClient(latency=0.001)
+    OnlineChecker._check_online = staticmethod(lambda pc: probe_client.check_online())
+
+    # Every run probes all PCs
+    store_keeper.add_value("online_cache", dict())
+    host = Host()
+    started = perf_counter()
+    dialog = choose_pc_dialog.ChoosePCDialog(host)
+    loaded = perf_counter() - started
+    wait(app, lambda: dialog.online_checker.pending == 0)
+    checked = perf_counter() - started
+    dialog.done(0)
+    host.close()
+    return {"choose_pc_load_table": loaded, "choose_pc_all_checked": checked}
+
+
+CASES = {
+    "import_data": import_data,
+    "load_tree_widget": load_tree_widget,
+    "taskbar": taskbar,
+    "choose_pc": choose_pc,
+}
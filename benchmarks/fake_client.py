@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+from time import sleep
+
+from filesocket import ServerError
+
+
+# Stand-in for ManagingClient which answers from generated tree instead of remote PC.
+# Every answer waits latency plus its size divided by bandwidth, like it came over network.
+# Directory on depth below max_depth has dirs_per_dir subdirectories, every directory has files_per_dir files
+class FakeClient:
+    def __init__(self, device_id: str = "bench", latency: float = 0.0, bandwidth: float | None = None,
+                 dirs_per_dir: int = 10, files_per_dir: int = 100, max_depth: int = 3, disks: int = 2):
+        self.device_id = device_id
+        self.default_header = dict()
+        self.device_ngrok_ip = "http://fake"
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.dirs_per_dir = dirs_per_dir
+        self.files_per_dir = files_per_dir
+        self.max_depth = max_depth
+        self.disks = disks
+        self.requests = 0
+
+    def _answer(self, answer):
+        self.requests += 1
+        delay = self.latency
+        if self.bandwidth:
+            delay += len(json.dumps(answer)) / self.bandwidth
+        if delay > 0:
+            sleep(delay)
+        return answer
+
+    def list_files(self, path: Path | str) -> dict:
+        parts = [part for part in str(path).replace('\\', '/').split('/') if part]
+        depth = len(parts) - 1
+        if not parts or not parts[0].endswith(':') or depth > self.max_depth:
+            raise ServerError("404 Path not found")
+        dirs = [{"name": f"dir_{i}", "size": 0, "modification_time": 1.7e9 + i}
+                for i in range(self.dirs_per_dir if depth < self.max_depth else 0)]
+        files = [{"name": f"file_{i}.txt", "size": 1000 * i, "modification_time": 1.7e9 - i}
+                 for i in range(self.files_per_dir)]
+        return self._answer({"dirs": dirs, "files": files})
+
+    # Only commands which are sent on listing of root are known
+    def cmd_command(self, command: str) -> dict:
+        if 'wmic' in command and 'logicaldisk' in command:
+            names = ''.join(f"{chr(ord('C') + i)}:  \r\n" for i in range(self.disks))
+            return self._answer({"out": f"Name  \r\n{names}\r\n"})
+        return self._answer({"out": ""})
+
+    def check_online(self) -> bool:
+        return self._answer(True)
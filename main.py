@@ -1,19 +1,24 @@
+from time import perf_counter
+
+# Taken before other imports, so startup breakdown includes them
+STARTED = perf_counter()
+
 import logging
 import sys
 from logging.config import dictConfig
 
-import darkdetect
-from typing import Tuple
-from PyQt6 import uic
-from PyQt6.QtWidgets import QMainWindow, QApplication
-from qt_material import apply_stylesheet
-from filesocket import CONFIG_FILE, LOGGER_CONFIG, ManagingClient, ServerError
-from filesocket.storekeeper import Storekeeper
+from typing import Tuple, List
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QMainWindow, QApplication, QToolButton, QWidget, QHBoxLayout
+from filesocket import LOGGER_CONFIG
+from filesocket.config import store_keeper
 
+from src.bandwidth import shaper
 from src.choose_pc_dialog import ChoosePCDialog
-from src.console_widget import ConsoleWidget
-from src.file_system_widget import FileSystemWidget
+from src.client_pool import ClientPool
+from src.config import CLOSE_POLL_INTERVAL
 from src.signin_dialog import SigninDialog
+from src.ui_loader import load_ui
 
 
 LOGGER_CONFIG['loggers']['gui'] = {
@@ -24,37 +29,85 @@ LOGGER_CONFIG['loggers']['gui'] = {
         }
 
 
+# Durations of startup stages, they are logged at DEBUG when root of first PC is listed
+class StartupTimer:
+    def __init__(self, started: float):
+        self.started = started
+        self.last = started
+        self.stages: List[Tuple[str, float]] = []
+
+    def mark(self, stage: str) -> None:
+        now = perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def report(self, logger: logging.Logger) -> None:
+        stages = ', '.join(f"{stage} {duration * 1000:.0f} ms" for stage, duration in self.stages)
+        logger.debug(f"Startup: {stages}, total {(self.last - self.started) * 1000:.0f} ms")
+
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup_timer: StartupTimer):
         super().__init__()
 
         self.logger = logging.getLogger('gui')
         self.logger.info("Booting")
-        self.signin()
-        self.logger.info("Signed in")
-
-        pc_id, device_secure_token = self.choose_pc()
-        self.logger.info(f"Trying to connect to {pc_id}")
-        device_secure_token = self.get_device_secure_token(pc_id, device_secure_token)
-        self.client = ManagingClient(pc_id, device_secure_token)
-        try:
-            self.client.run(False)
-        except ServerError:
-            sys.exit()
-        self.logger.info("Connected")
-
-        uic.loadUi("res/ui/main_window.ui", self)
-        self.setup_tabs()
-        self.logger.info("Loaded all tabs")
+        self.startup_timer = startup_timer
+        self.client_pool = ClientPool()
+        shaper.load()
+
+        load_ui("main_window", self)
+        self.tabWidget.tabCloseRequested.connect(self.close_pc)
+        # Items of one PC are dropped on tree of other one, its tab is opened while they are dragged over it
+        self.tabWidget.tabBar().setChangeCurrentOnDrag(True)
+        self.tabWidget.tabBar().setAcceptDrops(True)
+        corner = QWidget(self)
+        corner_layout = QHBoxLayout(corner)
+        corner_layout.setContentsMargins(0, 0, 0, 0)
+        diagnostics_button = QToolButton(corner)
+        diagnostics_button.setText("Diagnostics")
+        diagnostics_button.setToolTip("Timings of remote operations")
+        diagnostics_button.clicked.connect(self.show_diagnostics)
+        corner_layout.addWidget(diagnostics_button)
+        bandwidth_button = QToolButton(corner)
+        bandwidth_button.setText("Bandwidth")
+        bandwidth_button.setToolTip("Limits of transfer speed")
+        bandwidth_button.clicked.connect(self.show_bandwidth)
+        corner_layout.addWidget(bandwidth_button)
+        add_button = QToolButton(corner)
+        add_button.setText("+")
+        add_button.setToolTip("Open another PC")
+        add_button.clicked.connect(self.add_pc)
+        corner_layout.addWidget(add_button)
+        self.tabWidget.setCornerWidget(corner)
+        self.diagnostics = None
+        self.bandwidth = None
+        # Tabs which are closed but still have running tasks
+        self.closing = []
+        self.close_timer = QTimer(self)
+        self.close_timer.setInterval(CLOSE_POLL_INTERVAL)
+        self.close_timer.timeout.connect(self._delete_closed)
         self.show()
+        self.startup_timer.mark("main window")
 
         # TODO: UI of scripts tab
 
         # TODO: Realisation of scripts tab backend
 
+    # Dialogs are shown over window which is already open
+    def start(self) -> None:
+        self.signin()
+        self.logger.info("Signed in")
+        self.startup_timer.mark("sign in")
+        pc = self.choose_pc()
+        if pc is None:
+            self.logger.info("Closing")
+            sys.exit()
+        self.startup_timer.mark("choose PC")
+        self.open_pc(*pc)
+
     # Sign in and sign up
     def signin(self) -> None:
-        store_keeper = Storekeeper(LOGGER_CONFIG, CONFIG_FILE)
         state = 1
         while not store_keeper.get_token() and state:
             window = SigninDialog(self)
@@ -63,17 +116,81 @@ class MainWindow(QMainWindow):
             self.logger.info("Closing")
             sys.exit()
 
-    # Choose PC to connect
-    def choose_pc(self) -> Tuple[int, str] | Tuple[int, None]:
-        result = ChoosePCDialog(self).execute()
+    # Choose PC to connect, None if user closed dialog
+    def choose_pc(self) -> Tuple[int, str | None, str] | None:
+        dialog = ChoosePCDialog(self)
+        result = dialog.execute()
         if result is None:
-            self.logger.info("Closing")
-            sys.exit()
-        return result
+            return None
+        return *result, dialog.device_name
+
+    def add_pc(self) -> None:
+        pc = self.choose_pc()
+        if pc is not None:
+            self.open_pc(*pc)
+
+    # PC which is already opened is only switched to. Connections are shared through pool, client
+    # connects on first request, so tab is shown at once and its root is listed in background
+    def open_pc(self, pc_id: int, device_secure_token: str | None, name: str) -> None:
+        # File system and console modules are imported when first PC is opened, after window is shown
+        from src.pc_widget import PCWidget
+
+        for i in range(self.tabWidget.count()):
+            if str(self.tabWidget.widget(i).client.device_id) == str(pc_id):
+                self.tabWidget.setCurrentIndex(i)
+                return
+        self.logger.info(f"Opening {pc_id}")
+        device_secure_token = self.get_device_secure_token(pc_id, device_secure_token)
+        tab = PCWidget(self, self.client_pool.get(pc_id, device_secure_token))
+        self.tabWidget.setCurrentIndex(self.tabWidget.addTab(tab, name))
+        self.logger.info("Loaded all tabs")
+        if self.startup_timer is not None:
+            self.startup_timer.mark("PC tabs")
+            tab.file_system.root_listed.connect(self._on_first_root_listed)
+
+    def _on_first_root_listed(self) -> None:
+        if self.startup_timer is None:
+            return
+        self.startup_timer.mark("connection and root listing")
+        self.startup_timer.report(self.logger)
+        self.startup_timer = None
+
+    def show_diagnostics(self) -> None:
+        from src.diagnostics_dialog import DiagnosticsDialog
+
+        if self.diagnostics is None:
+            self.diagnostics = DiagnosticsDialog(self)
+        self.diagnostics.show()
+        self.diagnostics.raise_()
+
+    def show_bandwidth(self) -> None:
+        from src.bandwidth_dialog import BandwidthDialog
+
+        if self.bandwidth is None:
+            self.bandwidth = BandwidthDialog(self)
+        self.bandwidth.show()
+        self.bandwidth.raise_()
+
+    # Tasks of tab emit signals on its objects, so tab is deleted only when they are finished
+    def close_pc(self, index: int) -> None:
+        widget = self.tabWidget.widget(index)
+        self.tabWidget.removeTab(index)
+        widget.shutdown()
+        self.client_pool.release(widget.client.device_id)
+        self.closing.append(widget)
+        self._delete_closed()
+
+    def _delete_closed(self) -> None:
+        for widget in [widget for widget in self.closing if widget.is_idle()]:
+            self.closing.remove(widget)
+            widget.deleteLater()
+        if self.closing:
+            self.close_timer.start()
+        else:
+            self.close_timer.stop()
 
     # Get secure token from storekeeper
     def get_device_secure_token(self, pc_id: int, secure_token: str | None) -> str | None:
-        store_keeper = Storekeeper(LOGGER_CONFIG, CONFIG_FILE)
         try:
             secure_tokens = store_keeper.get_value("secure_token")
         except KeyError:
@@ -87,25 +204,30 @@ class MainWindow(QMainWindow):
     # Add new secure token to storekeeper
     @staticmethod
     def set_device_secure_token(pc_id: int, secure_token: str) -> None:
-        store_keeper = Storekeeper(LOGGER_CONFIG, CONFIG_FILE)
         secure_tokens = store_keeper.get_value("secure_token")
         secure_tokens[str(pc_id)] = secure_token
         store_keeper.add_value("secure_token", secure_tokens)
 
-    def setup_tabs(self) -> None:
-        tab_1 = FileSystemWidget(self, self.client)
-        self.tabWidget.addTab(tab_1, "File System")
-        tab_2 = ConsoleWidget(self, self.client)
-        self.tabWidget.addTab(tab_2, "Console")
 
+# Theme modules take noticeable time to import, so they are loaded only here
+def apply_theme(app: QApplication) -> None:
+    import darkdetect
+    from qt_material import apply_stylesheet
 
-if __name__ == "__main__":
-    dictConfig(LOGGER_CONFIG)
-    app = QApplication(sys.argv)
     if darkdetect.isLight():
         apply_stylesheet(app, theme="light_red_500.xml")
     else:
         apply_stylesheet(app, theme="dark_lightgreen.xml")
 
-    window = MainWindow()
+
+if __name__ == "__main__":
+    dictConfig(LOGGER_CONFIG)
+    startup_timer = StartupTimer(STARTED)
+    startup_timer.mark("imports")
+    app = QApplication(sys.argv)
+    apply_theme(app)
+    startup_timer.mark("theme")
+
+    window = MainWindow(startup_timer)
+    window.start()
     sys.exit(app.exec())
@@ -0,0 +1,159 @@
+from datetime import datetime
+from threading import Condition
+from time import monotonic
+from typing import Dict, List
+
+from filesocket.config import store_keeper
+
+from src.config import BANDWIDTH_BURST, BANDWIDTH_FLOW_IDLE, BANDWIDTH_RECHECK
+
+
+# Token bucket rate limiting of transfers. Every transfer is a flow with its own bucket for per-transfer limit,
+# all flows share global bucket. Global bandwidth is shared fairly: of flows which may send, the one which
+# was served least bytes goes first, so transfer with many streams gets no more than transfer with one.
+# Limits are in bytes per second, 0 is unlimited. Rule of schedule replaces limits within its hours
+
+# (start "HH:MM", end "HH:MM", global limit, per-transfer limit), end before start goes over midnight
+ScheduleRule = list
+
+
+class TokenBucket:
+    def __init__(self, rate: float = 0):
+        self.rate = rate
+        self.tokens = 0.0
+        self.updated = monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.rate * BANDWIDTH_BURST)
+        self.updated = now
+
+    def set_rate(self, rate: float, now: float) -> None:
+        self._refill(now)
+        self.rate = rate
+        self.tokens = min(self.tokens, rate * BANDWIDTH_BURST)
+
+    # Seconds until bucket has no debt. Chunk may be bigger than burst, so it is taken on credit
+    def delay(self, now: float) -> float:
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def take(self, count: int, now: float) -> None:
+        if self.rate:
+            self._refill(now)
+            self.tokens -= count
+
+
+class _Flow:
+    def __init__(self, rate: float, served: float):
+        self.bucket = TokenBucket(rate)
+        self.served = served
+        self.waiting = 0
+        self.last = monotonic()
+
+
+def _minutes(time: str) -> int:
+    hours, minutes = time.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _rule_active(rule: ScheduleRule, now: datetime) -> bool:
+    start, end = _minutes(rule[0]), _minutes(rule[1])
+    minute = now.hour * 60 + now.minute
+    return start <= minute < end if start <= end else minute >= start or minute < end
+
+
+class BandwidthShaper:
+    def __init__(self):
+        self.condition = Condition()
+        self.global_limit = 0
+        self.transfer_limit = 0
+        self.schedule: List[ScheduleRule] = []
+        self.bucket = TokenBucket()
+        self.flows: Dict[str, _Flow] = dict()
+        # Served bytes of last flow which went, new flows start from it
+        self.virtual = 0.0
+        self.limited = False
+
+    # Limits saved by user, kept in config like other settings
+    def load(self) -> None:
+        try:
+            settings = store_keeper.get_value("bandwidth")
+        except KeyError:
+            return
+        self.configure(settings.get("global", 0), settings.get("transfer", 0), settings.get("schedule", []))
+
+    def save(self) -> None:
+        store_keeper.add_value("bandwidth", {"global": self.global_limit, "transfer": self.transfer_limit,
+                                             "schedule": self.schedule})
+
+    def configure(self, global_limit: int, transfer_limit: int, schedule: List[ScheduleRule]) -> None:
+        with self.condition:
+            self.global_limit = global_limit
+            self.transfer_limit = transfer_limit
+            self.schedule = [list(rule) for rule in schedule]
+            self.limited = bool(global_limit or transfer_limit or schedule)
+            self._apply_limits(monotonic())
+            self.condition.notify_all()
+
+    # Limits in force now, with schedule applied
+    def current_limits(self) -> tuple:
+        now = datetime.now()
+        for rule in self.schedule:
+            if _rule_active(rule, now):
+                return rule[2], rule[3]
+        return self.global_limit, self.transfer_limit
+
+    def _apply_limits(self, now: float) -> None:
+        global_limit, transfer_limit = self.current_limits()
+        if self.bucket.rate != global_limit:
+            self.bucket.set_rate(global_limit, now)
+        for flow in self.flows.values():
+            if flow.bucket.rate != transfer_limit:
+                flow.bucket.set_rate(transfer_limit, now)
+
+    def _flow(self, key: str, now: float) -> _Flow:
+        flow = self.flows.get(key)
+        if flow is None:
+            for other in [other for other, value in self.flows.items()
+                          if not value.waiting and now - value.last > BANDWIDTH_FLOW_IDLE]:
+                del self.flows[other]
+            flow = self.flows[key] = _Flow(self.current_limits()[1], self.virtual)
+        return flow
+
+    # Waiting flow which may send and was served least, ties are broken by key
+    def _next_flow(self, now: float) -> _Flow | None:
+        ready = [(flow.served, key) for key, flow in self.flows.items()
+                 if flow.waiting and flow.bucket.delay(now) <= 0]
+        return self.flows[min(ready)[1]] if ready else None
+
+    # Blocks until transfer may send or has received count bytes, called after every chunk.
+    # Without limits in force now, e.g. outside of scheduled hours, chunk doesn't wait for lock
+    def acquire(self, key: str, count: int) -> None:
+        if not self.limited or self.current_limits() == (0, 0):
+            return
+        with self.condition:
+            now = monotonic()
+            flow = self._flow(key, now)
+            flow.waiting += 1
+            try:
+                while True:
+                    self._apply_limits(now)
+                    delay = max(flow.bucket.delay(now), self.bucket.delay(now))
+                    if delay <= 0 and self._next_flow(now) is flow:
+                        break
+                    self.condition.wait(min(delay or BANDWIDTH_RECHECK, BANDWIDTH_RECHECK))
+                    now = monotonic()
+                flow.bucket.take(count, now)
+                self.bucket.take(count, now)
+                self.virtual = max(self.virtual, flow.served)
+                flow.served += count
+                flow.last = now
+            finally:
+                flow.waiting -= 1
+                self.condition.notify_all()
+
+
+shaper = BandwidthShaper()
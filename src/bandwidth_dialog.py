@@ -0,0 +1,75 @@
+import re
+
+from PyQt6.QtWidgets import QDialog, QWidget, QTableWidgetItem
+
+from src.bandwidth import shaper
+from src.taskbar_processor import readable_size
+from src.ui_loader import load_ui
+
+
+COLUMNS = ("From", "To", "All transfers, KB/s", "Each transfer, KB/s")
+TIME_PATTERN = re.compile(r"([01]?\d|2[0-3]):[0-5]\d")
+
+
+def _readable_limit(limit: int) -> str:
+    return f"{readable_size(limit)}/s" if limit else "unlimited"
+
+
+# Limits of transfers, every change is applied to running transfers at once and saved
+class BandwidthDialog(QDialog):
+    def __init__(self, parent: QWidget):
+        super().__init__(parent)
+        load_ui("bandwidth_dialog", self)
+        self.schedule.setColumnCount(len(COLUMNS))
+        self.schedule.setHorizontalHeaderLabels(COLUMNS)
+        self.globalLimit.setValue(shaper.global_limit // 1024)
+        self.transferLimit.setValue(shaper.transfer_limit // 1024)
+        for rule in shaper.schedule:
+            self._add_row(rule[0], rule[1], rule[2] // 1024, rule[3] // 1024)
+
+        self.globalLimit.valueChanged.connect(self.apply)
+        self.transferLimit.valueChanged.connect(self.apply)
+        self.schedule.itemChanged.connect(self.apply)
+        self.addRule.clicked.connect(lambda: self._add_row("22:00", "07:00", 0, 0))
+        self.removeRule.clicked.connect(self.remove_rule)
+        self.show_current()
+
+    def _add_row(self, start: str, end: str, global_limit: int, transfer_limit: int) -> None:
+        self.schedule.blockSignals(True)
+        row = self.schedule.rowCount()
+        self.schedule.insertRow(row)
+        for column, value in enumerate((start, end, str(global_limit), str(transfer_limit))):
+            self.schedule.setItem(row, column, QTableWidgetItem(value))
+        self.schedule.blockSignals(False)
+        self.apply()
+
+    def remove_rule(self) -> None:
+        rows = sorted({index.row() for index in self.schedule.selectedIndexes()}, reverse=True)
+        for row in rows:
+            self.schedule.removeRow(row)
+        self.apply()
+
+    # Rows with wrong time or limit are skipped until they are fixed
+    def _rules(self) -> list:
+        rules = []
+        for row in range(self.schedule.rowCount()):
+            values = [self.schedule.item(row, column).text().strip() for column in range(len(COLUMNS))]
+            if not all(TIME_PATTERN.fullmatch(value) for value in values[:2]) or \
+                    not all(value.isdigit() for value in values[2:]):
+                continue
+            rules.append([values[0], values[1], int(values[2]) * 1024, int(values[3]) * 1024])
+        return rules
+
+    def apply(self) -> None:
+        shaper.configure(self.globalLimit.value() * 1024, self.transferLimit.value() * 1024, self._rules())
+        shaper.save()
+        self.show_current()
+
+    def show_current(self) -> None:
+        global_limit, transfer_limit = shaper.current_limits()
+        self.current.setText(f"Now: all transfers {_readable_limit(global_limit)}, "
+                             f"each transfer {_readable_limit(transfer_limit)}")
+
+    def showEvent(self, event) -> None:
+        self.show_current()
+        super().showEvent(event)
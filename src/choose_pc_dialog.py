@@ -1,47 +1,71 @@
 import sys
 from typing import Tuple
 
-from PyQt6 import uic
 from PyQt6.QtWidgets import QDialog, QPushButton, QListWidgetItem, QWidget
-from filesocket import show_all_pc, ManagingClient, ServerError, PCEntity
+from filesocket import show_all_pc, ServerError
+
+from src.online_checker import OnlineChecker
+from src.ui_loader import load_ui
 
 
 class ChoosePCDialog(QDialog):
     def __init__(self, parent: QWidget):
         super().__init__(parent)
-        uic.loadUi("res/ui/choose_pc_dialog.ui", self)
+        load_ui("choose_pc_dialog", self)
         self.device_id = None
+        self.device_name = None
+        self.buttons = dict()
+        self.items = dict()
+        self.online_checker = OnlineChecker(self)
+        self.online_checker.pc_checked.connect(self.set_availability)
+        self.finished.connect(self.online_checker.stop)
         self.load_table()
 
-    @staticmethod
-    def _check_online(pc: PCEntity) -> bool:
-        temp_client = ManagingClient(pc.id)
-        temp_client.run(False)
-        try:
-            return temp_client.check_online()
-        except ServerError:
-            return False
-
+    # Show all PCs at once, availability is filled in as probes come back
     def load_table(self) -> None:
         try:
             all_pc = show_all_pc()
         except ServerError:
             sys.exit()
-        availability = tuple(map(self._check_online, all_pc))
-        all_pc = list(zip(all_pc, availability))
-        all_pc.sort(key=lambda pc: pc[1], reverse=True)
-        for pc in all_pc:
-            button = QPushButton()
-            button.setObjectName(f"button_{pc[0].id}")
-            button.setText(pc[0].name)
-            button.setEnabled(pc[1])
-            item = QListWidgetItem(self.table)
-            self.table.addItem(item)
-            self.table.setItemWidget(item, button)
-            button.clicked.connect(self.open_connection)
+        self.availability = {pc.id: bool(self.online_checker.cached(pc.id)) for pc in all_pc}
+        self.order = [pc.id for pc in all_pc]
+        self.names = {pc.id: pc.name for pc in all_pc}
+        for pc_id in sorted(self.order, key=self._sort_key):
+            self._add_row(self.table.count(), pc_id)
+        self.online_checker.check(all_pc)
+
+    # Online PCs go first, otherwise order of server is kept
+    def _sort_key(self, pc_id: int) -> tuple:
+        return not self.availability[pc_id], self.order.index(pc_id)
+
+    def _add_row(self, row: int, pc_id: int) -> None:
+        button = QPushButton()
+        button.setObjectName(f"button_{pc_id}")
+        button.setText(self.names[pc_id])
+        button.setEnabled(self.availability[pc_id])
+        item = QListWidgetItem()
+        self.table.insertItem(row, item)
+        self.table.setItemWidget(item, button)
+        button.clicked.connect(self.open_connection)
+        self.buttons[pc_id] = button
+        self.items[pc_id] = item
+
+    # Row of PC which came online moves up to other online PCs, widget of moved row is created again
+    def set_availability(self, pc_id: int, online: bool) -> None:
+        if pc_id not in self.items:
+            return
+        self.availability[pc_id] = online
+        row = sorted(self.order, key=self._sort_key).index(pc_id)
+        if row == self.table.row(self.items[pc_id]):
+            self.buttons[pc_id].setEnabled(online)
+            return
+        self.table.takeItem(self.table.row(self.items.pop(pc_id)))
+        self.buttons.pop(pc_id).deleteLater()
+        self._add_row(row, pc_id)
 
     def open_connection(self):
         self.device_id = int(self.sender().objectName().removeprefix("button_"))
+        self.device_name = self.sender().text()
         self.accept()
 
     def execute(self) -> Tuple[int, str] | Tuple[int, None] | None:
@@ -0,0 +1,222 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from threading import Condition, Lock
+from typing import Dict, List, Set
+
+from PyQt6.QtCore import Qt
+from filesocket import ServerError, TokenRequired
+from filesocket.config import store_keeper
+
+from src.bandwidth import shaper
+from src.client_pool import PooledClient
+from src.command_batch import CommandBatch
+from src.config import PROGRESS_REFRESH_INTERVAL, SCHEDULER_WORKERS
+from src.task_scheduler import TaskScheduler
+from src.task_thread import TaskThread
+from src.threads import DownloadThread, UploadThread, DownloadDirThread, UploadDirThread, CommandBatchThread, \
+    ConsoleThread
+
+
+# Headless runner of operations on one PC: python -m src.cli --pc ID manifest.json
+# Operations go through same tasks and scheduler as in GUI, so they run concurrently and transfers are resumed,
+# cached and shaped the same way. Events are printed to stdout as JSON lines. No widgets are imported.
+# Manifest is JSON list of operations, "-" reads it from stdin:
+#   {"op": "get", "path": "C:/remote/file", "destination": "local/dir"}
+#   {"op": "put", "path": "local/file", "destination": "C:/remote/dir"}
+#   {"op": "delete", "path": "C:/remote/file"}
+#   {"op": "command", "command": "ipconfig /all"}
+# "dir" of get and delete tells whether remote path is folder, it is looked up when it is missing.
+# Failed transfers are dropped from journal, so GUI doesn't resume them, unless --resume is given.
+# Exit code is 0 when all operations succeeded, 1 when some failed and 2 when run couldn't start
+
+OPERATIONS = ("get", "put", "delete", "command")
+FAILED = 1
+NOT_STARTED = 2
+
+# Signals are emitted in worker threads and there is no event loop, so slots are called in them
+DIRECT = Qt.ConnectionType.DirectConnection
+
+
+class StartError(Exception):
+    pass
+
+
+def load_manifest(source: str) -> List[dict]:
+    try:
+        text = sys.stdin.read() if source == "-" else Path(source).read_text()
+        operations = json.loads(text)
+    except (OSError, ValueError) as e:
+        raise StartError(f"Can't read manifest: {e}")
+    if not isinstance(operations, list):
+        raise StartError("Manifest must be list of operations")
+    for number, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+            raise StartError(f"Operation {number}: op must be one of {', '.join(OPERATIONS)}")
+        key = "command" if operation["op"] == "command" else "path"
+        if not isinstance(operation.get(key), str):
+            raise StartError(f"Operation {number}: {key} is missing")
+    return operations
+
+
+def _remote_is_dir(client: PooledClient, path: Path) -> bool:
+    file_list = client.list_files(path.parent) or dict()
+    return any(directory['name'] == path.name for directory in file_list.get('dirs', []))
+
+
+class Runner:
+    def __init__(self, client: PooledClient, scheduler: TaskScheduler, resume: bool = False):
+        self.client = client
+        self.scheduler = scheduler
+        self.resume = resume
+        self.condition = Condition()
+        self.output_lock = Lock()
+        # Task id -> number of operation it belongs to, tasks found by folder walks belong to their walk
+        self.pending: Dict[int, TaskThread] = dict()
+        self.operations: Dict[int, int] = dict()
+        self.failed_tasks: Set[int] = set()
+        self.failed_operations: Set[int] = set()
+        self.reported: Dict[int, int] = dict()
+
+    def emit(self, event: str, **values) -> None:
+        with self.output_lock:
+            print(json.dumps({"event": event, **values}), flush=True)
+
+    def submit(self, number: int, operation: dict) -> None:
+        for task in self._tasks(operation):
+            self._track(task, number)
+
+    def _tasks(self, operation: dict) -> List[TaskThread]:
+        kind = operation["op"]
+        if kind == "command":
+            return [ConsoleThread(None, self.client, operation["command"])]
+        path = Path(operation["path"])
+        destination = Path(operation.get("destination", ""))
+        if kind == "put":
+            if path.is_dir():
+                return [UploadDirThread(None, self.client, path, destination)]
+            return [UploadThread(None, self.client, path, destination)]
+        is_dir = operation.get("dir")
+        if is_dir is None:
+            is_dir = _remote_is_dir(self.client, path)
+        if kind == "delete":
+            batch = CommandBatch()
+            batch.delete(path, is_dir)
+            return [CommandBatchThread(None, self.client, batch, f"delete {path}")]
+        if str(destination) != '.':
+            destination.mkdir(parents=True, exist_ok=True)
+        if is_dir:
+            return [DownloadDirThread(None, self.client, path, destination)]
+        return [DownloadThread(None, self.client, path, destination)]
+
+    def _track(self, task: TaskThread, number: int) -> None:
+        with self.condition:
+            self.pending[task.id] = task
+            self.operations[task.id] = number
+        task.task_started.connect(lambda task_id: self.emit("started", operation=number, task=task_id,
+                                                            kind=task.kind, name=task.name), DIRECT)
+        task.task_complete.connect(self._on_complete, DIRECT)
+        task.task_failed.connect(self._on_failed, DIRECT)
+        if hasattr(task, "task_found"):
+            task.task_found.connect(lambda found: self._on_found(found, number), DIRECT)
+        if isinstance(task, ConsoleThread):
+            task.output.connect(lambda text: self.emit("output", operation=number, task=task.id, text=text), DIRECT)
+            task.finished_with.connect(lambda exit_code: self._on_exit_code(task.id, exit_code), DIRECT)
+        if isinstance(task, CommandBatchThread):
+            task.batch_done.connect(lambda results: all(results) or self._fail(task.id, "Path was not deleted"),
+                                    DIRECT)
+        self.scheduler.submit(task)
+
+    def _on_found(self, found: tuple, number: int) -> None:
+        thread_class, *args = found
+        self._track(thread_class(None, self.client, *args), number)
+
+    def _on_exit_code(self, task_id: int, exit_code: int | None) -> None:
+        self.emit("exit_code", operation=self.operations[task_id], task=task_id, exit_code=exit_code)
+        if exit_code:
+            self._fail(task_id, f"Exit code {exit_code}")
+
+    def _fail(self, task_id: int, error: str) -> None:
+        with self.condition:
+            self.failed_tasks.add(task_id)
+            self.failed_operations.add(self.operations[task_id])
+        self.emit("failed", operation=self.operations[task_id], task=task_id, error=error)
+
+    def _on_complete(self, task_id: int) -> None:
+        with self.condition:
+            task = self.pending.pop(task_id, None)
+            self.condition.notify_all()
+        if task is not None and task_id not in self.failed_tasks:
+            self.emit("done", operation=self.operations[task_id], task=task_id, bytes=task.bytes_total)
+
+    def _on_failed(self, task_id: int, error: str) -> None:
+        self._fail(task_id, error)
+        with self.condition:
+            task = self.pending.pop(task_id, None)
+            self.condition.notify_all()
+        if task is not None and not self.resume:
+            task.discard()
+
+    # Progress of running transfers is printed at same pace as progress area of GUI is redrawn
+    def run(self, operations: List[dict]) -> bool:
+        for number, operation in enumerate(operations):
+            try:
+                self.submit(number, operation)
+            except Exception as e:
+                self.failed_operations.add(number)
+                self.emit("failed", operation=number, error=str(e.args))
+        while True:
+            with self.condition:
+                if not self.pending:
+                    break
+                self.condition.wait(PROGRESS_REFRESH_INTERVAL / 1000)
+                tasks = list(self.pending.values())
+            self._report_progress(tasks)
+        self.emit("summary", operations=len(operations), failed=sorted(self.failed_operations))
+        return not self.failed_operations
+
+    def _report_progress(self, tasks: List[TaskThread]) -> None:
+        for task in tasks:
+            if task.bytes_total and self.reported.get(task.id) != task.bytes_done:
+                self.reported[task.id] = task.bytes_done
+                self.emit("progress", operation=self.operations[task.id], task=task.id, done=task.bytes_done,
+                          total=task.bytes_total)
+
+
+# Same secure tokens of PCs as saved by GUI
+def _device_secure_token(pc_id: str, secure_token: str | None) -> str | None:
+    if secure_token is not None:
+        return secure_token
+    try:
+        return store_keeper.get_value("secure_token").get(pc_id)
+    except KeyError:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Run operations on PC without GUI")
+    parser.add_argument("manifest", help="JSON file with list of operations, - for stdin")
+    parser.add_argument("--pc", required=True, help="id of PC")
+    parser.add_argument("--token", help="secure token of PC, saved one is used by default")
+    parser.add_argument("--workers", type=int, default=SCHEDULER_WORKERS, help="tasks running at once")
+    parser.add_argument("--resume", action="store_true", help="keep failed transfers for GUI to resume them")
+    args = parser.parse_args()
+
+    try:
+        operations = load_manifest(args.manifest)
+        if not store_keeper.get_token():
+            raise StartError("Not signed in, sign in with GUI first")
+        shaper.load()
+        client = PooledClient(args.pc, _device_secure_token(args.pc, args.token))
+        if not client.check_online():
+            raise StartError(f"PC {args.pc} is offline")
+        runner = Runner(client, TaskScheduler(args.workers), args.resume)
+    except (StartError, ServerError, TokenRequired) as e:
+        print(json.dumps({"event": "error", "error": str(e) or type(e).__name__}), flush=True)
+        sys.exit(NOT_STARTED)
+    sys.exit(0 if runner.run(operations) else FAILED)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from time import monotonic
+from typing import Dict
+
+import requests
+from filesocket import ManagingClient, ServerError
+
+from src.config import CLIENT_IDLE_TIMEOUT
+from src.metrics import metrics
+
+
+# Client which connects when it is used for the first time and reconnects after being idle,
+# because tunnel address of PC may change meanwhile. Every request reads device_ngrok_ip, so it is the hook
+class PooledClient(ManagingClient):
+    def __init__(self, device_id: int | str, device_secure_token: str | None = None):
+        self.lock = Lock()
+        self.last_used = 0.0
+        self._ngrok_ip = None
+        super().__init__(device_id, device_secure_token)
+
+    # Address is asked without lock, so threads using client wait neither for it nor for each other
+    @property
+    def device_ngrok_ip(self) -> str | None:
+        with self.lock:
+            if self._ngrok_ip is not None and monotonic() - self.last_used <= CLIENT_IDLE_TIMEOUT:
+                self.last_used = monotonic()
+                return self._ngrok_ip
+        with metrics.timed("connect"):
+            self._get_ngrok_ip()
+        with self.lock:
+            return self._ngrok_ip
+
+    @device_ngrok_ip.setter
+    def device_ngrok_ip(self, value: str | None) -> None:
+        with self.lock:
+            self._ngrok_ip = value
+            self.last_used = monotonic()
+
+    # Next request asks for address of PC again
+    def invalidate(self) -> None:
+        with self.lock:
+            self._ngrok_ip = None
+
+    # PC may be reached by other address after failed request
+    @contextmanager
+    def _invalidate_on_error(self):
+        try:
+            yield
+        except (ServerError, requests.ConnectionError):
+            self.invalidate()
+            raise
+
+    # Every call to PC is timed, address of PC is taken before timing starts, so connecting is timed on its own
+    def list_files(self, path: Path | str) -> dict | None:
+        self.device_ngrok_ip
+        with metrics.timed("list_files"), self._invalidate_on_error():
+            return super().list_files(path)
+
+    def cmd_command(self, command: str) -> dict | None:
+        self.device_ngrok_ip
+        with metrics.timed("cmd_command"), self._invalidate_on_error():
+            return super().cmd_command(command)
+
+    def check_online(self) -> bool:
+        self.device_ngrok_ip
+        with metrics.timed("check_online"), self._invalidate_on_error():
+            return super().check_online()
+
+    def get_file(self, path: Path | str, destination: Path | str = Path('')) -> None:
+        self.device_ngrok_ip
+        with metrics.timed("get_file"), self._invalidate_on_error():
+            super().get_file(path, destination)
+
+    def send_file(self, path: Path | str, destination: Path | str = Path('')) -> None:
+        self.device_ngrok_ip
+        with metrics.timed("send_file"), self._invalidate_on_error():
+            super().send_file(path, destination)
+
+
+# One client per PC shared by all its tabs. Clients of closed tabs are released, idle ones are dropped
+# when another client is taken, tab which still uses dropped client keeps it
+class ClientPool:
+    def __init__(self):
+        self.lock = Lock()
+        self.clients: Dict[str, PooledClient] = dict()
+
+    def get(self, pc_id: int | str, device_secure_token: str | None = None) -> PooledClient:
+        with self.lock:
+            now = monotonic()
+            for other in [other for other, client in self.clients.items()
+                          if now - client.last_used > CLIENT_IDLE_TIMEOUT]:
+                del self.clients[other]
+            client = self.clients.get(str(pc_id))
+            if client is None or (device_secure_token is not None and
+                                  client.default_header.get('token') != device_secure_token):
+                client = PooledClient(pc_id, device_secure_token)
+                self.clients[str(pc_id)] = client
+            return client
+
+    def release(self, pc_id: int | str) -> None:
+        with self.lock:
+            self.clients.pop(str(pc_id), None)
+
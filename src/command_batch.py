@@ -0,0 +1,64 @@
+import re
+from pathlib import Path
+from typing import List
+
+from filesocket import ManagingClient
+
+from src.config import CMD_LENGTH_LIMIT
+from src.transfer import run_command, _cmd_path, _quoted
+
+
+# Remote operations which are merged into as few cmd commands as fit into command line.
+# Every operation echoes its own marker, so result of each item is known.
+# del and rmdir don't set error level reliably, so they are checked by existence of path afterwards
+
+MARKER = re.compile(r'^@@(\d+) (OK|FAIL)\s*$')
+
+
+class CommandBatch:
+    def __init__(self):
+        self.operations: List[str] = []
+
+    def _add(self, operation: str) -> int:
+        self.operations.append(operation)
+        return len(self.operations) - 1
+
+    def delete(self, path: Path, is_dir: bool) -> int:
+        number = len(self.operations)
+        command = f'rmdir /s /q {_cmd_path(path)}' if is_dir else f'del /f /q {_cmd_path(path)}'
+        return self._add(f'({command} & if exist {_cmd_path(path)} (echo @@{number} FAIL) '
+                         f'else (echo @@{number} OK))')
+
+    def rename(self, path: Path, new_name: str) -> int:
+        number = len(self.operations)
+        return self._add(f'(ren {_cmd_path(path)} {_quoted(new_name)} && (echo @@{number} OK) '
+                         f'|| (echo @@{number} FAIL))')
+
+    def commands(self) -> List[str]:
+        commands = []
+        current = []
+        length = 0
+        for operation in self.operations:
+            if current and length + len(operation) + 3 > CMD_LENGTH_LIMIT:
+                commands.append(' & '.join(current))
+                current = []
+                length = 0
+            current.append(operation)
+            length += len(operation) + 3
+        if current:
+            commands.append(' & '.join(current))
+        return commands
+
+    # Success of every operation in order they were added, operation without marker in output is failed
+    def run(self, client: ManagingClient) -> List[bool]:
+        results = [False] * len(self.operations)
+        for command in self.commands():
+            output = (run_command(client, command) or dict()).get('out') or ''
+            for line in output.splitlines():
+                match = MARKER.match(line.strip())
+                if match and int(match.group(1)) < len(results):
+                    results[int(match.group(1))] = match.group(2) == 'OK'
+        return results
+
+    def __len__(self) -> int:
+        return len(self.operations)
@@ -0,0 +1,297 @@
+import hashlib
+import os
+import tarfile
+import zlib
+from io import BytesIO
+from pathlib import Path
+from threading import Event
+from typing import BinaryIO, Callable, Tuple
+
+from filesocket import ManagingClient
+from filesocket.managing_device_client import DOWNLOADS_PATH
+
+from src.bandwidth import shaper
+from src.config import COMPRESSION_ENABLED, COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE, COMPRESSION_MAX_SIZE, \
+    COMPRESSION_SAMPLE_SIZE, COMPRESSION_MIN_RATIO, COMPRESSION_POLL_INTERVAL, COMPRESSED_EXTENSIONS, \
+    TRANSFER_CHUNK_SIZE, RESUMABLE_CHUNK_SIZE
+from src.remote_console import RemoteJob
+from src.transfer import ProgressCallback, MultipartBody, download_resumable, upload_resumable, run_command, \
+    _cmd_path, _quoted, _request_range, _raise_for_status, _post_file, _part_path, _remote_size
+from src.transfer_journal import journal
+
+
+# Server sends files as they are, so file is packed to tar.gz on one side and unpacked by tar on the other one.
+# Archive is streamed: download reads archive while remote tar is still writing it and unpacks it on the fly,
+# upload sends archive by chunks as local tar writes them. Neither side keeps packed copy of whole file
+# locally, remote PC keeps archive until it is unpacked, so files are packed only up to COMPRESSION_MAX_SIZE
+
+RatioCallback = Callable[[float], None]
+
+
+# Same extension as shown in Type column of tree
+def _compressed_type(name: str) -> bool:
+    return Path(name).suffix[1:].lower() in COMPRESSED_EXTENSIONS
+
+
+def _sample_ratio(sample: bytes) -> float:
+    return len(sample) / max(len(zlib.compress(sample, COMPRESSION_LEVEL)), 1)
+
+
+def _worth_compressing(name: str, size: int, sample: bytes) -> bool:
+    return COMPRESSION_ENABLED and COMPRESSION_MIN_SIZE <= size <= COMPRESSION_MAX_SIZE \
+        and not _compressed_type(name) and _sample_ratio(sample) >= COMPRESSION_MIN_RATIO
+
+
+def _archive_name(name: str, transfer_id: str) -> str:
+    return f".{name}.{transfer_id[:8]}.tgz"
+
+
+def _cancelled(cancelled: Event | None) -> None:
+    if cancelled is not None and cancelled.is_set():
+        raise IOError("Cancelled")
+
+
+# Size of remote file and ratio of its sample if it should be compressed, otherwise size 0
+def _remote_sample(client: ManagingClient, path: Path) -> Tuple[int, float]:
+    if not COMPRESSION_ENABLED or _compressed_type(path.name):
+        return 0, 0.0
+    response = _request_range(client, path, 0, COMPRESSION_SAMPLE_SIZE, None)
+    try:
+        if response.status_code != 206:
+            return 0, 0.0
+        size = int(response.headers['Content-Range'].split('/')[-1])
+        sample = response.raw.read(COMPRESSION_SAMPLE_SIZE, decode_content=True)
+    finally:
+        response.close()
+    return (size, _sample_ratio(sample)) if _worth_compressing(path.name, size, sample) else (0, 0.0)
+
+
+# Archive which remote tar is writing, read by range requests as it grows. Read waits for more data while
+# tar runs, so tarfile reads it as a stream. Failed tar or cancelled task ends reading with error
+class _GrowingArchive:
+    def __init__(self, client: ManagingClient, path: Path, job: RemoteJob, flow: str, cancelled: Event | None):
+        self.client = client
+        self.path = path
+        self.job = job
+        self.flow = flow
+        self.cancelled = cancelled
+        self.stop = cancelled or Event()
+        self.buffer = b''
+        self.offset = 0
+        self.drained = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self.drained and (size < 0 or len(self.buffer) < size):
+            _cancelled(self.cancelled)
+            # Tar may end between two requests, so archive is read once more after its end is seen
+            finished = self._finished()
+            data = self._fetch()
+            if data:
+                self.buffer += data
+            elif finished:
+                self.drained = True
+            else:
+                self.stop.wait(COMPRESSION_POLL_INTERVAL / 1000)
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def _finished(self) -> bool:
+        exit_code = self.job.exit_code()
+        if exit_code is not None and exit_code != 0:
+            raise IOError(f"Packing of {self.path.name} failed with code {exit_code}")
+        return exit_code is not None
+
+    def _fetch(self) -> bytes:
+        response = _request_range(self.client, self.path, self.offset, self.offset + TRANSFER_CHUNK_SIZE, None)
+        try:
+            if response.status_code in (404, 416):
+                return b''
+            _raise_for_status(response, (206,))
+            data = response.content
+        finally:
+            response.close()
+        shaper.acquire(self.flow, len(data))
+        self.offset += len(data)
+        return data
+
+
+def download_compressed(client: ManagingClient, path: Path, destination: Path, transfer_id: str,
+                        progress: ProgressCallback | None = None, on_ratio: RatioCallback | None = None,
+                        cancelled: Event | None = None) -> Path:
+    entry = journal.get(transfer_id) or dict()
+    if 'archive' in entry and entry['archive'] is None:
+        return download_resumable(client, path, destination, transfer_id, progress)
+    # Tar of interrupted attempt can't be followed anymore, so file is packed again
+    if entry.get('archive'):
+        run_command(client, f'del /f {_cmd_path(Path(entry["archive"]))}')
+    size, ratio = _remote_sample(client, path)
+    archive = path.parent / _archive_name(path.name, transfer_id)
+    job = RemoteJob(client, f'tar -czf {_cmd_path(archive)} -C {_cmd_path(path.parent)} {_quoted(path.name)}')
+    if not size or not job.start():
+        journal.update(transfer_id, archive=None)
+        return download_resumable(client, path, destination, transfer_id, progress)
+    journal.update(transfer_id, archive=str(archive))
+    if on_ratio is not None:
+        on_ratio(ratio)
+
+    local_dir = DOWNLOADS_PATH if str(destination) == '.' else Path(destination)
+    target = local_dir / path.name
+    part = _part_path(target)
+    stream = _GrowingArchive(client, archive, job, transfer_id, cancelled)
+    digest = hashlib.sha256()
+    done = 0
+    # Archive holds only the file, it is unpacked and hashed in one pass
+    try:
+        with tarfile.open(fileobj=stream, mode="r|gz") as tar:
+            member = tar.next()
+            if member is None or not member.isfile() or member.name != path.name:
+                raise IOError(f"Archive of {path.name} has unexpected content")
+            with tar.extractfile(member) as source, part.open('wb') as f:
+                while data := source.read(TRANSFER_CHUNK_SIZE):
+                    digest.update(data)
+                    f.write(data)
+                    done += len(data)
+                    if progress is not None:
+                        progress(done, member.size)
+        os.replace(part, target)
+        os.utime(target, (member.mtime, member.mtime))
+    except (tarfile.TarError, OSError) as e:
+        part.unlink(missing_ok=True)
+        raise IOError(e)
+    finally:
+        if not stream.drained:
+            job.cancel()
+        job.cleanup()
+        run_command(client, f'del /f {_cmd_path(archive)}')
+    if on_ratio is not None:
+        on_ratio(done / max(stream.offset, 1))
+    journal.update(transfer_id, sha256=digest.hexdigest())
+    return target
+
+
+def _local_sample(path: Path) -> bytes:
+    with path.open('rb') as f:
+        return f.read(COMPRESSION_SAMPLE_SIZE)
+
+
+# File which reports how much of it was read by tar and stops reading when task is cancelled
+class _PackedFile:
+    def __init__(self, f: BinaryIO, size: int, progress: ProgressCallback | None, cancelled: Event | None):
+        self.f = f
+        self.size = size
+        self.progress = progress
+        self.cancelled = cancelled
+        self.done = 0
+
+    def read(self, count: int = -1) -> bytes:
+        _cancelled(self.cancelled)
+        data = self.f.read(count)
+        self.done += len(data)
+        if self.progress is not None:
+            self.progress(self.done, self.size)
+        return data
+
+
+# Takes tar stream as it is written, compresses it and sends it by chunks, which are glued into partial file
+# on remote PC. gzip header has no time, so packing same file again gives same bytes and resumed upload skips
+# chunks which remote PC has already
+class _ChunkedUpload:
+    def __init__(self, client: ManagingClient, destination: Path, name: str, transfer_id: str, offset: int,
+                 on_chunk: Callable[[int], None]):
+        self.client = client
+        self.destination = destination
+        self.name = name
+        self.transfer_id = transfer_id
+        self.offset = offset
+        self.on_chunk = on_chunk
+        self.partial = destination / f"{name}.partial"
+        self.compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+        self.buffer = bytearray()
+        self.position = 0
+        self.stopped = False
+
+    def write(self, data: bytes) -> int:
+        self._append(self.compressor.compress(data))
+        return len(data)
+
+    # Tar flushes its buffer when it is closed after error, such data is not sent
+    def _append(self, data: bytes) -> None:
+        if self.stopped:
+            return
+        start = self.position
+        self.position += len(data)
+        if self.position > self.offset:
+            self.buffer += data[max(self.offset - start, 0):]
+        while len(self.buffer) >= RESUMABLE_CHUNK_SIZE:
+            self._send(bytes(self.buffer[:RESUMABLE_CHUNK_SIZE]))
+            del self.buffer[:RESUMABLE_CHUNK_SIZE]
+
+    def finish(self) -> Path:
+        self._append(self.compressor.flush())
+        if self.buffer:
+            self._send(bytes(self.buffer))
+            self.buffer.clear()
+        archive = self.destination / self.name
+        run_command(self.client, f'move /y {_cmd_path(self.partial)} {_cmd_path(archive)}')
+        return archive
+
+    def _send(self, data: bytes) -> None:
+        start = self.offset
+        chunk = f"{self.name}.chunk{start // RESUMABLE_CHUNK_SIZE}"
+        body = MultipartBody(Path(chunk), {'destination': str(self.destination)}, length=len(data),
+                             filename=chunk, stream=BytesIO(data), flow=self.transfer_id)
+        try:
+            response = _post_file(self.client, body)
+        finally:
+            body.close()
+        _raise_for_status(response)
+        if start == 0:
+            run_command(self.client, f'move /y {_cmd_path(self.destination / chunk)} {_cmd_path(self.partial)}')
+        else:
+            run_command(self.client, f'copy /b {_cmd_path(self.partial)}+{_cmd_path(self.destination / chunk)} '
+                                     f'{_cmd_path(self.partial)} && del /f {_cmd_path(self.destination / chunk)}')
+        self.offset += len(data)
+        journal.add_chunk(self.transfer_id, start, self.offset, body.crc)
+        self.on_chunk(self.offset)
+
+
+def upload_compressed(client: ManagingClient, path: Path, destination: Path, transfer_id: str,
+                      progress: ProgressCallback | None = None, on_ratio: RatioCallback | None = None,
+                      cancelled: Event | None = None) -> None:
+    path = Path(path)
+    destination = Path(destination)
+    # Server root is unknown for remote tar, so uploads without destination are sent as they are
+    if not path.is_file() or str(destination) == '.' or \
+            not _worth_compressing(path.name, path.stat().st_size, _local_sample(path)):
+        upload_resumable(client, path, destination, transfer_id, progress)
+        return
+
+    name = _archive_name(path.name, transfer_id)
+    entry = journal.get(transfer_id) or dict()
+    source = [path.stat().st_size, path.stat().st_mtime]
+    chunks = entry.get('chunks', []) if entry.get('source') == source and entry.get('archive') == name else []
+    remote_size = _remote_size(client, destination, f"{name}.partial") if chunks else 0
+    offset = remote_size if remote_size in {end for start, end, crc in chunks} else 0
+    journal.update(transfer_id, source=source, archive=name,
+                   chunks=[chunk for chunk in chunks if chunk[1] <= offset])
+
+    with path.open('rb') as f:
+        packed = _PackedFile(f, source[0], progress, cancelled)
+        sink = _ChunkedUpload(client, destination, name, transfer_id, offset,
+                              lambda sent: on_ratio is not None and on_ratio(packed.done / max(sent, 1)))
+        try:
+            with tarfile.open(fileobj=sink, mode="w|") as tar:
+                try:
+                    tar.addfile(tar.gettarinfo(str(path), path.name), packed)
+                except BaseException:
+                    sink.stopped = True
+                    raise
+        except tarfile.TarError as e:
+            raise IOError(e)
+    remote_archive = sink.finish()
+    if on_ratio is not None:
+        on_ratio(source[0] / max(sink.position, 1))
+    run_command(client, f'tar -xzf {_cmd_path(remote_archive)} -C {_cmd_path(destination)} '
+                        f'&& del /f {_cmd_path(remote_archive)}')
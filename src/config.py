@@ -0,0 +1,118 @@
+import os
+
+# Online probing of PCs in ChoosePCDialog
+PROBE_WORKERS = 16
+PROBE_TIMEOUT = 5
+ONLINE_CACHE_TTL = 60
+
+# Rows of directory exposed to tree view at once
+FETCH_BATCH = 500
+
+# Client-side cache of directory listings
+LISTING_CACHE_SIZE = 256
+LISTING_CACHE_TTL = 30
+
+# Transfer scheduler: total workers and limits of concurrently running tasks of each kind
+SCHEDULER_WORKERS = 8
+KIND_LIMITS = {"download": 4, "upload": 4, "command": 4, "size": 2}
+
+# Transfers: size of streamed chunk, how often progress area is redrawn (ms) and tasks listed in its menu
+TRANSFER_CHUNK_SIZE = 2 ** 20
+PROGRESS_REFRESH_INTERVAL = 250
+TASK_MENU_SIZE = 20
+
+# Resumable transfers: journal of unfinished transfers and size of journaled chunk
+JOURNAL_FILE = "transfers.json"
+JOURNAL_FLUSH_INTERVAL = 1
+RESUMABLE_CHUNK_SIZE = 16 * 2 ** 20
+
+# Files bigger than threshold are transferred by several streams at once
+PARALLEL_STREAMS = 4
+PARALLEL_THRESHOLD = 256 * 2 ** 20
+
+# Folder transfers: files smaller than limit are packed into archives of at most given size and count
+BATCH_FILE_LIMIT = 2 ** 20
+BATCH_MAX_BYTES = 64 * 2 ** 20
+BATCH_MAX_FILES = 1000
+CMD_LENGTH_LIMIT = 7000
+
+# Optional gzip compression of transfers, archive is sent while it is packed and remote PC keeps it until it is
+# unpacked; files are skipped by size, by extension or when sample compresses poorly.
+# Archive which remote PC is packing is polled for new data every interval, ms
+COMPRESSION_ENABLED = False
+COMPRESSION_LEVEL = 6
+COMPRESSION_MIN_SIZE = 2 ** 20
+COMPRESSION_MAX_SIZE = 2 ** 30
+COMPRESSION_POLL_INTERVAL = 1000
+COMPRESSION_SAMPLE_SIZE = 256 * 2 ** 10
+COMPRESSION_MIN_RATIO = 1.5
+COMPRESSED_EXTENSIONS = {"zip", "gz", "tgz", "bz2", "xz", "7z", "rar", "zst", "cab", "jpg", "jpeg", "png", "gif",
+                         "webp", "mp3", "mp4", "mkv", "avi", "mov", "webm", "ogg", "flac", "docx", "xlsx", "pptx",
+                         "pdf", "jar", "apk", "msi"}
+
+# Mirror: difference of mtimes (s) which still counts as same file, FAT keeps mtime with 2 s precision
+MIRROR_MTIME_TOLERANCE = 2
+
+# Remote renames made within this time (ms) are sent as one command
+COMMAND_BATCH_DELAY = 300
+
+# Drag-out: files are staged in temp dir and removed after grace period (s) once drop got them,
+# leftovers of previous sessions older than ttl (s) are removed at start
+STAGING_DIR = "filesocket_drag"
+STAGING_GRACE = 600
+STAGING_TTL = 24 * 60 * 60
+
+# Search index of remote PC: local SQLite file per PC, crawler rate (listings per second),
+# pause between crawls and interval of full crawls, which don't trust directory mtimes (s).
+# Crawler is off by default, then only opened directories are indexed. Query runs after typing pauses (ms)
+SEARCH_INDEX_FILE = "index_{}.db"
+CRAWL_ENABLED = False
+CRAWL_RATE = 5
+CRAWL_INTERVAL = 60 * 60
+CRAWL_FULL_INTERVAL = 7 * 24 * 60 * 60
+SEARCH_LIMIT = 500
+SEARCH_DELAY = 250
+
+# Prefetch of subdirectories of opened directory, off by default: how many of them and by how many workers
+PREFETCH_ENABLED = False
+PREFETCH_COUNT = 5
+PREFETCH_WORKERS = 2
+
+# Console: how often output of running command is polled (ms), lines kept on screen and commands kept in history
+CONSOLE_POLL_INTERVAL = 500
+CONSOLE_MAX_LINES = 10000
+CONSOLE_HISTORY_SIZE = 100
+
+# Connections to PCs: address of PC is requested again when connection was not used for this time (s).
+# Closed tab is deleted once its running tasks end, checked every interval (ms)
+CLIENT_IDLE_TIMEOUT = 10 * 60
+CLOSE_POLL_INTERVAL = 500
+
+# Instrumentation: upper bounds of latency histogram buckets (s) and refresh interval of diagnostics panel (ms)
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DIAGNOSTICS_REFRESH_INTERVAL = 1000
+
+# Auto refresh of expanded directories shown in tree, off by default: interval (ms) and directories listed per tick
+AUTO_REFRESH_ENABLED = False
+AUTO_REFRESH_INTERVAL = 30 * 1000
+AUTO_REFRESH_LIMIT = 10
+
+# Local store of downloaded files keyed by SHA-256: directory in data of user, size cap (bytes),
+# smaller files are not kept
+DOWNLOAD_CACHE_ENABLED = True
+DOWNLOAD_CACHE_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                  "FileSocketGUI", "download_cache")
+DOWNLOAD_CACHE_SIZE = 20 * 2 ** 30
+DOWNLOAD_CACHE_MIN_SIZE = 16 * 2 ** 20
+
+# Bandwidth shaping: burst of token buckets (s of traffic at limit), idle time (s) after which transfer
+# stops counting for fair sharing, and how often waiting transfers check changed limits and schedule (s)
+BANDWIDTH_BURST = 0.5
+BANDWIDTH_FLOW_IDLE = 5
+BANDWIDTH_RECHECK = 0.5
+
+# Directory sizes: listings fetched at once by one calculation, how often running totals are shown (ms)
+# and how long (s) total of directory with unchanged mtime is trusted, changes deep inside don't change its mtime
+DIR_SIZE_WORKERS = 4
+DIR_SIZE_REPORT_INTERVAL = 250
+DIR_SIZE_CACHE_TTL = 7 * 24 * 60 * 60
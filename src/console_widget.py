@@ -1,20 +1,123 @@
-from PyQt6 import uic
+from threading import Thread
+from typing import List
+
+from PyQt6.QtCore import Qt, QObject, QEvent
+from PyQt6.QtGui import QTextCursor
 from PyQt6.QtWidgets import QWidget
-from filesocket import ManagingClient, ServerError
+from filesocket import ManagingClient
+from filesocket.config import store_keeper
+
+from src.config import CONSOLE_MAX_LINES, CONSOLE_HISTORY_SIZE
+from src.threads import ConsoleThread
+from src.ui_loader import load_ui
 
 
 class ConsoleWidget(QWidget):
     def __init__(self, parent: QWidget, client: ManagingClient):
         super().__init__(parent)
-        uic.loadUi("res/ui/console_widget.ui", self)
+        load_ui("console_widget", self)
 
+        self.logger = parent.logger
         self.client = client
+        self.thread: ConsoleThread | None = None
+
+        # Old lines are dropped from top, so memory stays flat for any output
+        self.textBrowser.document().setMaximumBlockCount(CONSOLE_MAX_LINES)
+
+        self.store_keeper = store_keeper
+        self.history = self._load_history()
+        self.history_position = len(self.history)
 
         self.send.clicked.connect(self.send_command_processing)
+        self.cancel.clicked.connect(self.cancel_processing)
+        self.textEdit.installEventFilter(self)
+
+    # Ctrl+Enter sends command, Ctrl+Up and Ctrl+Down walk through history
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if watched is self.textEdit and event.type() == QEvent.Type.KeyPress and \
+                event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                if self.send.isEnabled():
+                    self.send_command_processing()
+                return True
+            if event.key() == Qt.Key.Key_Up:
+                self._show_history(self.history_position - 1)
+                return True
+            if event.key() == Qt.Key.Key_Down:
+                self._show_history(self.history_position + 1)
+                return True
+        return super().eventFilter(watched, event)
+
+    def send_command_processing(self) -> None:
+        command = self.textEdit.toPlainText().strip()
+        if not command or self.thread is not None:
+            return
+        self._remember(command)
+        self.textEdit.clear()
+        self._append(f"> {command}\n")
+        self.thread = ConsoleThread(self, self.client, command)
+        self.thread.output.connect(self._append)
+        self.thread.finished_with.connect(self._on_finished)
+        self.thread.task_failed.connect(lambda _, error: self._on_failed(error))
+        self.send.setEnabled(False)
+        self.cancel.setEnabled(True)
+        Thread(target=self.thread.execute, daemon=True).start()
+
+    def cancel_processing(self) -> None:
+        if self.thread is not None:
+            self.thread.cancel()
+            self.cancel.setEnabled(False)
+            self.logger.info("Cancelling console command")
 
-    def send_command_processing(self):
+    def shutdown(self) -> None:
+        if self.thread is not None:
+            self.thread.cancel()
+
+    # Command thread ends by signal handled here, so thread is reset only when it is done
+    def is_idle(self) -> bool:
+        return self.thread is None
+
+    def _append(self, text: str) -> None:
+        cursor = self.textBrowser.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text.replace('\r\n', '\n'))
+        self.textBrowser.setTextCursor(cursor)
+        self.textBrowser.ensureCursorVisible()
+
+    def _on_finished(self, exit_code: int | None) -> None:
+        if exit_code is not None:
+            self._append(f"\n[exit code {exit_code}]\n")
+        elif self.thread.cancelled.is_set():
+            self._append("\n[cancelled]\n")
+        self._reset()
+
+    def _on_failed(self, error: str) -> None:
+        self.logger.info(f"Server error {error}")
+        self._append(f"\n[server error {error}]\n")
+        self._reset()
+
+    def _reset(self) -> None:
+        self.thread.deleteLater()
+        self.thread = None
+        self.send.setEnabled(True)
+        self.cancel.setEnabled(False)
+
+    def _load_history(self) -> List[str]:
         try:
-            result = self.client.cmd_command(self.textEdit.toPlainText())['out']
-        except ServerError:
+            return self.store_keeper.get_value("console_history")
+        except KeyError:
+            return []
+
+    def _remember(self, command: str) -> None:
+        if not self.history or self.history[-1] != command:
+            self.history.append(command)
+            del self.history[:-CONSOLE_HISTORY_SIZE]
+            self.store_keeper.add_value("console_history", self.history)
+        self.history_position = len(self.history)
+
+    def _show_history(self, position: int) -> None:
+        if not 0 <= position <= len(self.history):
             return
-        self.textBrowser.setText(result)
+        self.history_position = position
+        self.textEdit.setPlainText(self.history[position] if position < len(self.history) else "")
+        self.textEdit.moveCursor(QTextCursor.MoveOperation.End)
@@ -0,0 +1,54 @@
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QDialog, QWidget, QTableWidgetItem, QFileDialog
+
+from src.config import DIAGNOSTICS_REFRESH_INTERVAL
+from src.metrics import metrics
+from src.taskbar_processor import readable_size
+from src.ui_loader import load_ui
+
+
+COLUMNS = ("Operation", "Count", "Errors", "p50", "p95", "p99", "Max", "Bytes")
+
+
+# Live table of collected metrics, refreshed while dialog is open
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent: QWidget):
+        super().__init__(parent)
+        load_ui("diagnostics_dialog", self)
+        self.table.setColumnCount(len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.exportJson.clicked.connect(lambda: self.export("JSON (*.json)", metrics.to_json))
+        self.exportPrometheus.clicked.connect(lambda: self.export("Prometheus text (*.prom *.txt)",
+                                                                 metrics.to_prometheus))
+        self.reset.clicked.connect(self.reset_metrics)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(DIAGNOSTICS_REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+        self.refresh()
+
+    @staticmethod
+    def _readable_latency(seconds: float) -> str:
+        return f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.2f} s"
+
+    def refresh(self) -> None:
+        snapshot = metrics.snapshot()
+        self.table.setRowCount(len(snapshot))
+        for row, (operation, summary) in enumerate(snapshot.items()):
+            values = (operation, str(summary["count"]), f"{summary['errors']} ({summary['error_rate']:.0%})",
+                      self._readable_latency(summary["p50"]), self._readable_latency(summary["p95"]),
+                      self._readable_latency(summary["p99"]), self._readable_latency(summary["max"]),
+                      readable_size(summary["bytes"]) if summary["bytes"] else "")
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+    def export(self, file_filter: str, render) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "Export metrics", "", file_filter)
+        if path:
+            with open(path, 'w') as f:
+                f.write(render())
+
+    def reset_metrics(self) -> None:
+        metrics.reset()
+        self.refresh()
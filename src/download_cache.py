@@ -0,0 +1,215 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Lock
+from time import time
+from uuid import uuid4
+
+from filesocket import ManagingClient, PathNotFoundError
+from filesocket.managing_device_client import DOWNLOADS_PATH
+
+from src.compression import RatioCallback, download_compressed
+from src.config import DOWNLOAD_CACHE_ENABLED, DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_SIZE, DOWNLOAD_CACHE_MIN_SIZE, \
+    TRANSFER_CHUNK_SIZE
+from src.mirror import remote_hashes
+from src.transfer import ProgressCallback
+from src.transfer_journal import journal
+
+
+# Content addressed store of downloaded files. Blobs are named by their SHA-256, SQLite index keeps size and
+# last use of every blob, least recently used ones are evicted when store grows over its size.
+# Sources remember hash of remote file with size and mtime it had, so unchanged file is found without hashing it
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, size INTEGER, used REAL);
+CREATE INDEX IF NOT EXISTS blobs_used ON blobs (used);
+CREATE INDEX IF NOT EXISTS blobs_size ON blobs (size);
+CREATE TABLE IF NOT EXISTS sources (pc TEXT, path TEXT, size INTEGER, mtime REAL, hash TEXT,
+                                    PRIMARY KEY (pc, path));
+"""
+
+
+class DownloadCache:
+    def __init__(self, root: str, max_size: int):
+        self.root = Path(root)
+        self.max_size = max_size
+        self.connection: sqlite3.Connection | None = None
+        self.lock = Lock()
+
+    # Opened on first use, so nothing is created until file is downloaded
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(self.root / "index.db", check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.executescript(SCHEMA)
+        return self.connection
+
+    def _blob(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def known_hash(self, pc_id: str, path: str, size: int, mtime: float | None) -> str | None:
+        with self.lock:
+            row = self._connect().execute("SELECT hash FROM sources WHERE pc = ? AND path = ? AND size = ? "
+                                          "AND mtime IS ?", (pc_id, path, size, mtime)).fetchone()
+        return None if row is None else row[0]
+
+    def has_size(self, size: int) -> bool:
+        with self.lock:
+            return self._connect().execute("SELECT 1 FROM blobs WHERE size = ?", (size,)).fetchone() is not None
+
+    def remember(self, pc_id: str, path: str, size: int, mtime: float | None, digest: str) -> None:
+        with self.lock, self._connect():
+            self.connection.execute("INSERT OR REPLACE INTO sources (pc, path, size, mtime, hash) "
+                                    "VALUES (?, ?, ?, ?, ?)", (pc_id, path, size, mtime, digest))
+
+    # Blob is hashed while it is copied, damaged blob is dropped and False is returned
+    def restore(self, digest: str, target: Path, progress: ProgressCallback | None = None) -> bool:
+        with self.lock, self._connect():
+            row = self.connection.execute("SELECT size FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if row is None:
+                return False
+            self.connection.execute("UPDATE blobs SET used = ? WHERE hash = ?", (time(), digest))
+        size = row[0]
+        actual = hashlib.sha256()
+        done = 0
+        try:
+            with self._blob(digest).open('rb') as source, target.open('wb') as f:
+                while data := source.read(TRANSFER_CHUNK_SIZE):
+                    actual.update(data)
+                    f.write(data)
+                    done += len(data)
+                    if progress is not None:
+                        progress(done, size)
+        except FileNotFoundError:
+            self._drop(digest)
+            return False
+        except OSError as e:
+            raise IOError(e)
+        if actual.hexdigest() != digest:
+            target.unlink(missing_ok=True)
+            self._drop(digest)
+            return False
+        return True
+
+    # Downloaded file is linked into store when it is on same disk, so keeping it costs no copy.
+    # If file is changed later, its blob changes too and is dropped on restore
+    def add(self, path: Path, digest: str) -> None:
+        size = path.stat().st_size
+        if size < DOWNLOAD_CACHE_MIN_SIZE or size > self.max_size:
+            return
+        blob = self._blob(digest)
+        with self.lock:
+            self._connect()
+        if not blob.exists():
+            blob.parent.mkdir(exist_ok=True)
+            temp = blob.with_name(f"{digest}.{uuid4().hex[:8]}.tmp")
+            try:
+                os.link(path, temp)
+            except OSError:
+                shutil.copyfile(path, temp)
+            os.replace(temp, blob)
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO blobs (hash, size, used) VALUES (?, ?, ?)",
+                                    (digest, size, time()))
+        self._evict()
+
+    def _evict(self) -> None:
+        with self.lock, self.connection:
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            victims = []
+            for digest, size in self.connection.execute("SELECT hash, size FROM blobs ORDER BY used").fetchall():
+                if total <= self.max_size:
+                    break
+                victims.append(digest)
+                total -= size
+            self._forget(victims)
+        for digest in victims:
+            self._blob(digest).unlink(missing_ok=True)
+
+    def _drop(self, digest: str) -> None:
+        with self.lock, self._connect():
+            self._forget([digest])
+        self._blob(digest).unlink(missing_ok=True)
+
+    def _forget(self, digests: list) -> None:
+        self.connection.executemany("DELETE FROM blobs WHERE hash = ?", [(digest,) for digest in digests])
+        self.connection.executemany("DELETE FROM sources WHERE hash = ?", [(digest,) for digest in digests])
+
+
+download_cache = DownloadCache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_SIZE)
+
+
+def _remote_file(client: ManagingClient, path: Path) -> dict | None:
+    file_list = client.list_files(path.parent) or dict()
+    for file in file_list.get('files', []):
+        if file['name'] == path.name:
+            return file
+    return None
+
+
+def _target(path: Path, destination: Path) -> Path:
+    local_dir = DOWNLOADS_PATH if str(destination) == '.' else Path(destination)
+    if not local_dir.exists():
+        raise PathNotFoundError
+    return local_dir if local_dir.is_file() else local_dir / path.name
+
+
+# SHA-256 counted during download must match hash of remote file. Certutil can't hash empty file,
+# so it is checked by its hash of no bytes
+def _verify(path: Path, local: Path, transfer_id: str, expected: str) -> str:
+    actual = (journal.get(transfer_id) or dict()).get('sha256')
+    if not expected and local.stat().st_size == 0:
+        expected = hashlib.sha256().hexdigest()
+    if actual is None or actual != expected:
+        local.unlink(missing_ok=True)
+        journal.update(transfer_id, target=None, chunks=[], archive=None, sha256=None)
+        if not expected:
+            raise IOError(f"{path.name} can't be checked: remote PC didn't hash it")
+        raise IOError(f"{path.name} was damaged in transfer: SHA-256 {actual} instead of {expected}")
+    return actual
+
+
+# Download of file through cache. File which has same size and mtime as downloaded before, or same size and
+# remote hash as cached blob, is copied from cache. Every downloaded file is hashed by remote PC meanwhile,
+# and hash computed during download is checked against remote one. Continued transfers and small files
+# are checked too, but they are not looked up in cache nor kept there.
+# Remote is listing entry of file when caller has it, otherwise parent folder is listed to find it
+def download_cached(client: ManagingClient, path: Path, destination: Path, transfer_id: str,
+                    progress: ProgressCallback | None = None, on_ratio: RatioCallback | None = None,
+                    remote: dict | None = None, cancelled: Event | None = None) -> Path:
+    path = Path(path)
+    entry = journal.get(transfer_id) or dict()
+    cached = DOWNLOAD_CACHE_ENABLED and not entry.get('archive') and not entry.get('target')
+    if cached and remote is None:
+        remote = _remote_file(client, path)
+    cached = cached and remote is not None and (remote.get('size') or 0) >= DOWNLOAD_CACHE_MIN_SIZE
+    pc_id = str(client.device_id)
+    size, mtime = (remote['size'], remote.get('modification_time')) if cached else (None, None)
+
+    if cached:
+        digest = download_cache.known_hash(pc_id, str(path), size, mtime)
+        if digest is not None:
+            target = _target(path, destination)
+            if download_cache.restore(digest, target, progress):
+                return target
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        remote_hash = executor.submit(lambda: remote_hashes(client, [path])[str(path)])
+        if cached and download_cache.has_size(size):
+            target = _target(path, destination)
+            digest = remote_hash.result()
+            if digest and download_cache.restore(digest, target, progress):
+                download_cache.remember(pc_id, str(path), size, mtime, digest)
+                return target
+        local = download_compressed(client, path, destination, transfer_id, progress, on_ratio, cancelled)
+        expected = remote_hash.result()
+
+    actual = _verify(path, local, transfer_id, expected)
+    if cached:
+        download_cache.add(local, actual)
+        download_cache.remember(pc_id, str(path), size, mtime, actual)
+    return local
@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import Callable, List
+
+from PyQt6.QtCore import QMimeData, Qt, QUrl, QModelIndex, QPersistentModelIndex
+from PyQt6.QtGui import QDrag, QDragEnterEvent, QDragMoveEvent, QDropEvent
+from PyQt6.QtWidgets import QTreeView, QWidget, QAbstractItemView
+
+
+# Dragged files are downloaded only when drop target asks for them, not when drag starts
+class LazyMimeData(QMimeData):
+    def __init__(self, indexes: List[QPersistentModelIndex], materialize: Callable):
+        super().__init__()
+        self.indexes = indexes
+        self.materialize = materialize
+        self.urls_list: List[QUrl] | None = None
+
+    def formats(self) -> List[str]:
+        return ["text/uri-list"]
+
+    def hasFormat(self, mime_type: str) -> bool:
+        return mime_type == "text/uri-list"
+
+    def retrieveData(self, mime_type: str, preferred_type):
+        if mime_type != "text/uri-list":
+            return super().retrieveData(mime_type, preferred_type)
+        if self.urls_list is None:
+            self.urls_list = [QUrl.fromLocalFile(str(path)) for path in self.materialize(self.indexes)]
+        return self.urls_list
+
+
+class DragNDropTreeView(QTreeView):
+    def __init__(self, parent: QWidget, drag_processing: Callable, drop_processing: Callable,
+                 remote_drop_processing: Callable | None = None):
+        super().__init__(parent)
+        self.logger = parent.logger
+        self.drag_processing = drag_processing
+        self.drop_processing = drop_processing
+        self.remote_drop_processing = remote_drop_processing
+        self.setDragEnabled(True)
+        self.setDropIndicatorShown(True)
+        self.setDragDropMode(QAbstractItemView.DragDropMode.DragDrop)
+        self.setDefaultDropAction(Qt.DropAction.CopyAction)
+
+    def selected_rows(self) -> List[QModelIndex]:
+        return self.selectionModel().selectedRows(0) if self.selectionModel() is not None else []
+
+    def startDrag(self, supported_actions):
+        indexes = self.selected_rows()
+        if not indexes:
+            return
+        drag = QDrag(self)
+        drag.setMimeData(LazyMimeData(list(map(QPersistentModelIndex, indexes)), self.drag_processing))
+        drag.exec(supported_actions, Qt.DropAction.CopyAction)
+
+    def dragEnterEvent(self, event: QDragEnterEvent) -> None:
+        if event.mimeData().hasFormat("text/uri-list"):
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dragMoveEvent(self, event: QDragMoveEvent) -> None:
+        if event.mimeData().hasFormat("text/uri-list"):
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    # Drop of own items would download them just to upload them back
+    def dropEvent(self, event: QDropEvent) -> None:
+        if event.source() is self:
+            event.ignore()
+            return
+        index = self.indexAt(event.position().toPoint())
+        # Items of other PC are copied between servers, so they are not downloaded here
+        if isinstance(event.source(), DragNDropTreeView) and self.remote_drop_processing is not None:
+            self.remote_drop_processing(event.source(), index if index.isValid() else None)
+            self.logger.info("Got new drop from other PC")
+            event.acceptProposedAction()
+        elif event.mimeData().hasUrls():
+            for url in event.mimeData().urls():
+                file_path = url.toLocalFile()
+                self.drop_processing(Path(file_path), index if index.isValid() else None)
+            self.logger.info("Got new drop")
+            event.acceptProposedAction()
@@ -0,0 +1,470 @@
+from array import array
+from datetime import datetime
+from enum import Enum
+from math import isnan
+from pathlib import Path
+from typing import List, Dict, Any
+
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt, pyqtSignal
+from PyQt6.QtGui import QBrush, QColor
+
+from src.config import FETCH_BATCH
+
+
+class NodeState(Enum):
+    NOT_LOADED = 0
+    LOADING = 1
+    LOADED = 2
+    FAILED = 3
+
+
+# Listing of one remote directory stored as columns instead of item per entry.
+# Directories always come first: rows below dir_count are directories, the rest are files.
+class DirectoryNode:
+    __slots__ = ("name", "parent", "state", "error", "names", "mtimes", "sizes", "dir_count", "fetched",
+                 "children", "_rows")
+
+    def __init__(self, name: str, parent: "DirectoryNode | None"):
+        self.name = name
+        self.parent = parent
+        self.state = NodeState.NOT_LOADED
+        self.error = ""
+        self.names: List[str] = []
+        self.mtimes = array('d')
+        self.sizes = array('q')
+        self.dir_count = 0
+        self.fetched = 0
+        self.children: Dict[str, DirectoryNode] = dict()
+        self._rows: Dict[str, int] | None = None
+
+    def is_dir(self, row: int) -> bool:
+        return row < self.dir_count
+
+    # Node of subdirectory is created only when it is needed
+    def child(self, row: int) -> "DirectoryNode":
+        name = self.names[row]
+        if name not in self.children:
+            self.children[name] = DirectoryNode(name, self)
+        return self.children[name]
+
+    def row_of(self, name: str) -> int:
+        if self._rows is None:
+            self._rows = {name: row for row, name in enumerate(self.names)}
+        return self._rows[name]
+
+    def row(self) -> int:
+        return self.parent.row_of(self.name)
+
+    def path(self) -> Path:
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        return Path('/'.join(reversed(names)))
+
+    def is_attached(self) -> bool:
+        node = self
+        while node.parent is not None:
+            if node.parent.children.get(node.name) is not node:
+                return False
+            node = node.parent
+        return True
+
+    def set_entries(self, dirs: List[Dict[str, Any]], files: List[Dict[str, Any]]) -> None:
+        entries = dirs + files
+        self.names = [entry.get('name', "NOT_FOUND") for entry in entries]
+        self.mtimes = array('d', (self._number(entry.get('modification_time'), float('nan')) for entry in entries))
+        self.sizes = array('q', [-1] * len(dirs) + [self._number(file.get('size'), -1) for file in files])
+        self.dir_count = len(dirs)
+        self.fetched = 0
+        self.children.clear()
+        self._rows = None
+
+    def remove(self, row: int) -> None:
+        self.children.pop(self.names[row], None)
+        del self.names[row]
+        del self.mtimes[row]
+        del self.sizes[row]
+        if row < self.dir_count:
+            self.dir_count -= 1
+        if row < self.fetched:
+            self.fetched -= 1
+        self._rows = None
+
+    # Row is not exposed to view here, model decides whether it falls into fetched part
+    def insert(self, row: int, name: str, mtime: float, size: int, is_dir: bool) -> None:
+        self.names.insert(row, name)
+        self.mtimes.insert(row, mtime)
+        self.sizes.insert(row, size)
+        if is_dir:
+            self.dir_count += 1
+        self._rows = None
+
+    def same_mtime(self, row: int, mtime: float) -> bool:
+        return self.mtimes[row] == mtime or (isnan(self.mtimes[row]) and isnan(mtime))
+
+    # Returns whether anything was changed
+    def update(self, row: int, mtime: float, size: int) -> bool:
+        if self.same_mtime(row, mtime) and self.sizes[row] == size:
+            return False
+        self.mtimes[row] = mtime
+        self.sizes[row] = size
+        return True
+
+    def rename(self, row: int, name: str) -> None:
+        child = self.children.pop(self.names[row], None)
+        if child is not None:
+            child.name = name
+            self.children[name] = child
+        self.names[row] = name
+        self._rows = None
+
+    # Reorder entries, directories are kept before files. Returns old row of every new row
+    def sort(self, key, reverse: bool) -> List[int]:
+        order = sorted(range(self.dir_count), key=key, reverse=reverse)
+        order += sorted(range(self.dir_count, len(self.names)), key=key, reverse=reverse)
+        self.names = [self.names[row] for row in order]
+        self.mtimes = array('d', (self.mtimes[row] for row in order))
+        self.sizes = array('q', (self.sizes[row] for row in order))
+        self._rows = None
+        return order
+
+    @staticmethod
+    def _number(value: int | float | None, default: int | float) -> int | float:
+        return default if value is None else value
+
+
+class FileSystemModel(QAbstractItemModel):
+    item_renamed = pyqtSignal(QModelIndex, str)
+
+    HEADERS = ("Name", "Date modified", "Type", "Size")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = DirectoryNode("", None)
+        self.sort_column = 0
+        self.sort_order = Qt.SortOrder.AscendingOrder
+
+    # Node of directory pointed by index, root for invalid index
+    def node(self, index: QModelIndex) -> DirectoryNode:
+        if not index.isValid():
+            return self.root
+        return index.internalPointer().child(index.row())
+
+    # Same as node, but does not create nodes for directories which were never opened
+    def _existing_node(self, index: QModelIndex) -> DirectoryNode | None:
+        if not index.isValid():
+            return self.root
+        container = index.internalPointer()
+        return container.children.get(container.names[index.row()])
+
+    def node_index(self, node: DirectoryNode) -> QModelIndex:
+        if node.parent is None:
+            return QModelIndex()
+        return self.createIndex(node.row(), 0, node.parent)
+
+    def path(self, index: QModelIndex) -> Path:
+        if not index.isValid():
+            return Path("")
+        container = index.internalPointer()
+        return container.path() / container.names[index.row()]
+
+    def is_dir(self, index: QModelIndex) -> bool:
+        return self._is_entry(index) and index.internalPointer().is_dir(index.row())
+
+    def mtime(self, index: QModelIndex) -> float | None:
+        mtime = index.internalPointer().mtimes[index.row()]
+        return None if isnan(mtime) else mtime
+
+    # Size and mtime of file like in listing it came from
+    def listing_entry(self, index: QModelIndex) -> Dict[str, Any]:
+        return {'name': self.path(index).name, 'size': index.internalPointer().sizes[index.row()],
+                'modification_time': self.mtime(index)}
+
+    def is_root_entry(self, index: QModelIndex) -> bool:
+        return index.isValid() and index.internalPointer() is self.root
+
+    # Placeholder row is shown under directory which has no entries yet
+    @staticmethod
+    def _has_placeholder(node: DirectoryNode) -> bool:
+        return node.state in (NodeState.LOADING, NodeState.FAILED) and not node.names
+
+    def _is_entry(self, index: QModelIndex) -> bool:
+        return index.isValid() and not self._has_placeholder(index.internalPointer())
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self.node(parent))
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        return self.node_index(index.internalPointer())
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0 or (parent.isValid() and not self.is_dir(parent)):
+            return 0
+        node = self._existing_node(parent)
+        if node is None:
+            return 0
+        if self._has_placeholder(node):
+            return 1
+        return node.fetched
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self.HEADERS)
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.isValid() and not self.is_dir(parent):
+            return False
+        node = self._existing_node(parent)
+        return node is not None and (self._has_placeholder(node) or len(node.names) > 0)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        if parent.isValid() and not self.is_dir(parent):
+            return False
+        node = self._existing_node(parent)
+        return node is not None and node.fetched < len(node.names)
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        if parent.isValid() and not self.is_dir(parent):
+            return
+        node = self.node(parent)
+        count = min(FETCH_BATCH, len(node.names) - node.fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(parent, node.fetched, node.fetched + count - 1)
+        node.fetched += count
+        self.endInsertRows()
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if orientation != Qt.Orientation.Horizontal:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    # Display text is formatted only for rows which are actually shown
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        container = index.internalPointer()
+        row = index.row()
+        column = index.column()
+        if self._has_placeholder(container):
+            if role == Qt.ItemDataRole.DisplayRole and column == 0:
+                return "loading…" if container.state == NodeState.LOADING else "failed to load"
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return container.error or None
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if column == 0:
+                return container.names[row]
+            if column == 1:
+                mtime = container.mtimes[row]
+                return "" if isnan(mtime) else datetime.fromtimestamp(mtime).strftime("%d.%m.%Y %H:%M")
+            if column == 2:
+                return "directory" if container.is_dir(row) else Path(container.names[row]).suffix[1:]
+            if column == 3:
+                size = container.sizes[row]
+                return "" if size < 0 else f"{size // (2 ** 10):,} KB".replace(',', ' ')
+        if container.is_dir(row) and container.names[row] in container.children:
+            node = container.children[container.names[row]]
+            if node.state == NodeState.FAILED:
+                if role == Qt.ItemDataRole.ForegroundRole:
+                    return QBrush(QColor("red"))
+                if role == Qt.ItemDataRole.ToolTipRole:
+                    return node.error
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not self._is_entry(index):
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsDragEnabled
+        if self.is_dir(index):
+            flags |= Qt.ItemFlag.ItemIsDropEnabled
+        if index.column() == 0 and not self.is_root_entry(index):
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    # Rename locally, remote rename is done by listener of item_renamed
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if role != Qt.ItemDataRole.EditRole or index.column() != 0 or not self._is_entry(index):
+            return False
+        container = index.internalPointer()
+        old_name = container.names[index.row()]
+        if value == old_name or value.strip() == '' or value in container.names:
+            return False
+        self.rename(index, value)
+        self.item_renamed.emit(index, old_name)
+        return True
+
+    # Rename without asking for remote rename, e.g. to undo failed one
+    def rename(self, index: QModelIndex, name: str) -> None:
+        index.internalPointer().rename(index.row(), name)
+        self.dataChanged.emit(index, index.siblingAtColumn(self.columnCount() - 1))
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder) -> None:
+        self.sort_column = column
+        self.sort_order = order
+        self._resort(list(self._loaded_nodes(self.root)))
+
+    # Sort given nodes again, persistent indexes follow their rows
+    def _resort(self, nodes: List[DirectoryNode]) -> None:
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        moved = dict()
+        for node in nodes:
+            order_of_rows = self._sort_node(node)
+            moved[id(node)] = {old_row: new_row for new_row, old_row in enumerate(order_of_rows)}
+        new_indexes = []
+        for index in old_indexes:
+            container = index.internalPointer()
+            rows = moved.get(id(container))
+            row = index.row() if rows is None else rows[index.row()]
+            # Rows moved out of fetched part are dropped
+            if row < container.fetched or self._has_placeholder(container):
+                new_indexes.append(self.createIndex(row, index.column(), container))
+            else:
+                new_indexes.append(QModelIndex())
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def _sort_node(self, node: DirectoryNode) -> List[int]:
+        if self.sort_column == 0:
+            key = lambda row: node.names[row].lower()
+        elif self.sort_column == 1:
+            key = lambda row: -float('inf') if isnan(node.mtimes[row]) else node.mtimes[row]
+        elif self.sort_column == 2:
+            key = lambda row: (Path(node.names[row]).suffix.lower(), node.names[row].lower())
+        else:
+            key = lambda row: node.sizes[row]
+        return node.sort(key, self.sort_order == Qt.SortOrder.DescendingOrder)
+
+    def _loaded_nodes(self, node: DirectoryNode):
+        if node.names:
+            yield node
+        for child in node.children.values():
+            yield from self._loaded_nodes(child)
+
+    # Change state of directory and show or hide its placeholder row
+    def set_state(self, node: DirectoryNode, state: NodeState, error: str = "") -> None:
+        index = self.node_index(node)
+        had_placeholder = self._has_placeholder(node)
+        has_placeholder = state in (NodeState.LOADING, NodeState.FAILED) and not node.names
+        if had_placeholder and not has_placeholder:
+            self.beginRemoveRows(index, 0, 0)
+            node.state, node.error = state, error
+            self.endRemoveRows()
+        elif has_placeholder and not had_placeholder:
+            self.beginInsertRows(index, 0, 0)
+            node.state, node.error = state, error
+            self.endInsertRows()
+        else:
+            node.state, node.error = state, error
+            if has_placeholder:
+                placeholder = self.index(0, 0, index)
+                self.dataChanged.emit(placeholder, placeholder)
+        if index.isValid():
+            self.dataChanged.emit(index, index.siblingAtColumn(self.columnCount() - 1))
+
+    # Replace entries of directory, rows are exposed to view in batches by fetchMore
+    def import_data(self, node: DirectoryNode,
+                    dirs_to_show: List[Dict[str, Any]],
+                    files_to_show: List[Dict[str, Any]]) -> None:
+        index = self.node_index(node)
+        self.set_state(node, NodeState.LOADED)
+        if node.names and self._merge(node, index, dirs_to_show, files_to_show):
+            return
+        if node.fetched > 0:
+            self.beginRemoveRows(index, 0, node.fetched - 1)
+            node.set_entries([], [])
+            self.endRemoveRows()
+        node.set_entries(dirs_to_show, files_to_show)
+        self._sort_node(node)
+        self.fetchMore(index)
+        if index.isValid():
+            self.dataChanged.emit(index, index.siblingAtColumn(self.columnCount() - 1))
+
+    def remove(self, index: QModelIndex) -> None:
+        container = index.internalPointer()
+        self.beginRemoveRows(index.parent(), index.row(), index.row())
+        container.remove(index.row())
+        self.endRemoveRows()
+
+    # Calculated sizes of subdirectories by their names, names which are not in directory are skipped.
+    # Rows are sorted again only if asked, so running totals don't make rows jump
+    def set_dir_sizes(self, node: DirectoryNode, sizes: Dict[str, int], resort: bool = False) -> None:
+        index = self.node_index(node)
+        changed = []
+        for name, size in sizes.items():
+            try:
+                row = node.row_of(name)
+            except KeyError:
+                continue
+            if node.is_dir(row) and node.sizes[row] != size:
+                node.sizes[row] = size
+                changed.append(row)
+        shown = [row for row in changed if row < node.fetched]
+        if shown:
+            self.dataChanged.emit(self.index(min(shown), 3, index), self.index(max(shown), 3, index))
+        if resort and changed and self.sort_column == 3:
+            self._resort([node])
+
+    # (is_dir, mtime, size) of listing entry as it is stored in node
+    @staticmethod
+    def _entry(entry: Dict[str, Any], is_dir: bool) -> tuple:
+        mtime = DirectoryNode._number(entry.get('modification_time'), float('nan'))
+        return is_dir, mtime, -1 if is_dir else DirectoryNode._number(entry.get('size'), -1)
+
+    # Refresh of shown directory changes only rows which differ from new listing, so expanded
+    # subdirectories, selection and scroll position stay. Returns False when so much has changed
+    # that replacing whole listing is cheaper
+    def _merge(self, node: DirectoryNode, index: QModelIndex,
+               dirs: List[Dict[str, Any]], files: List[Dict[str, Any]]) -> bool:
+        new = {entry.get('name', "NOT_FOUND"): self._entry(entry, True) for entry in dirs}
+        new.update({entry.get('name', "NOT_FOUND"): self._entry(entry, False) for entry in files})
+        removed = [row for row, name in enumerate(node.names)
+                   if name not in new or new[name][0] != node.is_dir(row)]
+        kept = set(node.names).difference(node.names[row] for row in removed)
+        added = [name for name in new if name not in kept]
+        if len(removed) + len(added) > max(FETCH_BATCH, len(new) // 2):
+            return False
+
+        updated = False
+        for row, name in enumerate(node.names):
+            if name not in kept:
+                continue
+            is_dir, mtime, size = new[name]
+            # Calculated size of directory stays until directory changes
+            if is_dir and node.same_mtime(row, mtime):
+                size = node.sizes[row]
+            if node.update(row, mtime, size):
+                updated = True
+                if row < node.fetched:
+                    self.dataChanged.emit(self.index(row, 0, index), self.index(row, self.columnCount() - 1, index))
+        for row in reversed(removed):
+            if row < node.fetched:
+                self.beginRemoveRows(index, row, row)
+                node.remove(row)
+                self.endRemoveRows()
+            else:
+                node.remove(row)
+        # New entries are put at end of their part and moved to their place by sort
+        for name in added:
+            is_dir, mtime, size = new[name]
+            row = node.dir_count if is_dir else len(node.names)
+            exposed = row < node.fetched or node.fetched == len(node.names)
+            if exposed:
+                self.beginInsertRows(index, row, row)
+            node.insert(row, name, mtime, size, is_dir)
+            if exposed:
+                node.fetched += 1
+                self.endInsertRows()
+        if added or updated:
+            self._resort([node])
+        return True
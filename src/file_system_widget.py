@@ -1,38 +1,93 @@
-import sys
-from datetime import datetime
 from pathlib import Path
+from threading import Thread
 from typing import Tuple, List, Dict
 
-from PyQt6 import uic
-from PyQt6.QtCore import Qt, QRect, QPoint
+from PyQt6.QtCore import Qt, QRect, QPoint, QModelIndex, QPersistentModelIndex, QItemSelectionModel, QTimer, \
+    QEventLoop, pyqtSignal
 from PyQt6.QtGui import QAction
-from PyQt6.QtWidgets import QWidget, QTreeWidgetItem, QFileDialog, QMessageBox, QAbstractItemView, QMenu
+from PyQt6.QtWidgets import QWidget, QFileDialog, QMessageBox, QAbstractItemView, QMenu, QCheckBox, \
+    QListWidgetItem
 from filesocket import ManagingClient, ServerError, PathNotFoundError
 
-from src.threads import DownloadThread, UploadThread, CMDThread
-from src.dragndrop_tree_widget import DragNDropTreeWidget
-from src.taskbar_processor import TaskbarProcessor
+from src.threads import DownloadThread, UploadThread, ListFilesThread, UploadDirThread, \
+    DownloadDirThread, MirrorPlanThread, MirrorThread, CommandBatchThread, CopyThread, DirSizeThread
+from src.command_batch import CommandBatch
+from src.config import COMMAND_BATCH_DELAY, CRAWL_ENABLED, PREFETCH_ENABLED, AUTO_REFRESH_ENABLED, \
+    AUTO_REFRESH_INTERVAL, AUTO_REFRESH_LIMIT, SEARCH_DELAY
+from src.mirror import PULL, PUSH, describe_plan
+from src.dragndrop_tree_view import DragNDropTreeView
+from src.file_system_model import FileSystemModel, DirectoryNode, NodeState
+from src.listing_cache import ListingCache
+from src.metrics import metrics
+from src.prefetcher import Prefetcher
+from src.search_index import SearchIndex, Crawler
+from src.transfer_journal import journal
+from src.staging import StagingArea
+from src.task_scheduler import HIGH_PRIORITY, NORMAL_PRIORITY
+from src.task_thread import TaskThread
+from src.taskbar_processor import TaskbarProcessor, readable_size
+from src.ui_loader import load_ui
 
 
 class FileSystemWidget(QWidget):
+    root_listed = pyqtSignal()
+    search_found = pyqtSignal(int, object)
+
     def __init__(self, parent: QWidget, client: ManagingClient):
         super().__init__(parent)
-        uic.loadUi("res/ui/file_system_widget.ui", self)
+        load_ui("file_system_widget", self)
 
         self.logger = parent.logger
         self.client = client
 
-        self.treeWidget = DragNDropTreeWidget(self, self._drag_processing, self._drop_processing)
-        self.tree_widget_setup()
+        self.model = FileSystemModel(self)
+        self.treeView = DragNDropTreeView(self, self._drag_processing, self._drop_processing,
+                                          self._remote_drop_processing)
+        self.tree_view_setup()
+
+        self.root = self.model.root
+        self.loading = dict()
+        self.listing_cache = ListingCache()
+        self.staging = StagingArea()
 
-        self.root = self.treeWidget.invisibleRootItem()
-        self.item_old_name = ""
+        self.reveal_target: List[str] | None = None
+        self.search_index = SearchIndex(self.client.device_id)
+        self.crawler = Crawler(self.client, self.search_index)
+        self.workers: List[Thread] = []
+        if CRAWL_ENABLED:
+            self._start_worker(self.crawler.run)
+        self.destroyed.connect(lambda: self.crawler.stop())
+        # Tab is deleted only when nothing runs on its index, that is when its client is released
+        self.destroyed.connect(self.search_index.close)
+        self.prefetch_enabled = PREFETCH_ENABLED
+        self.claimed = set()
+        self.prefetcher = Prefetcher(self, self.client, self.listing_cache, self.search_index, self.loading,
+                                     self._on_prefetched)
+        self.search_sequence = 0
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.search_processing)
+        self.searchEdit.textChanged.connect(self._on_search_changed)
+        self.search_found.connect(self._show_search_results)
+        self.searchResults.itemDoubleClicked.connect(self.open_search_result)
 
         self.selection_processing()
         self.load_tree_widget(self.root)
-        self.treeWidget.itemDoubleClicked.connect(self.open_dir)
-        self.treeWidget.itemSelectionChanged.connect(self.selection_processing)
-        self.treeWidget.itemChanged.connect(self.rename_processing_back)
+        self.treeView.doubleClicked.connect(self.open_dir)
+        self.treeView.selectionModel().selectionChanged.connect(self.selection_processing)
+        self.model.item_renamed.connect(self.rename_processing_back)
+        self.pending_renames = []
+        self.rename_timer = QTimer(self)
+        self.rename_timer.setSingleShot(True)
+        self.rename_timer.setInterval(COMMAND_BATCH_DELAY)
+        self.rename_timer.timeout.connect(self._send_renames)
+        self.auto_refresh_timer = QTimer(self)
+        self.auto_refresh_timer.setInterval(AUTO_REFRESH_INTERVAL)
+        self.auto_refresh_timer.timeout.connect(self.auto_refresh)
+        self.auto_refresh_offset = 0
+        if AUTO_REFRESH_ENABLED:
+            self.auto_refresh_timer.start()
 
         self.downloadBtn.clicked.connect(self.download_processing)
         self.uploadBtn.clicked.connect(self.upload_processing)
@@ -40,62 +95,139 @@ class FileSystemWidget(QWidget):
         self.deleteBtn.clicked.connect(self.delete_processing)
 
         self.taskbar_processor = TaskbarProcessor(self, self.progressBar, self.progressBarText)
+        self.restore_transfers()
+
+    # Called by drop target when it asks for dragged files. Files are downloaded to staging area first,
+    # event loop keeps running meanwhile, so UI stays alive and progress is shown
+    def _drag_processing(self, indexes: List[QPersistentModelIndex]) -> List[Path]:
+        directory = self.staging.new_dir()
+        pending = set()
+        loop = QEventLoop(self)
+
+        def track(thread: TaskThread) -> None:
+            # Staged files don't outlive drag, so they are not journaled
+            thread.discard()
+            pending.add(thread.id)
+            thread.task_complete.connect(lambda thread_id: finish(thread_id))
+            thread.task_failed.connect(lambda thread_id, error: finish(thread_id))
+
+        def finish(thread_id: int) -> None:
+            pending.discard(thread_id)
+            if not pending:
+                loop.quit()
 
-    def _drag_processing(self, item: QTreeWidgetItem, temp_dir: Path) -> Path | None:
-        # TODO: fix "File saving error (OSError(22, 'Invalid argument'),)"
+        paths = []
+        for index in map(QModelIndex, indexes):
+            if not index.isValid():
+                continue
+            path = self.model.path(index)
+            if self.model.is_dir(index):
+                thread = DownloadDirThread(self, self.client, path, directory)
+                thread.task_found.connect(lambda task: track(self._on_task_found(task, priority=HIGH_PRIORITY)))
+            else:
+                thread = DownloadThread(self, self.client, path, directory, remote=self.model.listing_entry(index))
+            track(thread)
+            self.taskbar_processor.add_thread(thread, HIGH_PRIORITY)
+            paths.append(directory / path.name)
+        if pending:
+            loop.exec()
+        self.staging.release(directory)
+        self.logger.info(f"Dragged out {len(paths)} items")
+        return [path for path in paths if path.exists()]
+
+    def _drop_processing(self, path_from: Path, index_to: QModelIndex | None) -> None:
+        destination, index_dir = self._drop_destination(index_to)
+        node = None if index_dir is None else self.model.node(index_dir)
         try:
-            path = self._get_item_path(item)
-            filename = path.name
-            local_path = temp_dir / filename
-            self.taskbar_processor.add_thread(DownloadThread(self, self.client, path, temp_dir))
+            self._upload(path_from, destination, node)
+            if index_dir is not None:
+                self.open_dir(index_dir)
         except ServerError as e:
             self.logger.info(f"Server error {e.args}")
-            return None
         except PathNotFoundError:
             self.logger.info("Path does not exist")
-            return None
-        except IOError as e:
-            self.logger.info(f"File saving error {e.args}")
-            return None
-        return local_path
 
-    def _drop_processing(self, path_from: Path, item_to: QTreeWidgetItem | None) -> None:
-        if item_to is None:
-            destination = Path("")
+    def _drop_destination(self, index_to: QModelIndex | None) -> Tuple[Path, QModelIndex | None]:
+        if index_to is None:
+            return Path(""), None
+        index_to = index_to.siblingAtColumn(0)
+        index_dir = index_to if self.model.is_dir(index_to) else index_to.parent()
+        return self.model.path(index_dir), index_dir
+
+    # Drop from tree of other PC, selected items of that tree are copied directly between PCs
+    def _remote_drop_processing(self, source_view: DragNDropTreeView, index_to: QModelIndex | None) -> None:
+        source = source_view.parent()
+        destination, index_dir = self._drop_destination(index_to)
+        node = None if index_dir is None else self.model.node(index_dir)
+        for index in source_view.selected_rows():
+            thread = CopyThread(self, self.client, source.client, source.model.path(index), destination)
+            thread.task_complete.connect(lambda _: self._on_upload_complete(destination, node))
+            self.taskbar_processor.add_thread(thread)
+        if index_dir is not None:
+            self.open_dir(index_dir)
+
+    # Folders are walked by separate task, which hands found files to scheduler as it goes
+    def _upload(self, path: Path, destination: Path, node: DirectoryNode | None,
+                transfer_id: str | None = None) -> None:
+        if transfer_id is None and path.is_dir():
+            thread = UploadDirThread(self, self.client, path, destination)
+            thread.task_found.connect(lambda task: self._on_task_found(task, destination, node))
+        else:
+            thread = UploadThread(self, self.client, path, destination, transfer_id)
+        thread.task_complete.connect(lambda _: self._on_upload_complete(destination, node))
+        self.taskbar_processor.add_thread(thread)
+
+    def _download(self, index: QModelIndex, destination: Path = Path('')) -> None:
+        path = self.model.path(index)
+        if self.model.is_dir(index):
+            thread = DownloadDirThread(self, self.client, path, destination)
+            thread.task_found.connect(lambda task: self._on_task_found(task))
         else:
-            if self._is_dir(item_to):
-                item_dir = item_to
+            thread = DownloadThread(self, self.client, path, destination, remote=self.model.listing_entry(index))
+        self.taskbar_processor.add_thread(thread)
+
+    # Task found by folder walk: thread class with its arguments
+    def _on_task_found(self, task: tuple, destination: Path | None = None, node: DirectoryNode | None = None,
+                       priority: int = NORMAL_PRIORITY) -> TaskThread:
+        thread_class, *args = task
+        thread = thread_class(self, self.client, *args)
+        if destination is not None:
+            thread.task_complete.connect(lambda _: self.listing_cache.invalidate(str(thread.destination),
+                                                                                recursive=True))
+            thread.task_complete.connect(lambda _: self._on_upload_complete(destination, node))
+        self.taskbar_processor.add_thread(thread, priority)
+        return thread
+
+    # Uploaded file changes listing of destination, so refresh it if it is shown
+    def _on_upload_complete(self, destination: Path, node: DirectoryNode | None) -> None:
+        self.listing_cache.invalidate(str(destination))
+        if node is not None and node.state == NodeState.LOADED and node.is_attached():
+            self.load_tree_widget(node)
+
+    # Queue transfers which were not finished in previous session, they continue from last verified chunk
+    def restore_transfers(self) -> None:
+        unfinished = journal.unfinished(str(self.client.device_id))
+        for transfer_id, entry in unfinished:
+            if entry['kind'] == DownloadThread.kind:
+                self.taskbar_processor.add_thread(DownloadThread(self, self.client, Path(entry['path']),
+                                                                 Path(entry['destination']), transfer_id))
             else:
-                item_dir = item_to.parent()
-            destination = self._get_item_path(item_dir)
-        try:
-            self.taskbar_processor.add_thread(UploadThread(self, self.client, path_from, destination))
-            if item_to is not None:
-                self.open_dir(item_dir, 0)
-        except ServerError as e:
-            self.logger.info(f"Server error {e.args}")
-        except PathNotFoundError:
-            self.logger.info("Path does not exist")
+                self._upload(Path(entry['path']), Path(entry['destination']), None, transfer_id)
+        if unfinished:
+            self.logger.info(f"Restored {len(unfinished)} unfinished transfers")
 
-    def tree_widget_setup(self):
-        __qtreewidgetitem = QTreeWidgetItem()
-        __qtreewidgetitem.setTextAlignment(3, Qt.AlignmentFlag.AlignCenter)
-        __qtreewidgetitem.setTextAlignment(2, Qt.AlignmentFlag.AlignCenter)
-        __qtreewidgetitem.setTextAlignment(1, Qt.AlignmentFlag.AlignCenter)
-        __qtreewidgetitem.setTextAlignment(0, Qt.AlignmentFlag.AlignCenter)
-        self.treeWidget.setHeaderItem(__qtreewidgetitem)
-        self.treeWidget.setObjectName(u"treeWidget")
-        self.treeWidget.setGeometry(QRect(10, 60, 781, 501))
-        self.treeWidget.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
-        self.treeWidget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.treeWidget.setSortingEnabled(True)
-        self.treeWidget.header().setDefaultSectionSize(200)
-        __qtreewidgetitem.setText(0, "Name")
-        __qtreewidgetitem.setText(1, "Date modified")
-        __qtreewidgetitem.setText(2, "Type")
-        __qtreewidgetitem.setText(3, "Size")
-        self.treeWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.treeWidget.customContextMenuRequested.connect(self.open_context_menu)
+    def tree_view_setup(self):
+        self.treeView.setModel(self.model)
+        self.treeView.setObjectName(u"treeView")
+        self.treeView.setGeometry(QRect(10, 100, 781, 461))
+        self.treeView.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+        self.treeView.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.treeView.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.treeView.setUniformRowHeights(True)
+        self.treeView.setSortingEnabled(True)
+        self.treeView.header().setDefaultSectionSize(200)
+        self.treeView.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.treeView.customContextMenuRequested.connect(self.open_context_menu)
 
     # Context menu
     def open_context_menu(self, position: QPoint) -> None:
@@ -117,84 +249,301 @@ class FileSystemWidget(QWidget):
             download_action = QAction("Delete", menu)
             download_action.triggered.connect(self.delete_processing)
             menu.addAction(download_action)
-        menu.exec(self.treeWidget.mapToGlobal(position))
+        prefetch_action = QAction("Prefetch subdirectories", menu)
+        prefetch_action.setCheckable(True)
+        prefetch_action.setChecked(self.prefetch_enabled)
+        prefetch_action.toggled.connect(self.set_prefetch_enabled)
+        menu.addAction(prefetch_action)
+        auto_refresh_action = QAction("Auto refresh", menu)
+        auto_refresh_action.setCheckable(True)
+        auto_refresh_action.setChecked(self.auto_refresh_timer.isActive())
+        auto_refresh_action.toggled.connect(self.set_auto_refresh_enabled)
+        menu.addAction(auto_refresh_action)
+        crawl_action = QAction("Index for search", menu)
+        crawl_action.setToolTip("Walk whole PC in background, so search finds files in folders never opened")
+        crawl_action.setCheckable(True)
+        crawl_action.setChecked(self.crawler.is_running())
+        crawl_action.toggled.connect(self.set_crawl_enabled)
+        menu.addAction(crawl_action)
+        indexes = self.treeView.selected_rows()
+        if any(self.model.is_dir(index) for index in indexes):
+            size_action = QAction("Calculate size", menu)
+            size_action.triggered.connect(lambda: self.calculate_size_processing())
+            menu.addAction(size_action)
+            size_action = QAction("Recalculate size", menu)
+            size_action.setToolTip("Walk whole subtree again, without sizes saved earlier")
+            size_action.triggered.connect(lambda: self.calculate_size_processing(use_cache=False))
+            menu.addAction(size_action)
+        if len(indexes) == 1 and self.model.is_dir(indexes[0]):
+            mirror_action = QAction("Mirror to local folder...", menu)
+            mirror_action.triggered.connect(lambda: self.mirror_processing(PULL))
+            menu.addAction(mirror_action)
+            mirror_action = QAction("Mirror from local folder...", menu)
+            mirror_action.triggered.connect(lambda: self.mirror_processing(PUSH))
+            menu.addAction(mirror_action)
+        menu.exec(self.treeView.viewport().mapToGlobal(position))
 
-    # Expand directory
-    def load_tree_widget(self, parent: QTreeWidgetItem) -> None:
-        if parent == self.root:
-            try:
-                disks = self.client.cmd_command("wmic logicaldisk get name")['out'].split(':')
-            except ServerError as e:
-                self.logger.info(f"Server error {e.args}")
-                self.logger.info("Closing")
-                sys.exit()
-            disks = list(map(lambda s: s.split('\n')[-1], disks[:-1]))
-            dirs_to_show = list(map(lambda disk: {"name": f"{disk}:/", "modification_time": None}, disks))
-            files_to_show = []
-        else:
-            try:
-                file_list = self.client.list_files(self._get_item_path(parent))
-            except ServerError as e:
-                self.logger.info(f"Server error {e.args}")
-                self.logger.info("Closing")
-                sys.exit()
-            if file_list is None:
+    # Expand directory, listing is fetched in background and lands in import_data.
+    # Cached listing is shown at once and refreshed in background if it is stale
+    def load_tree_widget(self, node: DirectoryNode) -> None:
+        path = None if node is self.root else node.path()
+        key = "" if path is None else str(path)
+        cached = self.listing_cache.get(key)
+        if cached is not None:
+            file_list, fresh = cached
+            self.import_data(node, file_list['dirs'], file_list['files'])
+            if fresh:
                 return
-            dirs_to_show = file_list['dirs']
-            files_to_show = file_list['files']
-        self.import_data(parent, dirs_to_show, files_to_show)
+        if key in self.loading:
+            return
+        # Listing is already being prefetched, it is imported when it comes
+        if self.prefetcher.is_pending(key):
+            self.loading[key] = node
+            self.claimed.add(key)
+            self.model.set_state(node, NodeState.LOADING)
+            return
+        thread = ListFilesThread(self, self.client, path)
+        self.loading[key] = node
+        self.model.set_state(node, NodeState.LOADING)
+        thread.files_listed.connect(self._on_files_listed)
+        thread.listing_failed.connect(self._on_listing_failed)
+        thread.task_complete.connect(lambda _: thread.deleteLater())
+        self._start_worker(thread.execute)
 
-    # Create new items
-    @staticmethod
-    def import_data(parent: QTreeWidgetItem,
+    def _on_files_listed(self, key: str, file_list: Dict[str, List[Dict[str, str | int]]] | None) -> None:
+        node = self.loading.pop(key)
+        if file_list is not None:
+            self.listing_cache.put(key, file_list)
+            if not key:
+                self.root_listed.emit()
+            # Directories opened by user are kept fresh in search index too. Index is written in worker,
+            # as crawler may hold it for a while with large directory
+            if key:
+                mtime = self.model.mtime(self.model.node_index(node)) if node.is_attached() else None
+                self._start_worker(lambda: self.search_index.put_dir(key, mtime, file_list['dirs'],
+                                                                     file_list['files']))
+        if not node.is_attached():
+            return
+        if file_list is None:
+            self.model.set_state(node, NodeState.LOADED if node.names else NodeState.NOT_LOADED)
+            return
+        self.import_data(node, file_list['dirs'], file_list['files'])
+
+    def _on_prefetched(self, key: str, file_list: dict | None, error: str | None) -> None:
+        if key not in self.claimed:
+            return
+        self.claimed.remove(key)
+        if error is not None:
+            self._on_listing_failed(key, error)
+        else:
+            self._on_files_listed(key, file_list)
+
+    # Mark only failed node instead of closing app
+    def _on_listing_failed(self, key: str, error: str) -> None:
+        self.logger.info(f"Server error {error}")
+        node = self.loading.pop(key)
+        if node.is_attached():
+            self.model.set_state(node, NodeState.FAILED, error)
+        if self.reveal_target is not None:
+            self.logger.info(f"Can't open {'/'.join(self.reveal_target)}")
+            self.reveal_target = None
+
+    # Fill directory with entries
+    def import_data(self, node: DirectoryNode,
                     dirs_to_show: List[Dict[str, str | int]],
                     files_to_show: List[Dict[str, str | int]]) -> None:
-        children = parent.takeChildren()
-        for directory in dirs_to_show:
-            name = directory['name'] if 'name' in directory else "NOT_FOUND"
-            if 'modification_time' in directory and directory['modification_time'] is not None:
-                date = datetime.fromtimestamp(directory['modification_time']).strftime("%d.%m.%Y %H:%M")
-            else:
-                date = ""
-            directory_node = QTreeWidgetItem(parent, (name, date, "directory", ""))
-        for file in files_to_show:
-            name = file['name'] if 'name' in file else "NOT_FOUND"
-            if 'modification_time' in file:
-                date = datetime.fromtimestamp(file['modification_time']).strftime("%d.%m.%Y %H:%M")
-            else:
-                date = ""
-            size = str(file['size'] // (2 ** 10)) if 'size' in file else ""
-            size = ' '.join([size[max(i-3, 0):i] for i in range(len(size), 0, -3)][::-1])
-            # TODO: Fix default sort by size
-            file_node = QTreeWidgetItem(parent, (name, date, Path(name).suffix[1:], f"{size} KB"))
-
-    # Check is directory
-    @staticmethod
-    def _is_dir(item: QTreeWidgetItem) -> bool:
-        item_type = item.text(2)
-        return item_type == "directory"
-
-    # Get path of item
-    @staticmethod
-    def _get_item_path(item: QTreeWidgetItem) -> Path:
-        path = item.text(0)
-        parent = item.parent()
-        while parent is not None:
-            path = f"{parent.text(0)}/{path}"
-            parent = parent.parent()
-        return Path(path)
+        with metrics.timed("render"):
+            self.model.import_data(node, dirs_to_show, files_to_show)
+        # Sizes calculated earlier are shown for subdirectories which didn't change since
+        if node is not self.root and dirs_to_show:
+            mtimes = {entry.get('name'): entry.get('modification_time') for entry in dirs_to_show}
+            sizes = self.search_index.child_dir_sizes(str(node.path()), mtimes)
+            if sizes:
+                self.model.set_dir_sizes(node, sizes, resort=True)
+        if self.prefetch_enabled:
+            self.prefetcher.prefetch(node)
+        self._continue_reveal()
+
+    # Search in local index of remote PC, results replace tree while query is not empty
+    def _on_search_changed(self, query: str) -> None:
+        self.searchResults.setVisible(bool(query.strip()))
+        self.treeView.setVisible(not query.strip())
+        self.search_timer.start()
+
+    # Query runs on its own thread after typing pauses, results of older queries are dropped
+    def search_processing(self) -> None:
+        self.search_sequence += 1
+        sequence = self.search_sequence
+        query = self.searchEdit.text()
+        if not query.strip():
+            self.searchResults.clear()
+            return
+        self._start_worker(lambda: self.search_found.emit(sequence, self.search_index.search(query)))
+
+    def _show_search_results(self, sequence: int, results: List[tuple]) -> None:
+        if sequence != self.search_sequence:
+            return
+        self.searchResults.clear()
+        for parent, name, is_dir, size, mtime in results:
+            text = f"{name}    {parent}/" if is_dir else f"{name}    {parent}    {readable_size(size)}"
+            item = QListWidgetItem(text)
+            item.setData(Qt.ItemDataRole.UserRole, (parent, name))
+            self.searchResults.addItem(item)
+
+    def open_search_result(self, item: QListWidgetItem) -> None:
+        parent, name = item.data(Qt.ItemDataRole.UserRole)
+        self.searchEdit.clear()
+        parts = parent.split('/')
+        parts[0] += '/'
+        self.reveal_target = parts + [name]
+        self._continue_reveal()
+
+    # Open directories on the way to revealed item one by one, walk continues when next listing is imported
+    def _continue_reveal(self) -> None:
+        if self.reveal_target is None:
+            return
+        node = self.root
+        parent_index = QModelIndex()
+        for depth, name in enumerate(self.reveal_target):
+            if not node.names and node.state != NodeState.LOADED:
+                self.load_tree_widget(node)
+                return
+            if name not in node.names:
+                if node.state == NodeState.LOADED:
+                    self.logger.info(f"{'/'.join(self.reveal_target)} does not exist anymore")
+                    self.reveal_target = None
+                return
+            row = node.row_of(name)
+            while node.fetched <= row:
+                self.model.fetchMore(parent_index)
+            index = self.model.index(row, 0, parent_index)
+            if depth == len(self.reveal_target) - 1:
+                self.reveal_target = None
+                self.treeView.clearSelection()
+                self.treeView.scrollTo(index)
+                self.treeView.selectionModel().select(index, QItemSelectionModel.SelectionFlag.Select |
+                                                      QItemSelectionModel.SelectionFlag.Rows)
+                return
+            self.treeView.expand(index)
+            node = self.model.node(index)
+            parent_index = index
+
+    def set_prefetch_enabled(self, enabled: bool) -> None:
+        self.prefetch_enabled = enabled
+        self.logger.info(f"Prefetch {'enabled' if enabled else 'disabled'}")
+
+    def set_auto_refresh_enabled(self, enabled: bool) -> None:
+        if enabled:
+            self.auto_refresh_timer.start()
+        else:
+            self.auto_refresh_timer.stop()
+        self.logger.info(f"Auto refresh {'enabled' if enabled else 'disabled'}")
+
+    # Stopped crawler may still finish its current listing, so new one is started instead of old one
+    def set_crawl_enabled(self, enabled: bool) -> None:
+        self.crawler.stop()
+        if enabled:
+            self.crawler = Crawler(self.client, self.search_index)
+            self._start_worker(self.crawler.run)
+        self.logger.info(f"Indexing for search {'enabled' if enabled else 'disabled'}")
+
+    # Expanded directories whose rows are shown, parents before children
+    def _shown_expanded_nodes(self) -> List[DirectoryNode]:
+        nodes = []
+        to_visit = [self.root]
+        while to_visit:
+            node = to_visit.pop(0)
+            for name, child in node.children.items():
+                row = node.row_of(name)
+                if row < node.fetched and child.state == NodeState.LOADED and \
+                        self.treeView.isExpanded(self.model.index(row, 0, self.model.node_index(node))):
+                    nodes.append(child)
+                    to_visit.append(child)
+        return nodes
+
+    # Shown directories are listed again by turns, at most AUTO_REFRESH_LIMIT per tick and only while
+    # tab is visible. Unchanged listing leaves model untouched, so tick costs only requests
+    def auto_refresh(self) -> None:
+        if not self.isVisible() or not self.treeView.isVisible():
+            return
+        nodes = self._shown_expanded_nodes()
+        if not nodes:
+            return
+        start = self.auto_refresh_offset % len(nodes)
+        self.auto_refresh_offset = start + AUTO_REFRESH_LIMIT
+        for node in (nodes[start:] + nodes[:start])[:AUTO_REFRESH_LIMIT]:
+            key = str(node.path())
+            if key not in self.loading:
+                self.listing_cache.invalidate(key)
+                self.load_tree_widget(node)
 
     # Expand directory
-    def open_dir(self, item: QTreeWidgetItem, column: int) -> None:
-        if not self._is_dir(item):
+    def open_dir(self, index: QModelIndex) -> None:
+        index = index.siblingAtColumn(0)
+        if not self.model.is_dir(index):
             return
-        self.load_tree_widget(item)
-        self.treeWidget.expandItem(item.parent())
-        item.setSelected(False)
+        path = str(self.model.path(index))
+        self._start_worker(lambda: self.search_index.record_visit(path))
+        self.load_tree_widget(self.model.node(index))
+        self.treeView.expand(index.parent())
+        self.treeView.selectionModel().select(index, QItemSelectionModel.SelectionFlag.Deselect |
+                                              QItemSelectionModel.SelectionFlag.Rows)
+
+    # Sizes of selected directories with all their contents, totals are shown while subtrees are walked
+    def calculate_size_processing(self, use_cache: bool = True) -> None:
+        for index in self.treeView.selected_rows():
+            if not self.model.is_dir(index):
+                continue
+            thread = DirSizeThread(self, self.client, self.model.path(index), self.model.mtime(index),
+                                   self.search_index, use_cache)
+            thread.sizes_found.connect(self._on_sizes_found)
+            self.taskbar_processor.add_thread(thread)
+
+    def _on_sizes_found(self, totals: Dict[str, int], finished: bool) -> None:
+        by_parent: Dict[str, Dict[str, int]] = dict()
+        for key, size in totals.items():
+            parent, _, name = key.rpartition('/')
+            # Disks are named like "C:/" in root
+            by_parent.setdefault(parent, dict())[name if parent else name + '/'] = size
+        for parent, sizes in by_parent.items():
+            node = self._node_by_key(parent)
+            if node is not None and node.names and node.is_attached():
+                self.model.set_dir_sizes(node, sizes, resort=finished)
+
+    # Node of directory with key like in search index, None if it was never opened
+    def _node_by_key(self, key: str) -> DirectoryNode | None:
+        if not key:
+            return self.root
+        disk, *names = key.split('/')
+        node = self.root.children.get(disk + '/')
+        for name in names:
+            if node is None:
+                return None
+            node = node.children.get(name)
+        return node
+
+    # Threads outside of scheduler: listings, searches and crawler
+    def _start_worker(self, target) -> None:
+        worker = Thread(target=target, daemon=True)
+        self.workers = [thread for thread in self.workers if thread.is_alive()] + [worker]
+        worker.start()
+
+    # Tab is closed: nothing new is started and running work is asked to stop
+    def shutdown(self) -> None:
+        self.auto_refresh_timer.stop()
+        self.search_timer.stop()
+        self.crawler.stop()
+        self.prefetcher.scheduler.shutdown()
+        self.taskbar_processor.shutdown()
+
+    # Widget may be deleted only when no thread can emit signals on it or its tasks
+    def is_idle(self) -> bool:
+        return self.taskbar_processor.is_idle() and self.prefetcher.scheduler.active_workers() == 0 and \
+            not any(thread.is_alive() for thread in self.workers)
 
     # Change availability of button based on count of selected items
     def selection_processing(self) -> None:
-        count = len(self.treeWidget.selectedItems())
+        count = len(self.treeView.selected_rows())
         if count == 0:
             self.downloadBtn.setEnabled(False)
             self.uploadBtn.setEnabled(True)
@@ -213,13 +562,12 @@ class FileSystemWidget(QWidget):
 
     # Download item
     def download_processing(self) -> None:
-        items = self.treeWidget.selectedItems()
-        self.treeWidget.clearSelection()
+        indexes = self.treeView.selected_rows()
+        self.treeView.clearSelection()
         try:
-            for item in items:
-                path = self._get_item_path(item)
-                self.taskbar_processor.add_thread(DownloadThread(self, self.client, path))
-            self.logger.info(f"Downloading {len(items)} files")
+            for index in indexes:
+                self._download(index)
+            self.logger.info(f"Downloading {len(indexes)} files")
         except ServerError as e:
             self.logger.info(f"Server error {e.args}")
         except PathNotFoundError:
@@ -229,43 +577,94 @@ class FileSystemWidget(QWidget):
 
     # Upload new item
     def upload_processing(self) -> None:
-        items = self.treeWidget.selectedItems()
-        destination = Path("") if len(items) == 0 else self._get_item_path(items[0])
+        indexes = self.treeView.selected_rows()
+        destination = Path("") if len(indexes) == 0 else self.model.path(indexes[0])
+        node = self.model.node(indexes[0]) if len(indexes) != 0 and self.model.is_dir(indexes[0]) else None
         paths = QFileDialog.getOpenFileNames(self, "Choose file to send", "")
-        self.treeWidget.clearSelection()
+        self.treeView.clearSelection()
         try:
             for path in paths[0]:
-                self.taskbar_processor.add_thread(UploadThread(self, self.client, Path(path), destination))
+                self._upload(Path(path), destination, node)
             self.logger.info(f"Uploaded {len(paths[0])} files")
         except ServerError as e:
             self.logger.info(f"Server error {e.args}")
         except PathNotFoundError:
             self.logger.info("Path does not exist")
 
-    # Rename in TreeWidget
-    def rename_processing_front(self) -> None:
-        item = self.treeWidget.selectedItems()[0]
-        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable)
-        self.item_old_name = item.text(0)
-        self.treeWidget.editItem(item, 0)
-        self.treeWidget.clearSelection()
-
-    # Rename on PC
-    def rename_processing_back(self, item: QTreeWidgetItem, column: int) -> None:
-        if column != 0 or self.item_old_name == "" or item.parent() is None:
-            self.item_old_name = ""
+    # Mirror selected directory with local folder, plan is shown as dry run before anything is changed
+    def mirror_processing(self, direction: str) -> None:
+        index = self.treeView.selected_rows()[0]
+        remote_root = self.model.path(index)
+        node = self.model.node(index)
+        local_root = QFileDialog.getExistingDirectory(self, "Choose local folder to mirror")
+        if not local_root:
             return
-        item_new_name = item.text(0)
-        parent_path = self._get_item_path(item.parent())
-        try:
-            self.logger.debug(f"""Device rename response 
-            {self.client.cmd_command(f'ren "{parent_path / self.item_old_name}" "{item_new_name}"')}""")
-            # TODO: fix paths with spaces
-        except ServerError as e:
-            self.logger.info(f"Server error {e.args}")
-        self.item_old_name = ""
-        item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-        self.logger.info("Renamed item")
+        self.treeView.clearSelection()
+        thread = MirrorPlanThread(self, self.client, Path(local_root), remote_root, direction)
+        thread.plan_ready.connect(lambda plan: self._confirm_mirror(plan, node))
+        thread.task_failed.connect(lambda _, error: self.logger.info(f"Mirror failed {error}"))
+        self.taskbar_processor.add_thread(thread)
+
+    def _confirm_mirror(self, plan: dict, node: DirectoryNode) -> None:
+        size = readable_size(plan['bytes'])
+        box = QMessageBox(self)
+        box.setWindowTitle("Mirror preview")
+        box.setText(f"{len(plan['copy'])} files ({size}) will be {plan['direction']}ed, "
+                    f"{plan['unchanged']} files are up to date, {len(plan['delete'])} files and "
+                    f"{len(plan['delete_dirs'])} folders are missing in source.")
+        box.setDetailedText(describe_plan(plan, readable_size))
+        delete_box = QCheckBox("Delete files and folders which are missing in source")
+        if plan['delete'] or plan['delete_dirs']:
+            box.setCheckBox(delete_box)
+        box.setStandardButtons(QMessageBox.StandardButton.Apply | QMessageBox.StandardButton.Cancel)
+        if not plan['copy'] and not plan['delete'] and not plan['delete_dirs']:
+            box.setStandardButtons(QMessageBox.StandardButton.Ok)
+        if box.exec() != QMessageBox.StandardButton.Apply:
+            self.logger.info("Mirror plan was not applied")
+            return
+        thread = MirrorThread(self, self.client, plan, delete_box.isChecked())
+        if plan['direction'] == PUSH:
+            thread.task_found.connect(lambda task: self._on_task_found(task, plan['remote_root'], node))
+            thread.task_complete.connect(lambda _: self._on_upload_complete(plan['remote_root'], node))
+            thread.task_complete.connect(lambda _: self.listing_cache.invalidate(str(plan['remote_root']),
+                                                                                recursive=True))
+        else:
+            thread.task_found.connect(lambda task: self._on_task_found(task))
+        self.taskbar_processor.add_thread(thread)
+        self.logger.info(f"Mirroring {len(plan['copy'])} files")
+
+    # Rename in TreeView
+    def rename_processing_front(self) -> None:
+        index = self.treeView.selected_rows()[0]
+        self.treeView.clearSelection()
+        self.treeView.edit(index)
+
+    # Rename on PC. Renames are collected for a moment and sent as one command, failed ones are undone
+    def rename_processing_back(self, index: QModelIndex, old_name: str) -> None:
+        self.pending_renames.append((QPersistentModelIndex(index), self.model.path(index.parent()), old_name,
+                                     self.model.path(index).name))
+        self.rename_timer.start()
+
+    def _send_renames(self) -> None:
+        renames, self.pending_renames = self.pending_renames, []
+        batch = CommandBatch()
+        for index, parent_path, old_name, new_name in renames:
+            batch.rename(parent_path / old_name, new_name)
+        thread = CommandBatchThread(self, self.client, batch, f"Renaming {len(renames)} items")
+        thread.batch_done.connect(lambda results: self._on_renamed(renames, results))
+        thread.task_failed.connect(lambda _, error: self._on_renamed(renames, [False] * len(renames)))
+        self.taskbar_processor.add_thread(thread)
+
+    def _on_renamed(self, renames: list, results: List[bool]) -> None:
+        for (index, parent_path, old_name, new_name), renamed in reversed(list(zip(renames, results))):
+            self.listing_cache.invalidate(str(parent_path))
+            self.listing_cache.invalidate(str(parent_path / old_name), recursive=True)
+            if renamed:
+                continue
+            self.logger.info(f"Failed to rename {parent_path / old_name}")
+            if index.isValid():
+                self.model.rename(QModelIndex(index), old_name)
+        self.logger.info(f"Renamed {sum(results)} of {len(renames)} items")
 
     # Display confirmation window on delete
     def _confirm_delete(self, files: Tuple[str]) -> bool:
@@ -280,21 +679,32 @@ class FileSystemWidget(QWidget):
         self.logger.debug("Created confirmation window")
         return box.exec() == QMessageBox.StandardButton.Yes
 
-    # Delete item
+    # Delete items by batched commands, only items which were actually deleted leave tree
     def delete_processing(self) -> None:
-        items = self.treeWidget.selectedItems()
-        if not self._confirm_delete(tuple(item.text(0) for item in items)):
+        indexes = list(map(QPersistentModelIndex, self.treeView.selected_rows()))
+        if not self._confirm_delete(tuple(self.model.path(QModelIndex(index)).name for index in indexes)):
             self.logger.debug("User refused delete")
             return
-        try:
-            for item in items:
-                path = self._get_item_path(item)
-                if self._is_dir(item):
-                    self.taskbar_processor.add_thread(CMDThread(self, self.client, f'rmdir /s "{path}"'))
-                else:
-                    self.taskbar_processor.add_thread(CMDThread(self, self.client, f'del /f "{path}"'))
-                (item.parent() or self.root).removeChild(item)
-        except ServerError as e:
-            self.logger.info(f"Server error {e.args}")
-            return
-        self.logger.info(f"Deleted {len(items)} files")
+        self.treeView.clearSelection()
+        batch = CommandBatch()
+        paths = []
+        for index in map(QModelIndex, indexes):
+            paths.append(self.model.path(index))
+            batch.delete(paths[-1], self.model.is_dir(index))
+        thread = CommandBatchThread(self, self.client, batch, f"Deleting {len(paths)} items")
+        thread.batch_done.connect(lambda results: self._on_deleted(indexes, paths, results))
+        thread.task_failed.connect(lambda _, error: self.logger.info(f"Server error {error}"))
+        self.taskbar_processor.add_thread(thread)
+
+    def _on_deleted(self, indexes: List[QPersistentModelIndex], paths: List[Path], results: List[bool]) -> None:
+        for index, path, deleted in zip(indexes, paths, results):
+            self._invalidate_deleted(path)
+            if not deleted:
+                self.logger.info(f"Failed to delete {path}")
+            elif index.isValid():
+                self.model.remove(QModelIndex(index))
+        self.logger.info(f"Deleted {sum(results)} of {len(paths)} items")
+
+    def _invalidate_deleted(self, path: Path) -> None:
+        self.listing_cache.invalidate(str(path.parent))
+        self.listing_cache.invalidate(str(path), recursive=True)
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from time import monotonic
+from typing import Dict, List, Tuple
+
+from src.config import LISTING_CACHE_SIZE, LISTING_CACHE_TTL
+
+
+# LRU cache of list_files results keyed by remote path.
+# Entries older than ttl are still returned, but marked as stale so caller can revalidate them.
+class ListingCache:
+    def __init__(self, max_size: int = LISTING_CACHE_SIZE, ttl: float = LISTING_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[str, Tuple[float, Dict[str, List[dict]]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    # Returns listing and whether it is still fresh or None on miss
+    def get(self, key: str) -> Tuple[Dict[str, List[dict]], bool] | None:
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            stored, file_list = self.entries[key]
+            return file_list, monotonic() - stored <= self.ttl
+
+    def put(self, key: str, file_list: Dict[str, List[dict]]) -> None:
+        with self.lock:
+            self.entries[key] = (monotonic(), file_list)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    # Drop listing of path and, if recursive, listings of all its subdirectories
+    def invalidate(self, key: str, recursive: bool = False) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+            if recursive:
+                path = Path(key)
+                for cached in [cached for cached in self.entries if Path(cached).is_relative_to(path)]:
+                    del self.entries[cached]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
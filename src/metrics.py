@@ -0,0 +1,124 @@
+import json
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List, Iterator
+
+from src.config import METRICS_BUCKETS
+
+
+# Latency histogram, byte count and error count of every kind of remote operation and of rendering.
+# Histograms have fixed buckets, so recording is cheap and quantiles are estimated by bucket bounds
+
+class Measurement:
+    def __init__(self):
+        self.bytes = 0
+        self.failed = False
+
+
+class OperationStats:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # Last bucket counts values above all bounds
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.bytes = 0
+
+    def observe(self, seconds: float, bytes_count: int, failed: bool) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.errors += failed
+        self.bytes += bytes_count
+
+    # Upper bound of bucket where quantile falls, max for values above all bounds
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "bytes": self.bytes,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(map(str, self.buckets + ("+Inf",)), self.counts)),
+        }
+
+
+class Metrics:
+    def __init__(self, buckets: tuple = METRICS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = Lock()
+        self.operations: Dict[str, OperationStats] = dict()
+
+    def observe(self, operation: str, seconds: float, bytes_count: int = 0, failed: bool = False) -> None:
+        with self.lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = OperationStats(self.buckets)
+            stats.observe(seconds, bytes_count, failed)
+
+    # Times block, exception leaving block counts as error. Block may add bytes and mark itself failed
+    @contextmanager
+    def timed(self, operation: str) -> Iterator[Measurement]:
+        measurement = Measurement()
+        started = perf_counter()
+        try:
+            yield measurement
+        except Exception:
+            measurement.failed = True
+            raise
+        finally:
+            self.observe(operation, perf_counter() - started, measurement.bytes, measurement.failed)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self.lock:
+            return {operation: stats.summary() for operation, stats in sorted(self.operations.items())}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.operations.clear()
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    # Prometheus text exposition format, buckets are cumulative there
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = ["# HELP filesocket_operation_seconds Latency of remote operations and rendering",
+                 "# TYPE filesocket_operation_seconds histogram"]
+        for operation, summary in snapshot.items():
+            cumulative = 0
+            for bound, count in summary["buckets"].items():
+                cumulative += count
+                lines.append(f'filesocket_operation_seconds_bucket{{operation="{operation}",le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'filesocket_operation_seconds_sum{{operation="{operation}"}} {summary["sum"]}')
+            lines.append(f'filesocket_operation_seconds_count{{operation="{operation}"}} {summary["count"]}')
+        for name, description in (("bytes", "Bytes sent or received"), ("errors", "Failed operations")):
+            lines.append(f"# HELP filesocket_operation_{name}_total {description}")
+            lines.append(f"# TYPE filesocket_operation_{name}_total counter")
+            lines += [f'filesocket_operation_{name}_total{{operation="{operation}"}} {summary[name]}'
+                      for operation, summary in snapshot.items()]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
@@ -0,0 +1,137 @@
+import base64
+import hashlib
+from collections import deque
+from os import walk
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Tuple
+
+from filesocket import ManagingClient
+
+from src.config import MIRROR_MTIME_TOLERANCE, CMD_LENGTH_LIMIT, TRANSFER_CHUNK_SIZE
+from src.transfer import run_command, _cmd_path
+
+
+# Mirror of directory between local folder and remote PC. Files are compared by size and mtime first,
+# files of equal size with different mtime are compared by sha256, remote hashes are counted by certutil.
+# Plan is built before anything is changed, so it can be shown as dry run
+
+PULL = "download"
+PUSH = "upload"
+
+# Relative posix path of file: (size, mtime)
+Tree = Dict[str, Tuple[int, float]]
+
+
+def remote_tree(client: ManagingClient, root: Path) -> Tuple[Tree, List[str]]:
+    files = dict()
+    dirs = []
+    to_visit = deque([PurePosixPath('')])
+    while to_visit:
+        relative = to_visit.popleft()
+        file_list = client.list_files(root / relative) or dict()
+        for directory in file_list.get('dirs', []):
+            dirs.append(str(relative / directory['name']))
+            to_visit.append(relative / directory['name'])
+        for file in file_list.get('files', []):
+            files[str(relative / file['name'])] = (file['size'], file['modification_time'] or 0.0)
+    return files, dirs
+
+
+def local_tree(root: Path) -> Tuple[Tree, List[str]]:
+    files = dict()
+    dirs = []
+    for current, directories, names in walk(root):
+        relative = PurePosixPath(Path(current).relative_to(root).as_posix())
+        dirs += [str(relative / directory) for directory in directories]
+        for name in names:
+            stat = (Path(current) / name).stat()
+            files[str(relative / name)] = (stat.st_size, stat.st_mtime)
+    return files, dirs
+
+
+def local_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as f:
+        while data := f.read(TRANSFER_CHUNK_SIZE):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+# certutil prints "SHA256 hash of <path>:" and hash on next line, older versions separate bytes by spaces
+def remote_hashes(client: ManagingClient, paths: List[Path]) -> Dict[str, str]:
+    hashes = dict()
+    commands = [f'certutil -hashfile {_cmd_path(path)} SHA256' for path in paths]
+    batch = []
+    for command in commands + [None]:
+        if batch and (command is None or len(' & '.join(batch + [command])) > CMD_LENGTH_LIMIT):
+            lines = ((run_command(client, ' & '.join(batch)) or dict()).get('out') or '').splitlines()
+            for line, next_line in zip(lines, lines[1:]):
+                if line.startswith('SHA256 hash of '):
+                    name = line.removeprefix('SHA256 hash of ').rstrip(':')
+                    hashes[name.replace('\\', '/').lower()] = next_line.replace(' ', '').strip().lower()
+            batch = []
+        if command is not None:
+            batch.append(command)
+    return {str(path): hashes.get(str(path).replace('\\', '/').lower(), '') for path in paths}
+
+
+# Uploaded file gets time of upload as its mtime, so mtime of source is set by PowerShell, otherwise next push
+# would hash every file sent before. Script is passed encoded, so path needs no escaping for cmd
+def set_remote_mtime(client: ManagingClient, path: Path, mtime: float) -> None:
+    literal = str(path).replace('/', '\\').replace("'", "''")
+    script = (f"(Get-Item -LiteralPath '{literal}').LastWriteTimeUtc = "
+              f"[DateTime]::new(1970, 1, 1, 0, 0, 0, 'Utc').AddSeconds({mtime!r})")
+    encoded = base64.b64encode(script.encode('utf-16-le')).decode()
+    run_command(client, f'powershell -NoProfile -NonInteractive -EncodedCommand {encoded}')
+
+
+# Plan of mirror from source side to target side:
+# copy - (relative path, size, mtime, reason), delete - relative paths missing in source, dirs - dirs to create,
+# delete_dirs - topmost dirs missing in source, files inside them are in delete too
+def make_plan(client: ManagingClient, local_root: Path, remote_root: Path, direction: str) -> dict:
+    remote_files, remote_dirs = remote_tree(client, remote_root)
+    local_files, local_dirs = local_tree(local_root)
+    if direction == PULL:
+        source, target, source_dirs, target_dirs = remote_files, local_files, remote_dirs, local_dirs
+    else:
+        source, target, source_dirs, target_dirs = local_files, remote_files, local_dirs, remote_dirs
+
+    copy = []
+    suspects = []
+    for relative, (size, mtime) in sorted(source.items()):
+        if relative not in target:
+            copy.append((relative, size, mtime, "new"))
+        elif target[relative][0] != size:
+            copy.append((relative, size, mtime, "size changed"))
+        elif abs(target[relative][1] - mtime) > MIRROR_MTIME_TOLERANCE:
+            suspects.append((relative, size, mtime))
+
+    # Same size, other mtime: only content tells whether file was changed
+    if suspects:
+        remote = remote_hashes(client, [remote_root / relative for relative, size, mtime in suspects])
+        for relative, size, mtime in suspects:
+            remote_hash = remote[str(remote_root / relative)]
+            if not remote_hash or remote_hash != local_hash(local_root / relative):
+                copy.append((relative, size, mtime, "content changed"))
+
+    extra_dirs = set(target_dirs) - set(source_dirs)
+    return {
+        "direction": direction,
+        "local_root": local_root,
+        "remote_root": remote_root,
+        "copy": copy,
+        "delete": sorted(set(target) - set(source)),
+        "dirs": sorted(set(source_dirs) - set(target_dirs)),
+        "delete_dirs": sorted(directory for directory in extra_dirs
+                              if not any(str(parent) in extra_dirs for parent in PurePosixPath(directory).parents)),
+        "unchanged": len(source) - len(copy),
+        "bytes": sum(size for relative, size, mtime, reason in copy),
+    }
+
+
+def describe_plan(plan: dict, size_format) -> str:
+    lines = [f"{plan['direction']} {relative} ({reason}, {size_format(size)})"
+             for relative, size, mtime, reason in plan['copy']]
+    lines += [f"delete {relative}" for relative in plan['delete']]
+    lines += [f"delete folder {relative}" for relative in plan['delete_dirs']]
+    return '\n'.join(lines)
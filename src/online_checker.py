@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Iterable, Dict
+
+import requests
+from PyQt6.QtCore import QObject, pyqtSignal
+from filesocket import PCEntity
+from filesocket.config import store_keeper, PATH, GET_NGROK_IP, NGROK_CHECK_ONLINE
+
+from src.config import PROBE_WORKERS, PROBE_TIMEOUT, ONLINE_CACHE_TTL
+from src.metrics import metrics
+
+
+class OnlineChecker(QObject):
+    pc_checked = pyqtSignal(int, bool)
+    all_checked = pyqtSignal()
+
+    def __init__(self, parent: QObject):
+        super().__init__(parent)
+        self.store_keeper = store_keeper
+        self.cache = self._load_cache()
+        self.executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+        self.pending = 0
+        self.pc_checked.connect(self._save_result)
+
+    # Get fresh availability from cache or None if PC has to be probed
+    def cached(self, pc_id: int) -> bool | None:
+        entry = self.cache.get(str(pc_id))
+        if entry is None or time() - entry['checked'] > ONLINE_CACHE_TTL:
+            return None
+        return entry['online']
+
+    # Start probing of PCs which are not in cache
+    def check(self, all_pc: Iterable[PCEntity]) -> None:
+        to_probe = [pc for pc in all_pc if self.cached(pc.id) is None]
+        self.pending = len(to_probe)
+        if self.pending == 0:
+            self.all_checked.emit()
+            return
+        for pc in to_probe:
+            self.executor.submit(self._probe, pc)
+
+    # Abandon probes which are still queued and keep results got so far
+    def stop(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.store_keeper.add_value("online_cache", self.cache)
+
+    # ManagingClient waits for PC without limit, so address of PC and its check are requested here with timeout.
+    # Probe of unreachable PC ends by itself and doesn't leave thread or socket behind
+    @staticmethod
+    def _check_online(pc: PCEntity) -> bool:
+        token = store_keeper.get_token()
+        if token is None:
+            return False
+        try:
+            with metrics.timed("connect"):
+                response = requests.get(f'http://{PATH}{GET_NGROK_IP}', json={"device_id": str(pc.id), "token": token},
+                                        timeout=PROBE_TIMEOUT)
+            ngrok_ip = response.json().get('ngrok_ip') if response.status_code == 200 else None
+            if ngrok_ip is None:
+                return False
+            with metrics.timed("check_online"):
+                return requests.get(f'{ngrok_ip}{NGROK_CHECK_ONLINE}', timeout=PROBE_TIMEOUT).status_code == 200
+        except (requests.RequestException, ValueError):
+            return False
+
+    def _probe(self, pc: PCEntity) -> None:
+        self.pc_checked.emit(pc.id, self._check_online(pc))
+
+    def _load_cache(self) -> Dict[str, Dict[str, bool | float]]:
+        try:
+            return self.store_keeper.get_value("online_cache")
+        except KeyError:
+            return dict()
+
+    # Runs in GUI thread, so cache is written by one thread only
+    def _save_result(self, pc_id: int, online: bool) -> None:
+        self.cache[str(pc_id)] = {"online": online, "checked": time()}
+        self.pending -= 1
+        if self.pending == 0:
+            self.store_keeper.add_value("online_cache", self.cache)
+            self.all_checked.emit()
@@ -0,0 +1,27 @@
+from PyQt6.QtWidgets import QTabWidget, QWidget
+
+from src.client_pool import PooledClient
+from src.console_widget import ConsoleWidget
+from src.file_system_widget import FileSystemWidget
+
+
+# Tabs of one PC, main window keeps one of these for every opened PC
+class PCWidget(QTabWidget):
+    def __init__(self, parent: QWidget, client: PooledClient):
+        super().__init__(parent)
+        self.logger = parent.logger
+        self.client = client
+
+        self.file_system = FileSystemWidget(self, self.client)
+        self.addTab(self.file_system, "File System")
+        self.console = ConsoleWidget(self, self.client)
+        self.addTab(self.console, "Console")
+        self.tabBar().setChangeCurrentOnDrag(True)
+        self.tabBar().setAcceptDrops(True)
+
+    def shutdown(self) -> None:
+        self.file_system.shutdown()
+        self.console.shutdown()
+
+    def is_idle(self) -> bool:
+        return self.file_system.is_idle() and self.console.is_idle()
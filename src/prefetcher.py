@@ -0,0 +1,65 @@
+from math import isnan
+from pathlib import Path
+from typing import Callable, Dict
+
+from PyQt6.QtCore import QObject
+from filesocket import ManagingClient
+
+from src.config import PREFETCH_COUNT, PREFETCH_WORKERS
+from src.file_system_model import DirectoryNode
+from src.listing_cache import ListingCache
+from src.search_index import SearchIndex
+from src.task_scheduler import TaskScheduler, LOW_PRIORITY
+from src.threads import ListFilesThread
+
+
+# Loads listings of subdirectories of opened directory in background, so next open usually finds
+# listing in cache. Directories opened before go first, then recently modified ones.
+# Prefetches run on own small pool and those which are not started yet are dropped on next open
+class Prefetcher:
+    def __init__(self, parent: QObject, client: ManagingClient, listing_cache: ListingCache,
+                 search_index: SearchIndex, loading: Dict[str, DirectoryNode], on_result: Callable):
+        self.parent = parent
+        self.client = client
+        self.listing_cache = listing_cache
+        self.search_index = search_index
+        self.loading = loading
+        self.on_result = on_result
+        self.scheduler = TaskScheduler(PREFETCH_WORKERS, {ListFilesThread.kind: PREFETCH_WORKERS})
+        self.pending: Dict[str, ListFilesThread] = dict()
+
+    def prefetch(self, node: DirectoryNode) -> None:
+        cancelled = set(self.scheduler.cancel_all())
+        for key, thread in list(self.pending.items()):
+            if thread.id in cancelled:
+                del self.pending[key]
+                thread.deleteLater()
+        path = node.path()
+        visits = self.search_index.visits(str(path))
+        rows = sorted(range(node.dir_count), reverse=True, key=lambda row: (
+            visits.get(node.names[row], 0), -float('inf') if isnan(node.mtimes[row]) else node.mtimes[row]))
+        for row in rows[:PREFETCH_COUNT]:
+            self._submit(path / node.names[row])
+
+    def _submit(self, path: Path) -> None:
+        key = str(path)
+        cached = self.listing_cache.get(key)
+        if key in self.pending or key in self.loading or (cached is not None and cached[1]):
+            return
+        thread = ListFilesThread(self.parent, self.client, path)
+        thread.files_listed.connect(lambda key, file_list: self._finish(key, file_list, None))
+        thread.listing_failed.connect(lambda key, error: self._finish(key, None, error))
+        thread.task_failed.connect(lambda _, error: self._finish(key, None, error))
+        thread.task_complete.connect(lambda _: thread.deleteLater())
+        self.pending[key] = thread
+        self.scheduler.submit(thread, LOW_PRIORITY)
+
+    def _finish(self, key: str, file_list: dict | None, error: str | None) -> None:
+        if self.pending.pop(key, None) is None:
+            return
+        if file_list is not None:
+            self.listing_cache.put(key, file_list)
+        self.on_result(key, file_list, error)
+
+    def is_pending(self, key: str) -> bool:
+        return key in self.pending
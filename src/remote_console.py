@@ -0,0 +1,93 @@
+import codecs
+import re
+from pathlib import Path, PureWindowsPath
+from tempfile import TemporaryDirectory
+from uuid import uuid4
+
+from filesocket import ManagingClient, ServerError
+
+from src.transfer import run_command, upload, _request_range, _raise_for_status, _cmd_path
+
+
+# Server runs command and answers only when it is finished, so long command is started as detached
+# process on remote PC. Its output goes to file, which is read by range requests while command runs,
+# and exit code is written to another file when it ends. Files live in public dir, its path has no spaces
+
+WORK_DIR = "filesocket_console"
+PROCESS_ID = re.compile(r'ProcessId = (\d+);')
+
+
+class RemoteJob:
+    def __init__(self, client: ManagingClient, command: str):
+        self.client = client
+        self.command = command
+        self.job_id = uuid4().hex[:12]
+        self.work_dir: PureWindowsPath | None = None
+        self.pid: int | None = None
+        self.offset = 0
+        self.decoder = codecs.getincrementaldecoder('cp866')(errors='replace')
+
+    def _file(self, suffix: str) -> PureWindowsPath:
+        return self.work_dir / f"console_{self.job_id}{suffix}"
+
+    # Returns False if command couldn't be started detached
+    def start(self) -> bool:
+        public = ((run_command(self.client, 'echo %PUBLIC%') or dict()).get('out') or '').strip()
+        if not public or '%' in public:
+            return False
+        self.work_dir = PureWindowsPath(public) / WORK_DIR
+        run_command(self.client, f'mkdir {_cmd_path(self.work_dir)}')
+        # Lines of command are fed to interactive cmd instead of being put into batch file, where "%" means
+        # other things, so command behaves as if typed at prompt. Last line hands exit code of command on
+        script = (f'@echo off\r\ncmd /d /q /k rem < "%~dp0{self._file(".in").name}" '
+                  f'> "%~dp0{self._file(".out").name}" 2>&1\r\n'
+                  f'echo %errorlevel%> "%~dp0{self._file(".done").name}"\r\n')
+        lines = self.command.replace('\r\n', '\n').split('\n') + ['exit %errorlevel%']
+        with TemporaryDirectory() as temp_dir:
+            for suffix, text in ((".in", '\r\n'.join(lines) + '\r\n'), (".bat", script)):
+                local_file = Path(temp_dir) / self._file(suffix).name
+                local_file.write_bytes(text.encode('cp866', errors='replace'))
+                upload(self.client, local_file, Path(str(self.work_dir)))
+        answer = run_command(self.client, f'wmic process call create "cmd /c {self._file(".bat")}"') or dict()
+        match = PROCESS_ID.search(answer.get('out') or '')
+        if match is None:
+            self.cleanup()
+            return False
+        self.pid = int(match.group(1))
+        return True
+
+    # Output which appeared since previous read
+    def read(self) -> str:
+        response = _request_range(self.client, Path(str(self._file(".out"))), self.offset, None, None)
+        try:
+            if response.status_code in (404, 416):
+                return ''
+            _raise_for_status(response, (206,))
+            data = response.content
+        finally:
+            response.close()
+        self.offset += len(data)
+        return self.decoder.decode(data)
+
+    # Exit code, None while command is running
+    def exit_code(self) -> int | None:
+        response = _request_range(self.client, Path(str(self._file(".done"))), None, None, None)
+        try:
+            if response.status_code == 404:
+                return None
+            _raise_for_status(response)
+            text = response.content.decode('cp866', errors='replace').strip()
+        finally:
+            response.close()
+        return int(text) if text.lstrip('-').isdigit() else -1
+
+    # Whole process tree is killed, because command may have started its own processes
+    def cancel(self) -> None:
+        if self.pid is not None:
+            run_command(self.client, f'taskkill /pid {self.pid} /t /f')
+
+    def cleanup(self) -> None:
+        try:
+            run_command(self.client, f'del /f /q {_cmd_path(self._file(".*"))}')
+        except ServerError:
+            pass
@@ -0,0 +1,229 @@
+import sqlite3
+from collections import deque
+from pathlib import Path
+from threading import Event, Lock
+from time import time, monotonic
+from typing import Dict, List, Tuple
+
+from filesocket import ManagingClient, ServerError
+
+from src.config import SEARCH_INDEX_FILE, CRAWL_RATE, CRAWL_INTERVAL, CRAWL_FULL_INTERVAL, SEARCH_LIMIT, \
+    DIR_SIZE_CACHE_TTL
+from src.transfer import list_disks
+
+
+# Local index of remote file system, one SQLite file per PC. Names are kept in FTS5 table with
+# trigram tokenizer, so any part of name is found without scanning. Directories are keyed by
+# their path with "/" separators, first part is disk like "C:"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL, crawled REAL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL);
+CREATE TABLE IF NOT EXISTS visits (path TEXT PRIMARY KEY, parent TEXT, count INTEGER);
+CREATE INDEX IF NOT EXISTS visits_parent ON visits (parent);
+CREATE TABLE IF NOT EXISTS sizes (path TEXT PRIMARY KEY, parent TEXT, mtime REAL, size INTEGER, calculated REAL);
+CREATE INDEX IF NOT EXISTS sizes_parent ON sizes (parent);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5(
+    name, ext, parent UNINDEXED, is_dir UNINDEXED, size UNINDEXED, mtime UNINDEXED, tokenize = 'trigram'
+);
+"""
+
+# (parent, name, is_dir, size, mtime)
+SearchResult = Tuple[str, str, bool, int, float]
+
+
+def _extension(name: str) -> str:
+    return Path(name).suffix[1:].lower()
+
+
+def _key(path: str) -> str:
+    return path.replace('\\', '/').rstrip('/')
+
+
+class SearchIndex:
+    def __init__(self, pc_id: int | str):
+        self.connection = sqlite3.connect(SEARCH_INDEX_FILE.format(pc_id), check_same_thread=False)
+        self.lock = Lock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.executescript(SCHEMA)
+        # Searches and reads from GUI thread have own connection, so they don't wait for transactions of crawler
+        self.reader = sqlite3.connect(SEARCH_INDEX_FILE.format(pc_id), check_same_thread=False)
+        self.reader_lock = Lock()
+
+    def dir_mtime(self, path: str) -> float | None:
+        with self.lock:
+            row = self.connection.execute("SELECT mtime FROM dirs WHERE path = ?", (_key(path),)).fetchone()
+        return None if row is None else row[0]
+
+    # Replace entries of one directory, entries of removed subdirectories are dropped too.
+    # Unknown mtime keeps the stored one, so directory isn't taken as changed by next crawl
+    def put_dir(self, path: str, mtime: float | None, dirs: List[dict], files: List[dict]) -> None:
+        key = _key(path)
+        names = {entry['name'] for entry in dirs}
+        with self.lock, self.connection:
+            for name in self._child_dirs(key):
+                if name not in names:
+                    self._drop_tree(f"{key}/{name}")
+            self.connection.execute("DELETE FROM entries WHERE parent = ?", (key,))
+            self.connection.executemany(
+                "INSERT INTO entries (name, ext, parent, is_dir, size, mtime) VALUES (?, ?, ?, ?, ?, ?)",
+                [(entry['name'], '', key, 1, -1, entry.get('modification_time')) for entry in dirs] +
+                [(entry['name'], _extension(entry['name']), key, 0, entry.get('size', -1),
+                  entry.get('modification_time')) for entry in files])
+            self.connection.execute("INSERT OR REPLACE INTO dirs (path, mtime, crawled) "
+                                    "VALUES (?, COALESCE(?, (SELECT mtime FROM dirs WHERE path = ?)), ?)",
+                                    (key, mtime, key, time()))
+
+    def _child_dirs(self, key: str) -> List[str]:
+        return [row[0] for row in self.connection.execute(
+            "SELECT name FROM entries WHERE parent = ? AND is_dir = 1", (key,)).fetchall()]
+
+    # Subdirectories with mtimes they had when directory was listed
+    def child_dirs(self, path: str) -> List[Tuple[str, float | None]]:
+        with self.lock:
+            return self.connection.execute("SELECT name, mtime FROM entries WHERE parent = ? AND is_dir = 1",
+                                           (_key(path),)).fetchall()
+
+    def _drop_tree(self, key: str) -> None:
+        self.connection.execute("DELETE FROM entries WHERE parent = ? OR parent LIKE ? ESCAPE '\\'",
+                                (key, self._like_prefix(key)))
+        self.connection.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                                (key, self._like_prefix(key)))
+        self.connection.execute("DELETE FROM sizes WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                                (key, self._like_prefix(key)))
+
+    @staticmethod
+    def _like_prefix(key: str) -> str:
+        return key.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%'
+
+    def meta(self, key: str) -> float:
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return 0.0 if row is None else row[0]
+
+    def set_meta(self, key: str, value: float) -> None:
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # How many times user opened directory, used to guess which directories are opened next
+    def record_visit(self, path: str) -> None:
+        key = _key(path)
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO visits (path, parent, count) VALUES (?, ?, 1) "
+                                    "ON CONFLICT (path) DO UPDATE SET count = count + 1",
+                                    (key, key.rpartition('/')[0]))
+
+    def visits(self, parent: str) -> Dict[str, int]:
+        with self.lock:
+            rows = self.connection.execute("SELECT path, count FROM visits WHERE parent = ?",
+                                           (_key(parent),)).fetchall()
+        return {path.rpartition('/')[2]: count for path, count in rows}
+
+    # Total size of directory with all subdirectories, if it was calculated when directory had same mtime
+    def dir_size(self, path: str, mtime: float | None) -> int | None:
+        if mtime is None:
+            return None
+        with self.lock:
+            row = self.connection.execute("SELECT size FROM sizes WHERE path = ? AND mtime = ? AND calculated > ?",
+                                          (_key(path), mtime, time() - DIR_SIZE_CACHE_TTL)).fetchone()
+        return None if row is None else row[0]
+
+    # Known totals of subdirectories, mtimes are those from listing of directory
+    def child_dir_sizes(self, path: str, mtimes: Dict[str, float | None]) -> Dict[str, int]:
+        with self.reader_lock:
+            rows = self.reader.execute("SELECT path, mtime, size FROM sizes WHERE parent = ? AND calculated > ?",
+                                           (_key(path), time() - DIR_SIZE_CACHE_TTL)).fetchall()
+        sizes = dict()
+        for child, mtime, size in rows:
+            name = child.rpartition('/')[2]
+            if mtime is not None and mtimes.get(name) == mtime:
+                sizes[name] = size
+        return sizes
+
+    # (path, mtime, size) of directories whose calculation has finished
+    def put_dir_sizes(self, sizes: List[Tuple[str, float, int]]) -> None:
+        now = time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO sizes (path, parent, mtime, size, calculated) VALUES (?, ?, ?, ?, ?)",
+                [(_key(path), _key(path).rpartition('/')[0], mtime, size, now) for path, mtime, size in sizes])
+
+    # Words are matched as parts of name, "*.ext" and "ext:ext" filter by extension.
+    # Trigram index needs at least three characters, shorter words are matched by LIKE
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[SearchResult]:
+        conditions = []
+        parameters = []
+        for word in query.split():
+            if word.startswith('*.') or word.lower().startswith('ext:'):
+                conditions.append("ext = ?")
+                parameters.append((word.split('.', 1)[-1] if word.startswith('*.') else word[4:]).lower())
+            elif len(word) >= 3:
+                conditions.append("name MATCH ?")
+                parameters.append('"' + word.replace('"', '""') + '"')
+            else:
+                conditions.append("name LIKE ? ESCAPE '\\'")
+                parameters.append('%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if not conditions:
+            return []
+        with self.reader_lock:
+            rows = self.reader.execute(
+                f"SELECT parent, name, is_dir, size, mtime FROM entries WHERE {' AND '.join(conditions)} "
+                f"ORDER BY is_dir DESC, length(name) LIMIT ?", parameters + [limit]).fetchall()
+        return [(parent, name, bool(is_dir), size, mtime) for parent, name, is_dir, size, mtime in rows]
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+        with self.reader_lock:
+            self.reader.close()
+
+
+# Walks remote PC breadth first with at most CRAWL_RATE listings per second. Directory whose mtime is
+# the same as on previous crawl is not listed again, its subdirectories are taken from index.
+# Changes deeper than one level don't change mtime of directory, so they are picked up by full crawl
+class Crawler:
+    def __init__(self, client: ManagingClient, index: SearchIndex):
+        self.client = client
+        self.index = index
+        self.stopped = Event()
+        self.running = False
+
+    def is_running(self) -> bool:
+        return self.running and not self.stopped.is_set()
+
+    def run(self) -> None:
+        self.running = True
+        while not self.stopped.is_set():
+            full = time() - self.index.meta('full_crawl') > CRAWL_FULL_INTERVAL
+            try:
+                self.crawl(full)
+            except ServerError:
+                pass
+            else:
+                if full and not self.stopped.is_set():
+                    self.index.set_meta('full_crawl', time())
+            self.stopped.wait(CRAWL_INTERVAL)
+
+    def crawl(self, full: bool) -> None:
+        to_visit = deque((disk.rstrip('/'), None) for disk in list_disks(self.client))
+        last_request = 0.0
+        while to_visit and not self.stopped.is_set():
+            path, mtime = to_visit.popleft()
+            if not full and mtime is not None and self.index.dir_mtime(path) == mtime:
+                to_visit.extend((f"{path}/{name}", child_mtime) for name, child_mtime in self.index.child_dirs(path))
+                continue
+            self.stopped.wait(max(0.0, 1 / CRAWL_RATE - (monotonic() - last_request)))
+            last_request = monotonic()
+            try:
+                file_list = self.client.list_files(Path(path + '/'))
+            except ServerError:
+                continue
+            if file_list is None or 'dirs' not in file_list:
+                continue
+            self.index.put_dir(path, mtime, file_list['dirs'], file_list['files'])
+            for directory in file_list['dirs']:
+                to_visit.append((f"{path}/{directory['name']}", directory.get('modification_time')))
+
+    def stop(self) -> None:
+        self.stopped.set()
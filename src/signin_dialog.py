@@ -1,14 +1,14 @@
-from PyQt6 import uic
 from PyQt6.QtWidgets import QDialog, QWidget
 from filesocket import sign_in, ServerError
 
 from src.signup_dialog import SignupDialog
+from src.ui_loader import load_ui
 
 
 class SigninDialog(QDialog):
     def __init__(self, parent: QWidget):
         super().__init__(parent)
-        uic.loadUi("res/ui/signin_dialog.ui", self)
+        load_ui("signin_dialog", self)
         self.error_message.hide()
         self.signin.clicked.connect(self.signin_processing)
         self.signup.clicked.connect(self.signup_processing)
@@ -1,12 +1,13 @@
-from PyQt6 import uic
 from PyQt6.QtWidgets import QDialog, QWidget
 from filesocket import sign_up, ServerError
 
+from src.ui_loader import load_ui
+
 
 class SignupDialog(QDialog):
     def __init__(self, parent: QWidget):
         super().__init__(parent)
-        uic.loadUi("res/ui/signup_dialog.ui", self)
+        load_ui("signup_dialog", self)
         self.error_message.hide()
         self.signup.clicked.connect(self.signup_processing)
         self.signin.clicked.connect(self.signin_processing)
@@ -0,0 +1,30 @@
+import shutil
+from pathlib import Path
+from tempfile import gettempdir, mkdtemp
+from threading import Timer
+from time import time
+
+from src.config import STAGING_DIR, STAGING_GRACE, STAGING_TTL
+
+
+# Temp area for files dragged out of remote tree. Every drag gets own dir, which is removed
+# some time after drop target got its files, because target may still be copying them
+class StagingArea:
+    def __init__(self, root: Path = Path(gettempdir()) / STAGING_DIR):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.purge()
+
+    def new_dir(self) -> Path:
+        return Path(mkdtemp(dir=self.root))
+
+    def release(self, directory: Path) -> None:
+        timer = Timer(STAGING_GRACE, shutil.rmtree, (directory, True))
+        timer.daemon = True
+        timer.start()
+
+    # Dirs left by previous sessions
+    def purge(self) -> None:
+        for directory in self.root.iterdir():
+            if time() - directory.stat().st_mtime > STAGING_TTL:
+                shutil.rmtree(directory, True)
@@ -0,0 +1,139 @@
+import heapq
+import logging
+from itertools import count
+from threading import Thread, Condition
+from typing import Dict, List, Tuple
+
+from src.config import SCHEDULER_WORKERS, KIND_LIMITS
+from src.task_thread import TaskThread
+
+
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+LOW_PRIORITY = 2
+
+
+# Runs tasks on bounded pool of worker threads.
+# Tasks are taken by priority and then in FIFO order, every kind of task has its own concurrency limit
+class TaskScheduler:
+    def __init__(self, max_workers: int = SCHEDULER_WORKERS, kind_limits: Dict[str, int] | None = None):
+        self.logger = logging.getLogger('gui')
+        self.max_workers = max_workers
+        self.kind_limits = dict(KIND_LIMITS if kind_limits is None else kind_limits)
+        self.condition = Condition()
+        self.queues: Dict[str, List[Tuple[int, int, TaskThread]]] = dict()
+        self.queued: Dict[int, TaskThread] = dict()
+        self.paused: Dict[int, Tuple[int, int, TaskThread]] = dict()
+        self.active: Dict[str, int] = dict()
+        self.paused_all = False
+        self.stopped = False
+        self.workers: List[Thread] = []
+        self.sequence = count()
+
+    def submit(self, task: TaskThread, priority: int = NORMAL_PRIORITY) -> None:
+        with self.condition:
+            heapq.heappush(self.queues.setdefault(task.kind, []), (priority, next(self.sequence), task))
+            self.queued[task.id] = task
+            if len(self.workers) < self.max_workers:
+                worker = Thread(target=self._work, daemon=True)
+                self.workers.append(worker)
+                worker.start()
+            self.condition.notify_all()
+
+    # Cancel task which is not started yet
+    def cancel(self, task_id: int) -> bool:
+        with self.condition:
+            self.paused.pop(task_id, None)
+            return self.queued.pop(task_id, None) is not None
+
+    def cancel_all(self) -> List[int]:
+        with self.condition:
+            cancelled = list(self.queued)
+            self.queued.clear()
+            self.paused.clear()
+            return cancelled
+
+    # Queued tasks are cancelled and workers end when their running tasks do
+    def shutdown(self) -> List[int]:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        return self.cancel_all()
+
+    # Paused task stays in queue, but is not started until it is resumed
+    def pause(self, task_id: int) -> None:
+        with self.condition:
+            if task_id in self.queued:
+                self.paused[task_id] = None
+
+    def resume(self, task_id: int) -> None:
+        with self.condition:
+            entry = self.paused.pop(task_id, None)
+            if entry is not None and task_id in self.queued:
+                heapq.heappush(self.queues[entry[2].kind], entry)
+            self.condition.notify_all()
+
+    def pause_all(self) -> None:
+        with self.condition:
+            self.paused_all = True
+
+    def resume_all(self) -> None:
+        with self.condition:
+            self.paused_all = False
+            self.condition.notify_all()
+
+    # "paused", "queued" or "running" for tasks which are not queued anymore
+    def state(self, task_id: int) -> str:
+        with self.condition:
+            if task_id in self.paused:
+                return "paused"
+            return "queued" if task_id in self.queued else "running"
+
+    def queue_depth(self) -> int:
+        with self.condition:
+            return len(self.queued)
+
+    def active_workers(self) -> int:
+        with self.condition:
+            return sum(self.active.values())
+
+    # Task with best priority among kinds which are below their limit
+    def _next_task(self) -> TaskThread | None:
+        if self.paused_all:
+            return None
+        best = None
+        for kind, queue in self.queues.items():
+            if self.active.get(kind, 0) >= self.kind_limits.get(kind, self.max_workers):
+                continue
+            while queue and (queue[0][2].id not in self.queued or queue[0][2].id in self.paused):
+                entry = heapq.heappop(queue)
+                if entry[2].id in self.paused:
+                    self.paused[entry[2].id] = entry
+            if queue and (best is None or queue[0] < best):
+                best = queue[0]
+        if best is None:
+            return None
+        heapq.heappop(self.queues[best[2].kind])
+        del self.queued[best[2].id]
+        return best[2]
+
+    def _work(self) -> None:
+        while True:
+            with self.condition:
+                task = self._next_task()
+                while task is None:
+                    if self.stopped:
+                        return
+                    self.condition.wait()
+                    task = self._next_task()
+                self.active[task.kind] = self.active.get(task.kind, 0) + 1
+            task.task_started.emit(task.id)
+            try:
+                task.execute()
+            except Exception as e:
+                self.logger.info(f"Task error {e.args}")
+                task.task_failed.emit(task.id, str(e.args))
+            finally:
+                with self.condition:
+                    self.active[task.kind] -= 1
+                    self.condition.notify_all()
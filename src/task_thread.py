@@ -1,14 +1,40 @@
 from random import randint
+from threading import Event
 
 from PyQt6.QtCore import QObject, pyqtSignal
 
 
 class TaskThread(QObject):
     task_complete = pyqtSignal(int)
+    task_started = pyqtSignal(int)
+    task_failed = pyqtSignal(int, str)
+
+    kind = "command"
 
     def __init__(self, parent: QObject):
         super().__init__(parent)
         self.id = randint(1, 2 ** 31)
+        self.name = ""
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.compression_ratio = 0.0
+        self.cancelled = Event()
+
+    # Called from worker thread, values are read by TaskbarProcessor on its own pace
+    def report_progress(self, done: int, total: int) -> None:
+        self.bytes_done = done
+        self.bytes_total = total
+
+    def report_ratio(self, ratio: float) -> None:
+        self.compression_ratio = ratio
 
     def execute(self):
         pass
+
+    # Called when task is cancelled before it was started
+    def discard(self) -> None:
+        pass
+
+    # Asks running task to stop, only tasks with long steps check it
+    def cancel(self) -> None:
+        self.cancelled.set()
@@ -1,40 +1,217 @@
-from threading import Thread
+from time import monotonic
+from typing import Dict
 
-from PyQt6.QtWidgets import QProgressBar, QWidget, QLabel
+from PyQt6.QtCore import Qt, QPoint, QTimer
+from PyQt6.QtGui import QAction
+from PyQt6.QtWidgets import QProgressBar, QWidget, QLabel, QMenu
 
+from src.config import PROGRESS_REFRESH_INTERVAL, TASK_MENU_SIZE
+from src.task_scheduler import TaskScheduler, NORMAL_PRIORITY
 from src.task_thread import TaskThread
 
 
+def readable_size(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 2 ** 10:
+            return f"{size:.1f} {unit}"
+        size /= 2 ** 10
+    return f"{size:.1f} TB"
+
+
 class TaskbarProcessor:
     def __init__(self, parent: QWidget, progress_bar: QProgressBar, text: QLabel):
         self.parent = parent
         self.logger = parent.logger
         self.bar = progress_bar
         self.text = text
-        self.threads = set()
+        self.threads: Dict[int, TaskThread] = dict()
         self.threads_count = 0
-        self.load_bar()
+        self.scheduler = TaskScheduler()
+        self.bar.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.bar.customContextMenuRequested.connect(self.open_context_menu)
 
+        # Throughput is measured between redraws of progress area
+        self.seen_bytes: Dict[int, int] = dict()
+        self.speeds: Dict[int, float] = dict()
+        self.finished_bytes = 0
+        self.speed = 0.0
+        self.last_refresh = monotonic()
+        self.timer = QTimer(parent)
+        self.timer.setInterval(PROGRESS_REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    # Progress area is redrawn by timer, so many small tasks don't flood event loop
     def load_bar(self) -> None:
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def refresh(self) -> None:
         if self.threads_count == 0 or len(self.threads) == 0:
             self.threads_count = 0
+            self.speed = 0.0
+            self.finished_bytes = 0
+            self.timer.stop()
             self.bar.hide()
             self.text.setText("")
             return
-        self.bar.setValue(int(100 * (self.threads_count - len(self.threads)) / self.threads_count))
-        self.text.setText(f"{self.threads_count - len(self.threads)}/{self.threads_count}")
+        self._measure_speed()
+        finished = self.threads_count - len(self.threads)
+        fractions = sum(thread.bytes_done / thread.bytes_total
+                        for thread in self.threads.values() if thread.bytes_total > 0)
+        self.bar.setValue(int(100 * (finished + fractions) / self.threads_count))
+        text = f"{finished}/{self.threads_count}"
+        if self.speed > 0:
+            text += f" | {readable_size(self.speed)}/s"
+            remaining = sum(max(thread.bytes_total - thread.bytes_done, 0) for thread in self.threads.values())
+            text += f" | ETA {self._readable_time(remaining / self.speed)}"
+        text += f" | queued {self.scheduler.queue_depth()}, active {self.scheduler.active_workers()}"
+        if self.scheduler.paused_all:
+            text += " | paused"
+        self.text.setText(text)
+        self.bar.setToolTip('\n'.join(self._task_line(thread) for thread in self.threads.values()
+                                      if thread.bytes_done > 0))
         self.bar.show()
 
-    def add_thread(self, thread: TaskThread) -> None:
-        self.threads.add(thread.id)
+    def _measure_speed(self) -> None:
+        now = monotonic()
+        elapsed = max(now - self.last_refresh, 1e-3)
+        self.last_refresh = now
+        transferred = self.finished_bytes
+        self.finished_bytes = 0
+        for thread_id, thread in self.threads.items():
+            delta = thread.bytes_done - self.seen_bytes.get(thread_id, 0)
+            self.seen_bytes[thread_id] = thread.bytes_done
+            self.speeds[thread_id] = 0.7 * self.speeds.get(thread_id, 0.0) + 0.3 * delta / elapsed
+            transferred += delta
+        self.speed = 0.7 * self.speed + 0.3 * transferred / elapsed
+
+    def _task_line(self, thread: TaskThread) -> str:
+        line = f"{thread.name}: {readable_size(thread.bytes_done)}"
+        if thread.bytes_total > 0:
+            line += f" of {readable_size(thread.bytes_total)}"
+        if thread.compression_ratio:
+            line += f", compressed {thread.compression_ratio:.1f}:1"
+        speed = self.speeds.get(thread.id, 0.0)
+        if speed > 0:
+            line += f", {readable_size(speed)}/s"
+            if thread.bytes_total > 0:
+                line += f", ETA {self._readable_time((thread.bytes_total - thread.bytes_done) / speed)}"
+        return line
+
+    @staticmethod
+    def _readable_time(seconds: float) -> str:
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes:02}:{seconds:02}"
+
+    def add_thread(self, thread: TaskThread, priority: int = NORMAL_PRIORITY) -> None:
+        self.threads[thread.id] = thread
         thread.task_complete.connect(self.remove_thread)
+        thread.task_failed.connect(lambda thread_id, error: self.remove_thread(thread_id))
+        thread.task_started.connect(lambda thread_id: self.load_bar())
         self.threads_count += 1
         self.logger.debug("Added thread")
+        self.scheduler.submit(thread, priority)
         self.load_bar()
-        worker = Thread(target=thread.execute)
-        worker.start()
 
     def remove_thread(self, thread_id: int) -> None:
-        self.threads.remove(thread_id)
+        thread = self.threads.pop(thread_id, None)
+        if thread is not None:
+            self.finished_bytes += thread.bytes_done - self.seen_bytes.get(thread_id, 0)
+            if thread.compression_ratio:
+                self.logger.info(f"{thread.name} transferred compressed {thread.compression_ratio:.1f}:1")
+        self.seen_bytes.pop(thread_id, None)
+        self.speeds.pop(thread_id, None)
         self.logger.debug("Removed thread")
         self.load_bar()
+
+    # Pause, resume or cancel tasks which are not started yet, running ones may be asked to stop too
+    def open_context_menu(self, position: QPoint) -> None:
+        menu = QMenu(self.parent)
+        if self.scheduler.paused_all:
+            resume_action = QAction("Resume queue", menu)
+            resume_action.triggered.connect(self.resume)
+            menu.addAction(resume_action)
+        else:
+            pause_action = QAction("Pause queue", menu)
+            pause_action.triggered.connect(self.pause)
+            menu.addAction(pause_action)
+        cancel_action = QAction("Cancel queued", menu)
+        cancel_action.triggered.connect(self.cancel_queued)
+        menu.addAction(cancel_action)
+        cancel_all_action = QAction("Cancel all", menu)
+        cancel_all_action.triggered.connect(self.cancel_all)
+        menu.addAction(cancel_all_action)
+        if self.threads:
+            menu.addSeparator()
+        for thread in list(self.threads.values())[:TASK_MENU_SIZE]:
+            self._add_task_menu(menu, thread)
+        menu.exec(self.bar.mapToGlobal(position))
+
+    # Submenu of one task: queued task may be paused or resumed, any task may be cancelled
+    def _add_task_menu(self, menu: QMenu, thread: TaskThread) -> None:
+        state = self.scheduler.state(thread.id)
+        task_menu = menu.addMenu(f"{thread.name or thread.kind} ({state})")
+        if state == "queued":
+            pause_action = QAction("Pause", task_menu)
+            pause_action.triggered.connect(lambda checked, thread_id=thread.id: self.pause_task(thread_id))
+            task_menu.addAction(pause_action)
+        elif state == "paused":
+            resume_action = QAction("Resume", task_menu)
+            resume_action.triggered.connect(lambda checked, thread_id=thread.id: self.resume_task(thread_id))
+            task_menu.addAction(resume_action)
+        cancel_action = QAction("Cancel", task_menu)
+        cancel_action.triggered.connect(lambda checked, thread_id=thread.id: self.cancel(thread_id))
+        task_menu.addAction(cancel_action)
+
+    def pause(self) -> None:
+        self.scheduler.pause_all()
+        self.load_bar()
+
+    def resume(self) -> None:
+        self.scheduler.resume_all()
+        self.load_bar()
+
+    def pause_task(self, thread_id: int) -> None:
+        self.scheduler.pause(thread_id)
+        self.load_bar()
+
+    def resume_task(self, thread_id: int) -> None:
+        self.scheduler.resume(thread_id)
+        self.load_bar()
+
+    # Cancelled queued task is reported as failed, so whoever waits for it knows it won't run.
+    # Running task is asked to stop and reports failure itself
+    def cancel(self, thread_id: int) -> None:
+        thread = self.threads.get(thread_id)
+        if thread is None:
+            return
+        if self.scheduler.cancel(thread_id):
+            thread.discard()
+            thread.task_failed.emit(thread_id, "Cancelled")
+        else:
+            thread.cancel()
+
+    def cancel_queued(self) -> None:
+        for thread_id in self.scheduler.cancel_all():
+            self.threads[thread_id].discard()
+            self.threads[thread_id].task_failed.emit(thread_id, "Cancelled")
+        self.logger.info("Cancelled queued tasks")
+
+    # Tab is closed: queued transfers stay in journal to be resumed next time, running tasks are asked to stop
+    def shutdown(self) -> None:
+        self.timer.stop()
+        for thread_id in self.scheduler.shutdown():
+            self.threads[thread_id].task_failed.emit(thread_id, "Cancelled")
+        for thread in list(self.threads.values()):
+            thread.cancel()
+
+    def is_idle(self) -> bool:
+        return self.scheduler.active_workers() == 0
+
+    # Running tasks stop at their next check, tasks without long steps finish as usual
+    def cancel_all(self) -> None:
+        self.cancel_queued()
+        for thread in list(self.threads.values()):
+            thread.cancel()
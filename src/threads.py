@@ -1,32 +1,123 @@
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from time import monotonic
+from os import walk
 from pathlib import Path
+from typing import Dict, List, Set, Tuple
 
-from PyQt6.QtCore import QObject
-from filesocket import ManagingClient
+from PyQt6.QtCore import QObject, pyqtSignal
+from filesocket import ManagingClient, ServerError, PathNotFoundError, TokenRequired
+from filesocket.managing_device_client import DOWNLOADS_PATH
 
 from src.task_thread import TaskThread
+from src.command_batch import CommandBatch
+from src.compression import upload_compressed
+from src.download_cache import download_cached
+from src.config import BATCH_FILE_LIMIT, BATCH_MAX_BYTES, BATCH_MAX_FILES, CMD_LENGTH_LIMIT, CONSOLE_POLL_INTERVAL, \
+    DIR_SIZE_WORKERS, DIR_SIZE_REPORT_INTERVAL
+from src.mirror import make_plan, set_remote_mtime, PULL
+from src.remote_console import RemoteJob
+from src.search_index import SearchIndex
+from src.transfer import upload_batch, download_batch, make_remote_dirs, run_command, _split_command, _cmd_path, \
+    list_disks, copy_between
+from src.transfer_journal import journal
 
 
+# Remote is listing entry of file with its size and mtime, if it is known already
 class DownloadThread(TaskThread):
-    def __init__(self, parent: QObject, client: ManagingClient, path: Path, destination: Path | None = Path('')):
+    kind = "download"
+
+    def __init__(self, parent: QObject, client: ManagingClient, path: Path, destination: Path | None = Path(''),
+                 transfer_id: str | None = None, remote: dict | None = None):
         super().__init__(parent)
         self.client = client
         self.path = path
         self.destination = destination
+        self.name = path.name
+        if transfer_id is None:
+            entry = {"kind": self.kind, "pc": str(client.device_id), "path": str(path),
+                     "destination": str(destination)}
+            if remote is not None:
+                entry["remote"] = {"size": remote.get('size'), "modification_time": remote.get('modification_time')}
+            transfer_id = journal.add(entry)
+        self.transfer_id = transfer_id
+        self.remote = remote or (journal.get(transfer_id) or dict()).get('remote')
 
     def execute(self) -> None:
-        self.client.get_file(self.path, self.destination)
+        try:
+            local = download_cached(self.client, self.path, self.destination, self.transfer_id,
+                                    self.report_progress, self.report_ratio, self.remote, self.cancelled)
+        except PathNotFoundError:
+            journal.remove(self.transfer_id)
+            raise
+        except Exception:
+            # Cancelled transfer is not resumed later
+            if self.cancelled.is_set():
+                self.discard()
+            raise
+        # Mtime is kept in journal, so it is set on file of resumed transfer too
+        mtime = (journal.get(self.transfer_id) or dict()).get('mtime')
+        if mtime is not None:
+            os.utime(local, (mtime, mtime))
+        journal.remove(self.transfer_id)
         self.task_complete.emit(self.id)
 
+    def discard(self) -> None:
+        journal.remove(self.transfer_id)
+
 
 class UploadThread(TaskThread):
-    def __init__(self, parent: QObject, client: ManagingClient, path: Path, destination: Path = Path('')):
+    kind = "upload"
+
+    def __init__(self, parent: QObject, client: ManagingClient, path: Path, destination: Path = Path(''),
+                 transfer_id: str | None = None):
+        super().__init__(parent)
+        self.client = client
+        self.path = path
+        self.destination = destination
+        self.name = path.name
+        self.transfer_id = transfer_id or journal.add({"kind": self.kind, "pc": str(client.device_id),
+                                                       "path": str(path), "destination": str(destination)})
+
+    def execute(self) -> None:
+        try:
+            upload_compressed(self.client, self.path, self.destination, self.transfer_id, self.report_progress,
+                              self.report_ratio, self.cancelled)
+            mtime = (journal.get(self.transfer_id) or dict()).get('mtime')
+            if mtime is not None:
+                set_remote_mtime(self.client, self.destination / self.path.name, mtime)
+        except PathNotFoundError:
+            journal.remove(self.transfer_id)
+            raise
+        except Exception:
+            if self.cancelled.is_set():
+                self.discard()
+            raise
+        journal.remove(self.transfer_id)
+        self.task_complete.emit(self.id)
+
+    def discard(self) -> None:
+        journal.remove(self.transfer_id)
+
+
+# Copy from another PC, file goes straight from one server to another
+class CopyThread(TaskThread):
+    kind = "upload"
+
+    def __init__(self, parent: QObject, client: ManagingClient, source: ManagingClient, path: Path,
+                 destination: Path):
         super().__init__(parent)
         self.client = client
+        self.source = source
         self.path = path
         self.destination = destination
+        self.name = path.name
 
     def execute(self) -> None:
-        self.client.send_file(self.path, self.destination)
+        copy_between(self.source, self.path, self.client, self.destination, self.report_progress)
         self.task_complete.emit(self.id)
 
 
@@ -35,7 +126,421 @@ class CMDThread(TaskThread):
         super().__init__(parent)
         self.client = client
         self.command = command
+        self.name = command
 
     def execute(self) -> None:
         self.client.cmd_command(self.command)
         self.task_complete.emit(self.id)
+
+
+# Console command which streams its output while it runs, exit code is None if it is unknown
+class ConsoleThread(TaskThread):
+    output = pyqtSignal(str)
+    finished_with = pyqtSignal(object)
+
+    def __init__(self, parent: QObject, client: ManagingClient, command: str):
+        super().__init__(parent)
+        self.client = client
+        self.command = command
+        self.name = command
+        self.job = RemoteJob(client, command)
+
+    def execute(self) -> None:
+        try:
+            if self.job.start():
+                exit_code = self._stream()
+            else:
+                # Command can't be detached, so its output comes at once when it is finished
+                self.output.emit((run_command(self.client, self.command) or dict()).get('out') or '')
+                exit_code = None
+        # Broken answer of server (ValueError, KeyError) ends command like lost connection, so Send is enabled again
+        except (ServerError, PathNotFoundError, TokenRequired, OSError, ValueError, KeyError) as e:
+            self.task_failed.emit(self.id, str(e.args))
+            return
+        self.finished_with.emit(exit_code)
+        self.task_complete.emit(self.id)
+
+    def _stream(self) -> int | None:
+        exit_code = None
+        try:
+            while exit_code is None and not self.cancelled.wait(CONSOLE_POLL_INTERVAL / 1000):
+                text = self.job.read()
+                if text:
+                    self.output.emit(text)
+                exit_code = self.job.exit_code()
+            if exit_code is None:
+                self.job.cancel()
+            text = self.job.read()
+            if text:
+                self.output.emit(text)
+        finally:
+            self.job.cleanup()
+        return exit_code
+
+
+# Several remote operations sent as few commands, result of every operation is emitted at once
+class CommandBatchThread(TaskThread):
+    batch_done = pyqtSignal(object)
+
+    def __init__(self, parent: QObject, client: ManagingClient, batch: CommandBatch, name: str):
+        super().__init__(parent)
+        self.client = client
+        self.batch = batch
+        self.name = name
+
+    def execute(self) -> None:
+        self.batch_done.emit(self.batch.run(self.client))
+        self.task_complete.emit(self.id)
+
+
+class ListFilesThread(TaskThread):
+    kind = "listing"
+    files_listed = pyqtSignal(str, object)
+    listing_failed = pyqtSignal(str, str)
+
+    # Path None means root, i.e. list of logical disks
+    def __init__(self, parent: QObject, client: ManagingClient, path: Path | None):
+        super().__init__(parent)
+        self.client = client
+        self.path = path
+        self.key = "" if path is None else str(path)
+
+    def execute(self) -> None:
+        try:
+            if self.path is None:
+                file_list = self._list_disks()
+            else:
+                file_list = self.client.list_files(self.path)
+        # Broken answer of server (ValueError, KeyError, TypeError) fails listing like lost connection,
+        # so folder is released and may be expanded again
+        except (ServerError, TokenRequired, OSError, ValueError, KeyError, TypeError) as e:
+            self.listing_failed.emit(self.key, str(e.args))
+        else:
+            self.files_listed.emit(self.key, file_list)
+        self.task_complete.emit(self.id)
+
+    def _list_disks(self) -> dict:
+        return {"dirs": [{"name": disk, "modification_time": None} for disk in list_disks(self.client)], "files": []}
+
+
+class UploadBatchThread(TaskThread):
+    kind = "upload"
+
+    def __init__(self, parent: QObject, client: ManagingClient, root: Path, files: List[Path], destination: Path):
+        super().__init__(parent)
+        self.client = client
+        self.root = root
+        self.files = files
+        self.destination = destination
+        self.name = f"{len(files)} files of {root.name}"
+
+    def execute(self) -> None:
+        upload_batch(self.client, self.root, self.files, self.destination, self.report_progress)
+        self.task_complete.emit(self.id)
+
+
+class DownloadBatchThread(TaskThread):
+    kind = "download"
+
+    def __init__(self, parent: QObject, client: ManagingClient, directory: Path, names: List[str], destination: Path):
+        super().__init__(parent)
+        self.client = client
+        self.directory = directory
+        self.names = names
+        self.destination = destination
+        self.name = f"{len(names)} files of {directory.name}"
+
+    def execute(self) -> None:
+        download_batch(self.client, self.directory, self.names, self.destination, self.report_progress)
+        self.task_complete.emit(self.id)
+
+
+# Walks local folder and hands its files to scheduler while walk goes on.
+# Small files are packed into batches, big ones are uploaded by their own resumable tasks
+class UploadDirThread(TaskThread):
+    kind = "upload"
+    task_found = pyqtSignal(object)
+
+    def __init__(self, parent: QObject, client: ManagingClient, path: Path, destination: Path):
+        super().__init__(parent)
+        self.client = client
+        self.path = path
+        self.destination = destination
+        self.name = path.name
+
+    def execute(self) -> None:
+        remote_root = self.destination / self.path.name
+        new_dirs = [remote_root]
+        batch = []
+        batch_size = 0
+        for root, dirs, files in walk(self.path):
+            remote_dir = remote_root / Path(root).relative_to(self.path)
+            new_dirs += [remote_dir / directory for directory in dirs]
+            for file in files:
+                local_path = Path(root) / file
+                size = local_path.stat().st_size
+                if size >= BATCH_FILE_LIMIT:
+                    make_remote_dirs(self.client, new_dirs)
+                    new_dirs = []
+                    self.task_found.emit((UploadThread, local_path, remote_dir))
+                    continue
+                batch.append(local_path)
+                batch_size += size
+                if batch_size >= BATCH_MAX_BYTES or len(batch) >= BATCH_MAX_FILES:
+                    self._emit_batch(batch, remote_root)
+                    batch = []
+                    batch_size = 0
+        make_remote_dirs(self.client, new_dirs)
+        self._emit_batch(batch, remote_root)
+        self.task_complete.emit(self.id)
+
+    def _emit_batch(self, batch: List[Path], remote_root: Path) -> None:
+        if len(batch) == 1:
+            self.task_found.emit((UploadThread, batch[0], remote_root / batch[0].parent.relative_to(self.path)))
+        elif batch:
+            self.task_found.emit((UploadBatchThread, self.path, batch, remote_root))
+
+
+# Walks remote folder level by level with list_files and hands its files to scheduler while walk goes on
+class DownloadDirThread(TaskThread):
+    kind = "download"
+    task_found = pyqtSignal(object)
+
+    def __init__(self, parent: QObject, client: ManagingClient, path: Path, destination: Path = Path('')):
+        super().__init__(parent)
+        self.client = client
+        self.path = path
+        self.destination = destination
+        self.name = path.name
+
+    def execute(self) -> None:
+        destination = DOWNLOADS_PATH if str(self.destination) == '.' else self.destination
+        to_visit = deque([(self.path, destination / self.path.name)])
+        while to_visit:
+            remote_dir, local_dir = to_visit.popleft()
+            local_dir.mkdir(parents=True, exist_ok=True)
+            file_list = self.client.list_files(remote_dir) or dict()
+            for directory in file_list.get('dirs', []):
+                to_visit.append((remote_dir / directory['name'], local_dir / directory['name']))
+            batch = []
+            batch_size = 0
+            batch_length = 0
+            for file in file_list.get('files', []):
+                if file['size'] >= BATCH_FILE_LIMIT:
+                    self.task_found.emit((DownloadThread, remote_dir / file['name'], local_dir, None, file))
+                    continue
+                if batch and (batch_size >= BATCH_MAX_BYTES or len(batch) >= BATCH_MAX_FILES or
+                              batch_length + len(file['name']) > CMD_LENGTH_LIMIT // 2):
+                    self._emit_batch(remote_dir, batch, local_dir)
+                    batch = []
+                    batch_size = 0
+                    batch_length = 0
+                batch.append(file)
+                batch_size += file['size']
+                batch_length += len(file['name']) + 3
+            self._emit_batch(remote_dir, batch, local_dir)
+        self.task_complete.emit(self.id)
+
+    # Batch costs three round trips, so only a few files are downloaded one by one
+    def _emit_batch(self, remote_dir: Path, batch: List[dict], local_dir: Path) -> None:
+        if len(batch) < 3:
+            for file in batch:
+                self.task_found.emit((DownloadThread, remote_dir / file['name'], local_dir, None, file))
+        else:
+            self.task_found.emit((DownloadBatchThread, remote_dir, [file['name'] for file in batch], local_dir))
+
+
+# Mirror plan is built in background, because it walks both trees and may hash files
+class MirrorPlanThread(TaskThread):
+    plan_ready = pyqtSignal(object)
+
+    def __init__(self, parent: QObject, client: ManagingClient, local_root: Path, remote_root: Path, direction: str):
+        super().__init__(parent)
+        self.client = client
+        self.local_root = local_root
+        self.remote_root = remote_root
+        self.direction = direction
+        self.name = f"Comparing {remote_root.name}"
+
+    def execute(self) -> None:
+        self.plan_ready.emit(make_plan(self.client, self.local_root, self.remote_root, self.direction))
+        self.task_complete.emit(self.id)
+
+
+# Downloaded file gets mtime of remote one, so next mirror doesn't need to hash it
+class MirrorDownloadThread(DownloadThread):
+    def __init__(self, parent: QObject, client: ManagingClient, path: Path, destination: Path, mtime: float,
+                 size: int | None = None):
+        remote = None if size is None else {'name': path.name, 'size': size, 'modification_time': mtime}
+        super().__init__(parent, client, path, destination, remote=remote)
+        journal.update(self.transfer_id, mtime=mtime)
+
+
+# Uploaded file gets mtime of local one, so next mirror doesn't need to hash it
+class MirrorUploadThread(UploadThread):
+    def __init__(self, parent: QObject, client: ManagingClient, path: Path, destination: Path, mtime: float):
+        super().__init__(parent, client, path, destination)
+        journal.update(self.transfer_id, mtime=mtime)
+
+
+# Applies mirror plan: creates missing dirs, deletes extra files and dirs if asked and hands transfers to scheduler
+class MirrorThread(TaskThread):
+    task_found = pyqtSignal(object)
+
+    def __init__(self, parent: QObject, client: ManagingClient, plan: dict, delete: bool):
+        super().__init__(parent)
+        self.client = client
+        self.plan = plan
+        self.delete = delete
+        self.kind = plan['direction']
+        self.name = f"Mirror of {plan['remote_root'].name}"
+
+    def execute(self) -> None:
+        local_root = self.plan['local_root']
+        remote_root = self.plan['remote_root']
+        if self.plan['direction'] == PULL:
+            for directory in self.plan['dirs']:
+                (local_root / directory).mkdir(parents=True, exist_ok=True)
+            for relative, size, mtime, reason in self.plan['copy']:
+                self.task_found.emit((MirrorDownloadThread, remote_root / relative, (local_root / relative).parent,
+                                      mtime, size))
+            if self.delete:
+                for relative in self.plan['delete']:
+                    (local_root / relative).unlink(missing_ok=True)
+                for relative in self.plan['delete_dirs']:
+                    shutil.rmtree(local_root / relative, ignore_errors=True)
+        else:
+            make_remote_dirs(self.client, [remote_root / directory for directory in self.plan['dirs']])
+            for relative, size, mtime, reason in self.plan['copy']:
+                self.task_found.emit((MirrorUploadThread, local_root / relative, (remote_root / relative).parent,
+                                      mtime))
+            if self.delete:
+                paths = [_cmd_path(remote_root / relative) for relative in self.plan['delete']]
+                for command in _split_command('del /f', paths):
+                    run_command(self.client, command)
+                paths = [_cmd_path(remote_root / relative) for relative in self.plan['delete_dirs']]
+                for command in _split_command('rmdir /s /q', paths):
+                    run_command(self.client, command)
+        self.task_complete.emit(self.id)
+
+
+# Total size of folder with all subfolders. Folders are listed by several workers at once and running totals
+# of folders whose sizes grew are emitted as they grow, keyed by path with "/" separators like in search index.
+# Total of folder with same mtime as when it was calculated is taken from index, so its subtree isn't walked
+class DirSizeThread(TaskThread):
+    kind = "size"
+    sizes_found = pyqtSignal(object, bool)
+
+    def __init__(self, parent: QObject, client: ManagingClient, path: Path, mtime: float | None, index: SearchIndex,
+                 use_cache: bool = True):
+        super().__init__(parent)
+        self.client = client
+        self.path = path
+        self.mtime = mtime
+        self.index = index
+        self.use_cache = use_cache
+        self.name = path.name or str(path)
+        self.lock = Lock()
+        self.done = Event()
+        self.executor: ThreadPoolExecutor | None = None
+        self.parents: Dict[str, str | None] = dict()
+        self.mtimes: Dict[str, float | None] = dict()
+        self.totals: Dict[str, int] = dict()
+        # Listings which are not finished yet in subtree of folder, its own listing included
+        self.remaining: Dict[str, int] = dict()
+        # Folders with failed listing somewhere in subtree and folders taken from index aren't saved
+        self.unsaved: Set[str] = set()
+        self.changed: Set[str] = set()
+        self.results: List[Tuple[str, float, int]] = []
+        self.last_report = 0.0
+        self.error: Exception | None = None
+
+    def execute(self) -> None:
+        root = str(self.path).replace('\\', '/').rstrip('/')
+        with ThreadPoolExecutor(max_workers=DIR_SIZE_WORKERS) as executor:
+            self.executor = executor
+            self._visit(root, None, self.mtime)
+            self.done.wait()
+            if self.error is not None:
+                executor.shutdown(cancel_futures=True)
+                raise self.error
+        self.index.put_dir_sizes(self.results)
+        with self.lock:
+            totals = {key: self.totals[key] for key in self.changed | {root}}
+        self.sizes_found.emit(totals, True)
+        self.task_complete.emit(self.id)
+
+    def _visit(self, key: str, parent: str | None, mtime: float | None) -> None:
+        with self.lock:
+            self.parents[key] = parent
+            self.mtimes[key] = mtime
+            self.totals[key] = 0
+        size = self.index.dir_size(key, mtime) if self.use_cache else None
+        if size is None:
+            self.executor.submit(self._guarded_list, key)
+            return
+        with self.lock:
+            self.unsaved.add(key)
+        self._add(key, size)
+        self._finish(key)
+
+    # Error in worker would be kept in its future and walk would never finish, so it ends whole task
+    def _guarded_list(self, key: str) -> None:
+        try:
+            self._list(key)
+        except Exception as e:
+            with self.lock:
+                self.error = self.error or e
+            self.done.set()
+
+    def _list(self, key: str) -> None:
+        if self.cancelled.is_set():
+            raise IOError("Cancelled")
+        try:
+            file_list = self.client.list_files(Path(key + '/'))
+        except Exception:
+            file_list = None
+        if file_list is None or 'dirs' not in file_list:
+            with self.lock:
+                parent = key
+                while parent is not None:
+                    self.unsaved.add(parent)
+                    parent = self.parents[parent]
+            self._finish(key)
+            return
+        with self.lock:
+            self.remaining[key] = len(file_list['dirs']) + 1
+        self._add(key, sum(max(file.get('size') or 0, 0) for file in file_list['files']))
+        for directory in file_list['dirs']:
+            self._visit(f"{key}/{directory['name']}", key, directory.get('modification_time'))
+        self._finish(key)
+
+    # Size is added to folder and all folders above it, totals are emitted at most every report interval
+    def _add(self, key: str, size: int) -> None:
+        if not size:
+            return
+        totals = None
+        with self.lock:
+            while key is not None:
+                self.totals[key] += size
+                self.changed.add(key)
+                key = self.parents[key]
+            if monotonic() - self.last_report >= DIR_SIZE_REPORT_INTERVAL / 1000:
+                self.last_report = monotonic()
+                totals = {key: self.totals[key] for key in self.changed}
+                self.changed.clear()
+        if totals is not None:
+            self.sizes_found.emit(totals, False)
+
+    # Folder is complete when its listing and all its subfolders are, then it completes one part of its parent
+    def _finish(self, key: str) -> None:
+        with self.lock:
+            while key is not None:
+                remaining = self.remaining.get(key, 1) - 1
+                self.remaining[key] = remaining
+                if remaining:
+                    return
+                if key not in self.unsaved and self.mtimes[key] is not None:
+                    self.results.append((key, self.mtimes[key], self.totals[key]))
+                key = self.parents[key]
+        self.done.set()
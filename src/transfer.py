@@ -0,0 +1,638 @@
+import hashlib
+import os
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from os import walk
+from pathlib import Path
+from threading import Lock
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List
+from urllib.parse import quote
+from uuid import uuid4
+
+import requests
+from filesocket import ManagingClient, ServerError, PathNotFoundError, NGROK_UPLOAD_FILE
+from filesocket.config import NGROK_DOWNLOAD_FILE
+from filesocket.managing_device_client import DOWNLOADS_PATH
+
+from src.bandwidth import shaper
+from src.client_pool import PooledClient
+from src.config import TRANSFER_CHUNK_SIZE, RESUMABLE_CHUNK_SIZE, PARALLEL_STREAMS, PARALLEL_THRESHOLD, \
+    CMD_LENGTH_LIMIT
+from src.metrics import metrics
+from src.transfer_journal import journal
+
+
+# Same requests as ManagingClient.get_file and send_file, but streamed by chunks with progress reporting
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _raise_for_status(response: requests.Response, expected: tuple = (200,)) -> None:
+    if response.status_code not in expected:
+        response_json = response.json()
+        message = response_json['detail'] if 'detail' in response_json else ''
+        raise ServerError(f"{response.status_code} {message}")
+
+
+def download(client: ManagingClient, path: Path, destination: Path = Path(''),
+             progress: ProgressCallback | None = None) -> Path:
+    destination = Path(destination)
+    if str(destination) != '.' and not destination.exists():
+        raise PathNotFoundError
+    if str(destination) == '.':
+        destination = DOWNLOADS_PATH
+    response = _request_range(client, path, None, None, None)
+    _raise_for_status(response)
+
+    if not destination.is_file():
+        destination /= _filename(response)
+    total = int(response.headers.get('Content-Length', 0))
+    done = 0
+    flow = uuid4().hex
+    try:
+        with destination.open("wb") as buffer:
+            for chunk in response.iter_content(TRANSFER_CHUNK_SIZE):
+                buffer.write(chunk)
+                done += len(chunk)
+                shaper.acquire(flow, len(chunk))
+                if progress is not None:
+                    progress(done, total)
+    except requests.RequestException as e:
+        raise ServerError(e)
+    except Exception as e:
+        raise IOError(e)
+    return destination
+
+
+# File-like multipart/form-data body, so requests streams file instead of reading it in memory.
+# Only length bytes from offset are sent if they are given, stream of given length may be sent instead of file.
+# Bodies of one transfer share bandwidth flow, every body is flow of its own by default
+class MultipartBody:
+    def __init__(self, path: Path, fields: dict, progress: ProgressCallback | None = None,
+                 offset: int = 0, length: int | None = None, filename: str | None = None, stream=None,
+                 flow: str | None = None):
+        boundary = uuid4().hex
+        self.flow = flow or boundary
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = b''
+        for key, value in fields.items():
+            head += (f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n'
+                     f'{value}\r\n').encode()
+        filename = (filename or path.name).replace('"', '%22')
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode()
+        self.head = head
+        self.tail = f'\r\n--{boundary}--\r\n'.encode()
+        if stream is None:
+            self.file = path.open('rb')
+            self.file.seek(offset)
+            self.file_size = path.stat().st_size - offset if length is None else length
+        else:
+            self.file = stream
+            self.file_size = length
+        self.progress = progress
+        self.position = 0
+        self.crc = 0
+
+    def __len__(self) -> int:
+        return len(self.head) + self.file_size + len(self.tail)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self)
+        data = b''
+        if self.position < len(self.head):
+            data = self.head[self.position:self.position + size]
+        file_start = len(self.head)
+        file_end = file_start + self.file_size
+        current = self.position + len(data)
+        if len(data) < size and current < file_end:
+            file_data = self.file.read(min(size - len(data), file_end - current))
+            self.crc = zlib.crc32(file_data, self.crc)
+            shaper.acquire(self.flow, len(file_data))
+            data += file_data
+            current = self.position + len(data)
+        if len(data) < size and current >= file_end:
+            data += self.tail[current - file_end:current - file_end + size - len(data)]
+        self.position += len(data)
+        if self.progress is not None:
+            self.progress(min(max(self.position - file_start, 0), self.file_size), self.file_size)
+        return data
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def upload(client: ManagingClient, path: Path, destination: Path = Path(''),
+           progress: ProgressCallback | None = None) -> None:
+    path = Path(path)
+    destination = Path(destination)
+    if not path.exists():
+        raise PathNotFoundError
+    fields = dict()
+    if str(destination) != '.':
+        fields['destination'] = str(destination)
+
+    with TemporaryDirectory() as temp_dir:
+        if not path.is_file():
+            zip_file_path = Path(temp_dir) / (path.name + '.zip')
+            with zipfile.ZipFile(zip_file_path, "w") as zip_file:
+                for root, dirs, files in walk(path):
+                    archive_path = Path(root).relative_to(path)
+                    for file in files:
+                        zip_file.write(Path(root) / file, archive_path / file)
+            path = zip_file_path
+        body = MultipartBody(path, fields, progress)
+        try:
+            response = _post_file(client, body)
+        finally:
+            body.close()
+    _raise_for_status(response)
+
+
+# PC which can't be reached may have got other address, pooled client asks for it with next request
+def _connection_failed(client: ManagingClient, error: Exception) -> ServerError:
+    if isinstance(client, PooledClient):
+        client.invalidate()
+    return ServerError(error)
+
+
+# Upload requests are timed with sending of body
+def _post_file(client: ManagingClient, body: MultipartBody) -> requests.Response:
+    headers = dict(client.default_header)
+    headers['Content-Type'] = body.content_type
+    url = f"{client.device_ngrok_ip}{NGROK_UPLOAD_FILE}"
+    with metrics.timed("send_file") as measurement:
+        try:
+            response = requests.post(url, data=body, headers=headers)
+        except Exception as e:
+            raise _connection_failed(client, e)
+        measurement.bytes = len(body)
+        measurement.failed = response.status_code >= 500
+    return response
+
+
+def _filename(response: requests.Response) -> str:
+    return response.headers['Content-Disposition'].split('; ')[-1].removeprefix('filename="').removesuffix('"')
+
+
+# File is streamed from one PC straight into upload to another one, nothing is stored locally.
+# Directory comes as zip made by source server and is unpacked by tar on target PC
+def copy_between(source: ManagingClient, path: Path, target: ManagingClient, destination: Path,
+                 progress: ProgressCallback | None = None) -> None:
+    destination = Path(destination)
+    response = _request_range(source, path, None, None, None)
+    try:
+        _raise_for_status(response)
+        name = _filename(response)
+        fields = dict() if str(destination) == '.' else {'destination': str(destination)}
+        body = MultipartBody(Path(name), fields, progress, length=int(response.headers['Content-Length']),
+                             filename=name, stream=response.raw)
+        upload_response = _post_file(target, body)
+    finally:
+        response.close()
+    _raise_for_status(upload_response)
+    if name == path.name + '.zip' and str(destination) != '.':
+        archive = destination / name
+        run_command(target, f'mkdir {_cmd_path(destination / path.name)} & tar -xf {_cmd_path(archive)} '
+                            f'-C {_cmd_path(destination / path.name)} && del /f {_cmd_path(archive)}')
+
+
+def _part_path(target: Path) -> Path:
+    return target.with_name(target.name + '.part')
+
+
+# Journaled chunks which are still present in part file. Chunks form runs of adjacent ranges,
+# only last chunk of every run is checked against its crc32, because it is the one which could be torn
+def _verified_chunks(part: Path, chunks: list) -> list:
+    if not part.exists():
+        return []
+    size = part.stat().st_size
+    runs = []
+    for start, end, crc in sorted(chunks):
+        if end > size:
+            continue
+        if runs and runs[-1][-1][1] == start:
+            runs[-1].append([start, end, crc])
+        else:
+            runs.append([[start, end, crc]])
+    verified = []
+    with part.open('rb') as f:
+        for run in runs:
+            while run:
+                start, end, crc = run[-1]
+                f.seek(start)
+                if zlib.crc32(f.read(end - start)) == crc:
+                    break
+                run.pop()
+            verified += run
+    return verified
+
+
+# Ranges of [0, total) which are not covered by chunks
+def _missing_ranges(chunks: list, total: int) -> list:
+    missing = []
+    position = 0
+    for start, end, crc in sorted(chunks):
+        if start > position:
+            missing.append([position, start])
+        position = max(position, end)
+    if position < total:
+        missing.append([position, total])
+    return missing
+
+
+# Big ranges are split so every stream gets its own piece
+def _split_ranges(ranges: list, total: int) -> list:
+    if total < PARALLEL_THRESHOLD or PARALLEL_STREAMS < 2:
+        return ranges
+    remaining = sum(end - start for start, end in ranges)
+    piece_size = max(RESUMABLE_CHUNK_SIZE, -(-remaining // PARALLEL_STREAMS))
+    pieces = []
+    for start, end in ranges:
+        while end - start > piece_size:
+            pieces.append([start, start + piece_size])
+            start += piece_size
+        pieces.append([start, end])
+    return pieces
+
+
+def _request_range(client: ManagingClient, path: Path, start: int | None, end: int | None,
+                   etag: str | None) -> requests.Response:
+    headers = dict(client.default_header)
+    if start is not None:
+        headers['Range'] = f"bytes={start}-" if end is None else f"bytes={start}-{end - 1}"
+    if etag:
+        headers['If-Range'] = etag
+    # Latency is time until headers come, body is counted in bytes
+    url = f"{client.device_ngrok_ip}{NGROK_DOWNLOAD_FILE}"
+    with metrics.timed("get_file") as measurement:
+        try:
+            response = requests.get(url, params={"path": str(path)}, headers=headers, stream=True)
+        except Exception as e:
+            raise _connection_failed(client, e)
+        measurement.bytes = int(response.headers.get('Content-Length', 0))
+        measurement.failed = response.status_code >= 500
+    return response
+
+
+# SHA-256 of file whose ranges are written in any order. Bytes at hashed position are hashed as they arrive,
+# bytes which arrived ahead of it are read back from part file once position reaches them, by one thread at a time
+class _OrderedHasher:
+    def __init__(self, part: Path):
+        self.part = part
+        self.digest = hashlib.sha256()
+        self.position = 0
+        # Start -> end of ranges which are already in part file but not hashed yet
+        self.ahead: Dict[int, int] = dict()
+        self.reading = False
+        self.lock = Lock()
+
+    # Data must be flushed to part file before it is fed
+    def feed(self, start: int, data: bytes) -> None:
+        with self.lock:
+            if start == self.position and not self.reading:
+                self.digest.update(data)
+                self.position += len(data)
+            elif data:
+                self.ahead[start] = start + len(data)
+            if self.reading or self.position not in self.ahead:
+                return
+            self.reading = True
+        self._read_ahead()
+
+    # Range written by previous attempt
+    def written(self, start: int, end: int) -> None:
+        with self.lock:
+            self.ahead[start] = end
+
+    def _read_ahead(self) -> None:
+        try:
+            with self.part.open('rb') as f:
+                while True:
+                    with self.lock:
+                        end = self.ahead.pop(self.position, None)
+                        if end is None:
+                            return
+                        f.seek(self.position)
+                    while self.position < end:
+                        data = f.read(min(TRANSFER_CHUNK_SIZE, end - self.position))
+                        if not data:
+                            raise IOError(f"Part file is shorter than {end} bytes")
+                        with self.lock:
+                            self.digest.update(data)
+                            self.position += len(data)
+        finally:
+            with self.lock:
+                self.reading = False
+
+    # Called when all ranges are written
+    def hexdigest(self, total: int) -> str:
+        if self.position in self.ahead:
+            self.reading = True
+            self._read_ahead()
+        if self.position != total or self.ahead:
+            raise IOError(f"Only {self.position} of {total} bytes were hashed")
+        return self.digest.hexdigest()
+
+
+# Writes one range of file through its own file handle, completed chunks go to journal
+class _RangeWriter:
+    def __init__(self, part: Path, transfer_id: str, progress: Callable[[int], None], hasher: _OrderedHasher):
+        self.part = part
+        self.transfer_id = transfer_id
+        self.progress = progress
+        self.hasher = hasher
+
+    def write(self, response: requests.Response, start: int, end: int | None) -> None:
+        position = start
+        try:
+            with self.part.open("r+b") as buffer:
+                buffer.seek(start)
+                chunk_start, crc = start, 0
+                for data in response.iter_content(TRANSFER_CHUNK_SIZE):
+                    if end is not None:
+                        data = data[:end - position]
+                    buffer.write(data)
+                    buffer.flush()
+                    self.hasher.feed(position, data)
+                    shaper.acquire(self.transfer_id, len(data))
+                    crc = zlib.crc32(data, crc)
+                    position += len(data)
+                    self.progress(len(data))
+                    if position - chunk_start >= RESUMABLE_CHUNK_SIZE or position == end:
+                        buffer.flush()
+                        journal.add_chunk(self.transfer_id, chunk_start, position, crc)
+                        chunk_start, crc = position, 0
+                    if position == end:
+                        break
+                if position > chunk_start:
+                    journal.add_chunk(self.transfer_id, chunk_start, position, crc)
+        except requests.RequestException as e:
+            raise ServerError(e)
+        except Exception as e:
+            raise IOError(e)
+        finally:
+            response.close()
+        if end is not None and position < end:
+            raise ServerError(f"Connection closed after {position} of {end} bytes")
+
+
+# Chunks of previous attempt which don't overlap, as ranges
+def _written_ranges(chunks: list) -> list:
+    ranges = []
+    position = 0
+    for start, end, crc in sorted(chunks):
+        start = max(start, position)
+        if start < end:
+            ranges.append([start, end])
+            position = end
+    return ranges
+
+
+# Download which continues from verified chunks of previous attempt, state is kept in journal.
+# Files bigger than PARALLEL_THRESHOLD are fetched by several range requests at once.
+# SHA-256 of downloaded file is put to journal entry as "sha256"
+def download_resumable(client: ManagingClient, path: Path, destination: Path, transfer_id: str,
+                       progress: ProgressCallback | None = None) -> Path:
+    entry = journal.get(transfer_id) or dict()
+    target = Path(entry['target']) if entry.get('target') else None
+    etag = entry.get('etag')
+    chunks = [] if target is None else _verified_chunks(_part_path(target), entry.get('chunks', []))
+    total = entry.get('total', 0)
+    missing = _missing_ranges(chunks, total) if chunks else [[0, None]]
+    if target is not None and chunks and not missing:
+        hasher = _OrderedHasher(_part_path(target))
+        for start, end in _written_ranges(chunks):
+            hasher.written(start, end)
+        journal.update(transfer_id, sha256=hasher.hexdigest(total))
+        os.replace(_part_path(target), target)
+        return target
+
+    first_start = missing[0][0]
+    response = _request_range(client, path, first_start, None, etag if chunks else None)
+    if response.status_code == 416 and not chunks:
+        # Empty file can't be requested by range
+        response = _request_range(client, path, None, None, None)
+    _raise_for_status(response, (200, 206))
+    if target is None:
+        destination = Path(destination)
+        if str(destination) != '.' and not destination.exists():
+            raise PathNotFoundError
+        if str(destination) == '.':
+            destination = DOWNLOADS_PATH
+        target = destination
+        if not target.is_file():
+            target /= _filename(response)
+    part = _part_path(target)
+    if response.status_code == 200:
+        chunks = []
+        first_start = 0
+        total = int(response.headers.get('Content-Length', 0))
+        missing = [[0, None]]
+    else:
+        total = int(response.headers['Content-Range'].split('/')[-1])
+        if not chunks:
+            missing = [[0, total]]
+    etag = response.headers.get('ETag')
+    journal.update(transfer_id, target=str(target), etag=etag, total=total, chunks=chunks)
+    try:
+        with part.open("r+b" if chunks else "wb") as buffer:
+            if response.status_code == 206:
+                buffer.truncate(total)
+    except Exception as e:
+        raise IOError(e)
+
+    done = total - sum(end - start for start, end in missing if end is not None)
+    lock = Lock()
+
+    def report(length: int) -> None:
+        nonlocal done
+        with lock:
+            done += length
+            if progress is not None:
+                progress(done, total)
+
+    hasher = _OrderedHasher(part)
+    for start, end in _written_ranges(chunks):
+        hasher.written(start, end)
+    writer = _RangeWriter(part, transfer_id, report, hasher)
+    if response.status_code == 200:
+        writer.write(response, 0, None)
+    else:
+        pieces = _split_ranges(missing, total)
+        first_end = pieces[0][1]
+        with ThreadPoolExecutor(max_workers=PARALLEL_STREAMS) as executor:
+            futures = [executor.submit(writer.write, response, first_start, first_end)]
+            for start, end in pieces[1:]:
+                futures.append(executor.submit(
+                    lambda start, end: writer.write(_checked_range(client, path, start, end, etag), start, end),
+                    start, end))
+            for future in futures:
+                future.result()
+    journal.update(transfer_id, sha256=hasher.hexdigest(total))
+    os.replace(part, target)
+    return target
+
+
+# Range request which fails if file was changed since first request
+def _checked_range(client: ManagingClient, path: Path, start: int, end: int, etag: str | None) -> requests.Response:
+    response = _request_range(client, path, start, end, etag)
+    _raise_for_status(response, (206,))
+    return response
+
+
+# Server runs commands by cmd, which expands %name% even in quotes. "%" is put outside of quotes
+# and escaped by caret there, so name of variable between two "%" would contain quotes and nothing is expanded
+def _quoted(text: str) -> str:
+    return '"' + text.replace('%', '"^%"') + '"'
+
+
+def _cmd_path(path: Path) -> str:
+    return _quoted(str(path).replace('/', '\\'))
+
+
+# ManagingClient puts command in url as is, so "&", "+" and "#" would be lost without escaping
+def run_command(client: ManagingClient, command: str) -> dict | None:
+    return client.cmd_command(quote(command, safe=''))
+
+
+# Names of logical disks like "C:/"
+def list_disks(client: ManagingClient) -> List[str]:
+    disks = client.cmd_command("wmic logicaldisk get name")['out'].split(':')
+    return list(map(lambda s: s.split('\n')[-1] + ':/', disks[:-1]))
+
+
+def _remote_size(client: ManagingClient, directory: Path, name: str) -> int:
+    file_list = client.list_files(directory) or dict()
+    for file in file_list.get('files', []):
+        if file['name'] == name:
+            return file['size']
+    return 0
+
+
+# Server can't append to file, so big file is sent by chunks which are glued on remote PC with copy /b.
+# Size of partial remote file tells which chunks are already there
+def upload_resumable(client: ManagingClient, path: Path, destination: Path, transfer_id: str,
+                     progress: ProgressCallback | None = None) -> None:
+    path = Path(path)
+    destination = Path(destination)
+    if not path.exists():
+        raise PathNotFoundError
+    size = path.stat().st_size
+    if not path.is_file() or str(destination) == '.' or size <= RESUMABLE_CHUNK_SIZE:
+        upload(client, path, destination, progress)
+        return
+
+    entry = journal.get(transfer_id) or dict()
+    source = [size, path.stat().st_mtime]
+    chunks = entry.get('chunks', []) if entry.get('source') == source else []
+    partial = destination / f"{path.name}.partial"
+    remote_size = _remote_size(client, destination, partial.name) if chunks else 0
+    offset = remote_size if remote_size in {end for start, end, crc in chunks} else 0
+    chunks = [chunk_entry for chunk_entry in chunks if chunk_entry[1] <= offset]
+    journal.update(transfer_id, source=source, chunks=chunks, total=size)
+
+    done = offset
+    lock = Lock()
+
+    def report(length: int) -> None:
+        nonlocal done
+        with lock:
+            done += length
+            if progress is not None:
+                progress(done, size)
+
+    # Chunks are sent by several streams for big files, but glued strictly in order
+    streams = PARALLEL_STREAMS if size >= PARALLEL_THRESHOLD else 1
+    starts = range(offset, size, RESUMABLE_CHUNK_SIZE)
+    with ThreadPoolExecutor(max_workers=streams) as executor:
+        futures = [executor.submit(_upload_chunk, client, path, destination, start,
+                                   min(RESUMABLE_CHUNK_SIZE, size - start), report, transfer_id) for start in starts]
+        try:
+            for start, future in zip(starts, futures):
+                chunk, length, crc = future.result()
+                if start == 0:
+                    run_command(client, f'move /y {_cmd_path(chunk)} {_cmd_path(partial)}')
+                else:
+                    run_command(client, f'copy /b {_cmd_path(partial)}+{_cmd_path(chunk)} {_cmd_path(partial)} '
+                                        f'&& del /f {_cmd_path(chunk)}')
+                journal.add_chunk(transfer_id, start, start + length, crc)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+    run_command(client, f'move /y {_cmd_path(partial)} {_cmd_path(destination / path.name)}')
+
+
+def _upload_chunk(client: ManagingClient, path: Path, destination: Path, start: int, length: int,
+                  report: Callable[[int], None], flow: str) -> tuple:
+    chunk = destination / f"{path.name}.chunk{start // RESUMABLE_CHUNK_SIZE}"
+    sent = 0
+
+    def chunk_progress(done: int, total: int) -> None:
+        nonlocal sent
+        report(done - sent)
+        sent = done
+
+    body = MultipartBody(path, {'destination': str(destination)}, chunk_progress, start, length, chunk.name,
+                         flow=flow)
+    try:
+        response = _post_file(client, body)
+    finally:
+        body.close()
+    _raise_for_status(response)
+    return chunk, length, body.crc
+
+
+# Command with list of arguments is split into several ones, so each of them fits into cmd line
+def _split_command(prefix: str, arguments: List[str]) -> List[str]:
+    commands = []
+    current = []
+    length = len(prefix)
+    for argument in arguments:
+        if current and length + len(argument) + 1 > CMD_LENGTH_LIMIT:
+            commands.append(f"{prefix} {' '.join(current)}")
+            current = []
+            length = len(prefix)
+        current.append(argument)
+        length += len(argument) + 1
+    if current:
+        commands.append(f"{prefix} {' '.join(current)}")
+    return commands
+
+
+def make_remote_dirs(client: ManagingClient, paths: List[Path]) -> None:
+    for command in _split_command('mkdir', list(map(_cmd_path, paths))):
+        run_command(client, command)
+
+
+# Small files are sent as one zip archive, which is unpacked on remote PC by tar
+def upload_batch(client: ManagingClient, root: Path, files: List[Path], destination: Path,
+                 progress: ProgressCallback | None = None) -> None:
+    with TemporaryDirectory() as temp_dir:
+        archive = Path(temp_dir) / f".batch_{uuid4().hex}.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for file in files:
+                zip_file.write(file, file.relative_to(root))
+        upload(client, archive, destination, progress)
+    remote_archive = destination / archive.name
+    run_command(client, f'tar -xf {_cmd_path(remote_archive)} -C {_cmd_path(destination)} '
+                        f'&& del /f {_cmd_path(remote_archive)}')
+
+
+# Small files of remote directory are packed by tar on remote PC and downloaded as one archive
+def download_batch(client: ManagingClient, directory: Path, names: List[str], local_dir: Path,
+                   progress: ProgressCallback | None = None) -> None:
+    archive = directory / f".batch_{uuid4().hex}.zip"
+    run_command(client, f'tar -a -cf {_cmd_path(archive)} -C {_cmd_path(directory)} '
+                        f'{" ".join(map(_quoted, names))}')
+    try:
+        with TemporaryDirectory() as temp_dir:
+            local_archive = download(client, archive, Path(temp_dir), progress)
+            with zipfile.ZipFile(local_archive) as zip_file:
+                zip_file.extractall(local_dir)
+    finally:
+        run_command(client, f'del /f {_cmd_path(archive)}')
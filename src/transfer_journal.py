@@ -0,0 +1,97 @@
+import atexit
+import json
+import os
+from threading import Lock, Timer
+from time import monotonic
+from typing import Dict, List
+from uuid import uuid4
+
+from src.config import JOURNAL_FILE, JOURNAL_FLUSH_INTERVAL
+
+
+# Persistent list of unfinished transfers with completed chunks of each one.
+# Writes are batched, losing last chunks is safe because they are verified on resume
+class TransferJournal:
+    def __init__(self, journal_file: str):
+        self.journal_file = journal_file
+        self.lock = Lock()
+        self.save_lock = Lock()
+        self.entries: Dict[str, dict] = self._load()
+        self.last_save = 0.0
+        self.dirty = False
+        self.timer: Timer | None = None
+
+    def _load(self) -> Dict[str, dict]:
+        if not os.path.exists(self.journal_file):
+            return dict()
+        try:
+            with open(self.journal_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+    def add(self, entry: dict) -> str:
+        transfer_id = uuid4().hex
+        with self.lock:
+            self.entries[transfer_id] = entry
+        self._schedule_save()
+        return transfer_id
+
+    def get(self, transfer_id: str) -> dict | None:
+        with self.lock:
+            entry = self.entries.get(transfer_id)
+            return None if entry is None else dict(entry)
+
+    def update(self, transfer_id: str, **values) -> None:
+        with self.lock:
+            if transfer_id not in self.entries:
+                return
+            self.entries[transfer_id].update(values)
+        self._schedule_save()
+
+    # Completed range of bytes with its crc32
+    def add_chunk(self, transfer_id: str, start: int, end: int, crc: int) -> None:
+        with self.lock:
+            if transfer_id not in self.entries:
+                return
+            self.entries[transfer_id].setdefault('chunks', []).append([start, end, crc])
+        self._schedule_save()
+
+    def remove(self, transfer_id: str) -> None:
+        with self.lock:
+            self.entries.pop(transfer_id, None)
+        self._schedule_save()
+
+    def unfinished(self, pc_id: str) -> List[tuple]:
+        with self.lock:
+            return [(transfer_id, dict(entry)) for transfer_id, entry in self.entries.items() if entry['pc'] == pc_id]
+
+    def _schedule_save(self) -> None:
+        with self.lock:
+            self.dirty = True
+            if self.timer is not None:
+                return
+            delay = max(0.0, JOURNAL_FLUSH_INTERVAL - (monotonic() - self.last_save))
+            self.timer = Timer(delay, self.save)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def save(self) -> None:
+        with self.save_lock:
+            with self.lock:
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+                if not self.dirty:
+                    return
+                self.dirty = False
+                self.last_save = monotonic()
+                data = json.dumps(self.entries, indent=2)
+            temp_file = f"{self.journal_file}.tmp"
+            with open(temp_file, 'w') as f:
+                f.write(data)
+            os.replace(temp_file, self.journal_file)
+
+
+journal = TransferJournal(JOURNAL_FILE)
+atexit.register(journal.save)
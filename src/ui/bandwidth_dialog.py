@@ -0,0 +1,67 @@
+# Form implementation generated from reading ui file 'res/ui/bandwidth_dialog.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_Dialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(460, 400)
+        self.globalLabel = QtWidgets.QLabel(parent=Dialog)
+        self.globalLabel.setGeometry(QtCore.QRect(10, 10, 181, 31))
+        self.globalLabel.setObjectName("globalLabel")
+        self.globalLimit = QtWidgets.QSpinBox(parent=Dialog)
+        self.globalLimit.setGeometry(QtCore.QRect(200, 10, 251, 31))
+        self.globalLimit.setMaximum(10000000)
+        self.globalLimit.setSingleStep(100)
+        self.globalLimit.setObjectName("globalLimit")
+        self.transferLabel = QtWidgets.QLabel(parent=Dialog)
+        self.transferLabel.setGeometry(QtCore.QRect(10, 50, 181, 31))
+        self.transferLabel.setObjectName("transferLabel")
+        self.transferLimit = QtWidgets.QSpinBox(parent=Dialog)
+        self.transferLimit.setGeometry(QtCore.QRect(200, 50, 251, 31))
+        self.transferLimit.setMaximum(10000000)
+        self.transferLimit.setSingleStep(100)
+        self.transferLimit.setObjectName("transferLimit")
+        self.scheduleLabel = QtWidgets.QLabel(parent=Dialog)
+        self.scheduleLabel.setGeometry(QtCore.QRect(10, 90, 441, 31))
+        self.scheduleLabel.setObjectName("scheduleLabel")
+        self.schedule = QtWidgets.QTableWidget(parent=Dialog)
+        self.schedule.setGeometry(QtCore.QRect(10, 130, 441, 181))
+        self.schedule.setObjectName("schedule")
+        self.schedule.setColumnCount(0)
+        self.schedule.setRowCount(0)
+        self.addRule = QtWidgets.QPushButton(parent=Dialog)
+        self.addRule.setGeometry(QtCore.QRect(10, 320, 141, 31))
+        self.addRule.setObjectName("addRule")
+        self.removeRule = QtWidgets.QPushButton(parent=Dialog)
+        self.removeRule.setGeometry(QtCore.QRect(160, 320, 141, 31))
+        self.removeRule.setObjectName("removeRule")
+        self.current = QtWidgets.QLabel(parent=Dialog)
+        self.current.setGeometry(QtCore.QRect(10, 360, 441, 31))
+        self.current.setObjectName("current")
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Bandwidth"))
+        self.globalLabel.setText(_translate("Dialog", "All transfers"))
+        self.globalLimit.setSpecialValueText(_translate("Dialog", "Unlimited"))
+        self.globalLimit.setSuffix(_translate("Dialog", " KB/s"))
+        self.transferLabel.setText(_translate("Dialog", "Each transfer"))
+        self.transferLimit.setSpecialValueText(_translate("Dialog", "Unlimited"))
+        self.transferLimit.setSuffix(_translate("Dialog", " KB/s"))
+        self.scheduleLabel.setText(_translate("Dialog", "Schedule, rules replace limits above within their hours"))
+        self.addRule.setText(_translate("Dialog", "Add rule"))
+        self.removeRule.setText(_translate("Dialog", "Remove rule"))
+
+
+UI_HASH = "fab6b24d1acdfc7922f91d7ce68b606484c99078"
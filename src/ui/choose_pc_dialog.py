@@ -0,0 +1,43 @@
+# Form implementation generated from reading ui file 'res/ui/choose_pc_dialog.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_Dialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(600, 450)
+        self.label = QtWidgets.QLabel(parent=Dialog)
+        self.label.setGeometry(QtCore.QRect(10, 10, 131, 31))
+        self.label.setObjectName("label")
+        self.groupBox = QtWidgets.QGroupBox(parent=Dialog)
+        self.groupBox.setGeometry(QtCore.QRect(10, 50, 581, 391))
+        self.groupBox.setTitle("")
+        self.groupBox.setObjectName("groupBox")
+        self.table = QtWidgets.QListWidget(parent=self.groupBox)
+        self.table.setGeometry(QtCore.QRect(10, 10, 561, 331))
+        self.table.setObjectName("table")
+        self.secure_token = QtWidgets.QLineEdit(parent=self.groupBox)
+        self.secure_token.setGeometry(QtCore.QRect(100, 350, 161, 31))
+        self.secure_token.setObjectName("secure_token")
+        self.label_2 = QtWidgets.QLabel(parent=self.groupBox)
+        self.label_2.setGeometry(QtCore.QRect(10, 350, 81, 31))
+        self.label_2.setObjectName("label_2")
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Choose PC to connect"))
+        self.label.setText(_translate("Dialog", "Choose PC to connect"))
+        self.label_2.setText(_translate("Dialog", "Secure token"))
+
+
+UI_HASH = "6ec4b0754359b7963addbdc846fafd41ed11aeb9"
@@ -0,0 +1,45 @@
+# Form implementation generated from reading ui file 'res/ui/console_widget.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_tab_2(object):
+    def setupUi(self, tab_2):
+        tab_2.setObjectName("tab_2")
+        tab_2.resize(795, 572)
+        self.groupBox = QtWidgets.QGroupBox(parent=tab_2)
+        self.groupBox.setGeometry(QtCore.QRect(0, 0, 801, 91))
+        self.groupBox.setTitle("")
+        self.groupBox.setObjectName("groupBox")
+        self.textEdit = QtWidgets.QTextEdit(parent=self.groupBox)
+        self.textEdit.setGeometry(QtCore.QRect(10, 10, 661, 71))
+        self.textEdit.setObjectName("textEdit")
+        self.send = QtWidgets.QPushButton(parent=self.groupBox)
+        self.send.setGeometry(QtCore.QRect(680, 10, 111, 31))
+        self.send.setObjectName("send")
+        self.cancel = QtWidgets.QPushButton(parent=self.groupBox)
+        self.cancel.setGeometry(QtCore.QRect(680, 50, 111, 31))
+        self.cancel.setEnabled(False)
+        self.cancel.setObjectName("cancel")
+        self.textBrowser = QtWidgets.QTextBrowser(parent=tab_2)
+        self.textBrowser.setGeometry(QtCore.QRect(10, 100, 771, 461))
+        self.textBrowser.setObjectName("textBrowser")
+
+        self.retranslateUi(tab_2)
+        QtCore.QMetaObject.connectSlotsByName(tab_2)
+
+    def retranslateUi(self, tab_2):
+        _translate = QtCore.QCoreApplication.translate
+        tab_2.setWindowTitle(_translate("tab_2", "Form"))
+        self.textEdit.setPlaceholderText(_translate("tab_2", "Write your command here, Ctrl+Enter to send, Ctrl+Up/Down for history"))
+        self.send.setText(_translate("tab_2", "Send"))
+        self.cancel.setText(_translate("tab_2", "Cancel"))
+
+
+UI_HASH = "8b8899747508a18c526438c8a62de4affd29fee2"
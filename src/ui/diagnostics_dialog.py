@@ -0,0 +1,43 @@
+# Form implementation generated from reading ui file 'res/ui/diagnostics_dialog.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_Dialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(800, 450)
+        self.table = QtWidgets.QTableWidget(parent=Dialog)
+        self.table.setGeometry(QtCore.QRect(10, 10, 781, 391))
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setObjectName("table")
+        self.table.setColumnCount(0)
+        self.table.setRowCount(0)
+        self.exportJson = QtWidgets.QPushButton(parent=Dialog)
+        self.exportJson.setGeometry(QtCore.QRect(10, 410, 141, 31))
+        self.exportJson.setObjectName("exportJson")
+        self.exportPrometheus = QtWidgets.QPushButton(parent=Dialog)
+        self.exportPrometheus.setGeometry(QtCore.QRect(160, 410, 141, 31))
+        self.exportPrometheus.setObjectName("exportPrometheus")
+        self.reset = QtWidgets.QPushButton(parent=Dialog)
+        self.reset.setGeometry(QtCore.QRect(650, 410, 141, 31))
+        self.reset.setObjectName("reset")
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Diagnostics"))
+        self.exportJson.setText(_translate("Dialog", "Export JSON"))
+        self.exportPrometheus.setText(_translate("Dialog", "Export Prometheus"))
+        self.reset.setText(_translate("Dialog", "Reset"))
+
+
+UI_HASH = "b2f391477c935f6687ff41d2ceee0da1ae000e1a"
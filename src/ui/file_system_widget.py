@@ -0,0 +1,64 @@
+# Form implementation generated from reading ui file 'res/ui/file_system_widget.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_tab_1(object):
+    def setupUi(self, tab_1):
+        tab_1.setObjectName("tab_1")
+        tab_1.resize(795, 572)
+        self.groupBox = QtWidgets.QGroupBox(parent=tab_1)
+        self.groupBox.setGeometry(QtCore.QRect(0, 0, 801, 51))
+        self.groupBox.setTitle("")
+        self.groupBox.setObjectName("groupBox")
+        self.downloadBtn = QtWidgets.QPushButton(parent=self.groupBox)
+        self.downloadBtn.setGeometry(QtCore.QRect(10, 10, 111, 31))
+        self.downloadBtn.setObjectName("downloadBtn")
+        self.uploadBtn = QtWidgets.QPushButton(parent=self.groupBox)
+        self.uploadBtn.setGeometry(QtCore.QRect(130, 10, 111, 31))
+        self.uploadBtn.setObjectName("uploadBtn")
+        self.deleteBtn = QtWidgets.QPushButton(parent=self.groupBox)
+        self.deleteBtn.setGeometry(QtCore.QRect(370, 10, 111, 31))
+        self.deleteBtn.setObjectName("deleteBtn")
+        self.renameBtn = QtWidgets.QPushButton(parent=self.groupBox)
+        self.renameBtn.setGeometry(QtCore.QRect(250, 10, 111, 31))
+        self.renameBtn.setObjectName("renameBtn")
+        self.progressBar = QtWidgets.QProgressBar(parent=self.groupBox)
+        self.progressBar.setGeometry(QtCore.QRect(510, 10, 261, 31))
+        self.progressBar.setProperty("value", 0)
+        self.progressBar.setObjectName("progressBar")
+        self.progressBarText = QtWidgets.QLabel(parent=self.groupBox)
+        self.progressBarText.setGeometry(QtCore.QRect(510, 10, 261, 31))
+        self.progressBarText.setText("")
+        self.progressBarText.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        self.progressBarText.setObjectName("progressBarText")
+        self.searchEdit = QtWidgets.QLineEdit(parent=tab_1)
+        self.searchEdit.setGeometry(QtCore.QRect(10, 60, 781, 31))
+        self.searchEdit.setClearButtonEnabled(True)
+        self.searchEdit.setObjectName("searchEdit")
+        self.searchResults = QtWidgets.QListWidget(parent=tab_1)
+        self.searchResults.setGeometry(QtCore.QRect(10, 100, 781, 461))
+        self.searchResults.setVisible(False)
+        self.searchResults.setObjectName("searchResults")
+
+        self.retranslateUi(tab_1)
+        QtCore.QMetaObject.connectSlotsByName(tab_1)
+
+    def retranslateUi(self, tab_1):
+        _translate = QtCore.QCoreApplication.translate
+        tab_1.setWindowTitle(_translate("tab_1", "Form"))
+        self.downloadBtn.setText(_translate("tab_1", "Download"))
+        self.uploadBtn.setText(_translate("tab_1", "Upload"))
+        self.deleteBtn.setText(_translate("tab_1", "Delete"))
+        self.deleteBtn.setProperty("class", _translate("tab_1", "danger"))
+        self.renameBtn.setText(_translate("tab_1", "Rename"))
+        self.searchEdit.setPlaceholderText(_translate("tab_1", "Search by name, *.ext or ext:ext"))
+
+
+UI_HASH = "b3e198d9f82727d16e1f6f4466e1fbc911d1a875"
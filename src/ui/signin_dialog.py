@@ -0,0 +1,63 @@
+# Form implementation generated from reading ui file 'res/ui/signin_dialog.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_Dialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(400, 330)
+        self.groupBox = QtWidgets.QGroupBox(parent=Dialog)
+        self.groupBox.setGeometry(QtCore.QRect(10, 10, 381, 311))
+        self.groupBox.setTitle("")
+        self.groupBox.setObjectName("groupBox")
+        self.label = QtWidgets.QLabel(parent=self.groupBox)
+        self.label.setGeometry(QtCore.QRect(10, 10, 361, 31))
+        self.label.setObjectName("label")
+        self.login = QtWidgets.QLineEdit(parent=self.groupBox)
+        self.login.setGeometry(QtCore.QRect(10, 50, 361, 31))
+        self.login.setObjectName("login")
+        self.label_2 = QtWidgets.QLabel(parent=self.groupBox)
+        self.label_2.setGeometry(QtCore.QRect(10, 90, 361, 31))
+        self.label_2.setObjectName("label_2")
+        self.password = QtWidgets.QLineEdit(parent=self.groupBox)
+        self.password.setGeometry(QtCore.QRect(10, 130, 361, 31))
+        self.password.setObjectName("password")
+        self.signin = QtWidgets.QPushButton(parent=self.groupBox)
+        self.signin.setGeometry(QtCore.QRect(100, 180, 171, 31))
+        self.signin.setObjectName("signin")
+        self.signup = QtWidgets.QPushButton(parent=self.groupBox)
+        self.signup.setGeometry(QtCore.QRect(130, 270, 111, 31))
+        self.signup.setObjectName("signup")
+        self.label_3 = QtWidgets.QLabel(parent=self.groupBox)
+        self.label_3.setGeometry(QtCore.QRect(10, 240, 361, 21))
+        self.label_3.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        self.label_3.setObjectName("label_3")
+        self.error_message = QtWidgets.QLabel(parent=self.groupBox)
+        self.error_message.setEnabled(True)
+        self.error_message.setGeometry(QtCore.QRect(10, 220, 361, 16))
+        self.error_message.setInputMethodHints(QtCore.Qt.InputMethodHint.ImhNone)
+        self.error_message.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        self.error_message.setObjectName("error_message")
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Dialog"))
+        self.label.setText(_translate("Dialog", "Login/Email"))
+        self.label_2.setText(_translate("Dialog", "Password"))
+        self.signin.setText(_translate("Dialog", "Sign in"))
+        self.signup.setText(_translate("Dialog", "Register"))
+        self.label_3.setText(_translate("Dialog", "Don\'t have an account? Signup below"))
+        self.error_message.setText(_translate("Dialog", "Wrong login or password"))
+
+
+UI_HASH = "fe583a81f25e40ee8eb0669473e38760150122b8"
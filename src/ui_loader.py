@@ -0,0 +1,48 @@
+import hashlib
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+
+from PyQt6 import uic
+from PyQt6.QtWidgets import QWidget
+
+
+# Widgets are built by modules generated from .ui files by pyuic, so xml is not parsed on every start.
+# Every module keeps hash of .ui file it was made from, module of changed .ui file is skipped and
+# .ui file is loaded as before. Modules are regenerated by "python -m src.ui_loader"
+
+UI_DIR = Path("res/ui")
+COMPILED_DIR = Path("src/ui")
+COMPILED_PACKAGE = "src.ui"
+
+
+def _ui_hash(ui_file: Path) -> str:
+    return hashlib.sha1(ui_file.read_bytes()).hexdigest()
+
+
+def load_ui(name: str, widget: QWidget) -> None:
+    ui_file = UI_DIR / f"{name}.ui"
+    try:
+        module = import_module(f"{COMPILED_PACKAGE}.{name}")
+    except ImportError:
+        module = None
+    if module is not None and getattr(module, "UI_HASH", None) == _ui_hash(ui_file):
+        ui = next(value for key, value in vars(module).items() if key.startswith("Ui_"))()
+        ui.setupUi(widget)
+        # Same attributes as loadUi sets
+        widget.__dict__.update(vars(ui))
+        return
+    uic.loadUi(str(ui_file), widget)
+
+
+def compile_all() -> None:
+    COMPILED_DIR.mkdir(exist_ok=True)
+    (COMPILED_DIR / "__init__.py").touch()
+    for ui_file in sorted(UI_DIR.glob("*.ui")):
+        code = StringIO()
+        uic.compileUi(str(ui_file), code)
+        (COMPILED_DIR / f"{ui_file.stem}.py").write_text(f'{code.getvalue()}\n\nUI_HASH = "{_ui_hash(ui_file)}"\n')
+
+
+if __name__ == "__main__":
+    compile_all()
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+from PyQt6.QtWidgets import QApplication
+from filesocket.config import store_keeper
+
+import src.search_index
+from src.download_cache import download_cache
+from src.transfer_journal import journal
+
+
+# Tests are started from root of repo: python -m pytest. Files which app keeps in working dir go to temp dir
+@pytest.fixture(autouse=True, scope="session")
+def isolated_files(tmp_path_factory):
+    temp_dir = tmp_path_factory.mktemp("app")
+    store_keeper.config_file = os.path.join(temp_dir, "config.json")
+    store_keeper.init()
+    journal.journal_file = os.path.join(temp_dir, "transfers.json")
+    src.search_index.SEARCH_INDEX_FILE = os.path.join(temp_dir, "index_{}.db")
+    download_cache.root = temp_dir / "download_cache"
+    return temp_dir
+
+
+# Widgets are created without display
+@pytest.fixture(scope="session")
+def qt_app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
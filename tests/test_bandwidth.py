@@ -0,0 +1,75 @@
+from datetime import datetime
+from threading import Thread
+from time import monotonic
+
+import pytest
+
+import src.bandwidth
+from src.bandwidth import BandwidthShaper, TokenBucket, _rule_active
+
+
+def test_bucket_lends_chunk_and_waits_for_debt():
+    bucket = TokenBucket(1000)
+    bucket.updated = 10.0
+    bucket.take(600, 10.0)
+    assert bucket.delay(10.0) == 0.6
+    assert bucket.delay(10.5) == pytest.approx(0.1)
+    assert bucket.delay(10.75) == 0
+    # Tokens are not saved beyond burst
+    assert bucket.delay(100.0) == 0 and bucket.tokens == 1000 * src.bandwidth.BANDWIDTH_BURST
+    assert TokenBucket(0).delay(0) == 0
+
+
+def test_rule_over_midnight():
+    rule = ["22:00", "06:30", 100, 0]
+    assert _rule_active(rule, datetime(2024, 1, 1, 23, 0))
+    assert _rule_active(rule, datetime(2024, 1, 1, 6, 29))
+    assert not _rule_active(rule, datetime(2024, 1, 1, 6, 30))
+    assert not _rule_active(["09:00", "17:00", 100, 0], datetime(2024, 1, 1, 17, 0))
+
+
+def test_least_served_flow_goes_first():
+    shaper = BandwidthShaper()
+    now = monotonic()
+    for key, served in (("a", 300), ("b", 100), ("c", 50)):
+        flow = shaper._flow(key, now)
+        flow.served = served
+        flow.waiting = 1
+    shaper.flows["c"].waiting = 0
+    assert shaper._next_flow(now) is shaper.flows["b"]
+    shaper.flows["b"].bucket.set_rate(10, now)
+    shaper.flows["b"].bucket.take(100, now)
+    # Flow in debt of its own limit lets others go
+    assert shaper._next_flow(now) is shaper.flows["a"]
+
+
+def test_shaper_without_limit_in_force_does_not_lock(monkeypatch):
+    shaper = BandwidthShaper()
+    shaper.configure(0, 0, [["00:00", "00:00", 0, 0]])
+    monkeypatch.setattr(src.bandwidth, "_rule_active", lambda rule, now: False)
+    shaper.condition = None
+    shaper.acquire("a", 100)
+    assert shaper.flows == {}
+
+
+# Transfer with four streams gets the same share of global limit as transfer with one stream
+def test_global_limit_is_shared_fairly():
+    shaper = BandwidthShaper()
+    shaper.configure(400_000, 0, [])
+    chunk = 4000
+    served = {"many": 0, "one": 0}
+    deadline = monotonic() + 1
+
+    def stream(key: str) -> None:
+        while monotonic() < deadline:
+            shaper.acquire(key, chunk)
+            served[key] += chunk
+
+    threads = [Thread(target=stream, args=("many",)) for _ in range(4)] + [Thread(target=stream, args=("one",))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = served["many"] + served["one"]
+    assert total < 400_000 * 1.5 + 5 * chunk
+    assert abs(served["many"] - served["one"]) <= total * 0.1
@@ -0,0 +1,33 @@
+import pytest
+from filesocket import ManagingClient, ServerError
+
+from src.client_pool import PooledClient
+
+
+class FakeClient(PooledClient):
+    def __init__(self):
+        super().__init__(1)
+        self.lookups = 0
+        self.lock_free_in_lookup = []
+
+    def _get_ngrok_ip(self) -> None:
+        self.lookups += 1
+        self.lock_free_in_lookup.append(not self.lock.locked())
+        self.device_ngrok_ip = f"http://address-{self.lookups}"
+
+
+def test_failed_request_asks_for_address_again(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(ManagingClient, "list_files", lambda self, path: {"dirs": [], "files": []})
+    assert client.list_files("C:/") == {"dirs": [], "files": []}
+    assert client.list_files("C:/") == {"dirs": [], "files": []}
+    assert client.lookups == 1
+
+    def lost(self, path):
+        raise ServerError("Connection refused")
+
+    monkeypatch.setattr(ManagingClient, "list_files", lost)
+    with pytest.raises(ServerError):
+        client.list_files("C:/")
+    assert client.device_ngrok_ip == "http://address-2"
+    assert client.lock_free_in_lookup == [True, True]
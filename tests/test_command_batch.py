@@ -0,0 +1,75 @@
+from pathlib import Path
+from urllib.parse import unquote
+
+import src.command_batch
+from src.command_batch import CommandBatch
+
+
+# Answers commands like cmd would, operations listed in fail are reported as failed
+class FakeClient:
+    def __init__(self, fail: set = frozenset(), output: str = ""):
+        self.fail = fail
+        self.output = output
+        self.commands = []
+
+    def cmd_command(self, command: str) -> dict:
+        command = unquote(command)
+        self.commands.append(command)
+        lines = []
+        for marker in command.split('echo @@')[1::2]:
+            number = int(marker.split()[0])
+            lines.append(f"@@{number} {'FAIL' if number in self.fail else 'OK'}")
+        return {'out': self.output + '\r\n'.join(lines) + '\r\n'}
+
+
+def test_results_follow_markers():
+    batch = CommandBatch()
+    assert batch.delete(Path("C:/dir"), True) == 0
+    assert batch.rename(Path("C:/dir/a b.txt"), "c.txt") == 1
+    assert batch.delete(Path("C:/file.txt"), False) == 2
+    client = FakeClient(fail={1})
+    assert batch.run(client) == [True, False, True]
+    assert len(client.commands) == 1
+    assert 'rmdir /s /q "C:\\dir"' in client.commands[0]
+    assert 'ren "C:\\dir\\a b.txt" "c.txt"' in client.commands[0]
+
+
+def test_output_of_commands_does_not_confuse_markers():
+    batch = CommandBatch()
+    batch.delete(Path("C:/file.txt"), False)
+    batch.delete(Path("C:/other.txt"), False)
+    client = FakeClient(output="Could Not Find C:\\file.txt\r\n  @@7 OK\r\nnot @@1 FAIL\r\n")
+    assert batch.run(client) == [True, True]
+
+
+def test_operation_without_marker_is_failed():
+    batch = CommandBatch()
+    batch.delete(Path("C:/file.txt"), False)
+
+    class SilentClient:
+        def cmd_command(self, command: str) -> None:
+            return None
+
+    assert batch.run(SilentClient()) == [False]
+
+
+def test_commands_are_split_by_length_limit(monkeypatch):
+    monkeypatch.setattr(src.command_batch, "CMD_LENGTH_LIMIT", 300)
+    batch = CommandBatch()
+    for number in range(10):
+        batch.delete(Path(f"C:/dir/file{number}.txt"), False)
+    commands = batch.commands()
+    assert len(commands) > 1
+    assert all(len(command) <= 300 for command in commands)
+    assert ' & '.join(commands) == ' & '.join(batch.operations)
+    client = FakeClient(fail={9})
+    assert batch.run(client) == [True] * 9 + [False]
+    assert len(client.commands) == len(commands)
+
+
+def test_percent_in_path_is_not_expanded():
+    batch = CommandBatch()
+    batch.rename(Path("C:/%USERNAME%/a.txt"), "100%.txt")
+    command = batch.commands()[0]
+    assert '"C:\\"^%"USERNAME"^%"\\a.txt"' in command
+    assert '"100"^%".txt"' in command
@@ -0,0 +1,91 @@
+import io
+import os
+import tarfile
+import zlib
+from pathlib import Path
+
+import pytest
+
+import src.compression
+from src.compression import _ChunkedUpload, _GrowingArchive
+
+CHUNK = 64 * 2 ** 10
+
+
+def packed(path: Path, offset: int, monkeypatch) -> tuple:
+    sent = []
+    monkeypatch.setattr(_ChunkedUpload, "_send", lambda self, data: (sent.append(data),
+                                                                      setattr(self, "offset", self.offset + len(data))))
+    monkeypatch.setattr(src.compression, "run_command", lambda client, command: None)
+    sink = _ChunkedUpload(None, Path("C:/dir"), "archive.tgz", "id", offset, lambda sent: None)
+    with path.open('rb') as f, tarfile.open(fileobj=sink, mode="w|") as tar:
+        tar.addfile(tar.gettarinfo(str(path), path.name), f)
+    sink.finish()
+    return sent, sink.position
+
+
+def test_resumed_upload_sends_rest_of_same_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.compression, "RESUMABLE_CHUNK_SIZE", CHUNK)
+    path = tmp_path / "data.txt"
+    path.write_bytes(b"".join(b"line %d %d\n" % (number, number % 7) for number in range(100000)))
+    chunks, size = packed(path, 0, monkeypatch)
+    assert len(chunks) > 2 and all(len(chunk) == CHUNK for chunk in chunks[:-1])
+    archive = b"".join(chunks)
+    assert len(archive) == size < path.stat().st_size
+    with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+        assert tar.extractfile("data.txt").read() == path.read_bytes()
+
+    rest, size = packed(path, 2 * CHUNK, monkeypatch)
+    assert b"".join(rest) == archive[2 * CHUNK:]
+
+
+class Response:
+    def __init__(self, status_code: int, content: bytes = b''):
+        self.status_code = status_code
+        self.content = content
+
+    def close(self) -> None:
+        pass
+
+
+# Remote tar writes archive by pieces, one piece appears every time its exit code is polled
+class Job:
+    def __init__(self, archive: bytes, pieces: int, exit_code: int = 0):
+        self.archive = archive
+        self.step = len(archive) // pieces + 1
+        self.written = 0
+        self.code = exit_code
+
+    def exit_code(self) -> int | None:
+        self.written = min(self.written + self.step, len(self.archive))
+        return self.code if self.written == len(self.archive) else None
+
+    def fetch(self, client, path, start, end, etag) -> Response:
+        if start >= self.written:
+            return Response(416)
+        return Response(206, self.archive[start:min(end, self.written)])
+
+
+def growing(job: Job, monkeypatch) -> _GrowingArchive:
+    monkeypatch.setattr(src.compression, "_request_range", job.fetch)
+    monkeypatch.setattr(src.compression, "COMPRESSION_POLL_INTERVAL", 1)
+    return _GrowingArchive(None, Path("C:/a.tgz"), job, "id", None)
+
+
+def test_archive_is_read_while_it_grows(monkeypatch):
+    data = os.urandom(100000)
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+        info = tarfile.TarInfo("a.bin")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    job = Job(archive.getvalue(), 10)
+    with tarfile.open(fileobj=growing(job, monkeypatch), mode="r|gz") as tar:
+        member = tar.next()
+        assert tar.extractfile(member).read() == data
+
+
+def test_failed_packing_ends_reading(monkeypatch):
+    stream = growing(Job(zlib.compress(b"x" * 1000), 3, exit_code=1), monkeypatch)
+    with pytest.raises(IOError):
+        stream.read()
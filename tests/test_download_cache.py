@@ -0,0 +1,80 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+import src.download_cache
+from src.download_cache import download_cached
+from src.transfer_journal import journal
+
+
+class FakeClient:
+    device_id = "cache"
+
+
+def fake_transfer(monkeypatch, content: bytes, remote_hash: str) -> list:
+    downloads = []
+
+    def download(client, path, destination, transfer_id, *args):
+        downloads.append(transfer_id)
+        target = Path(destination) / path.name
+        target.write_bytes(content)
+        journal.update(transfer_id, sha256=hashlib.sha256(content).hexdigest())
+        return target
+
+    monkeypatch.setattr(src.download_cache, "download_compressed", download)
+    monkeypatch.setattr(src.download_cache, "remote_hashes", lambda client, paths: {str(paths[0]): remote_hash})
+    return downloads
+
+
+def started(**values) -> str:
+    return journal.add({"kind": "download", "pc": "cache", "path": "C:/a.txt", **values})
+
+
+@pytest.mark.parametrize("cache_enabled, entry", [
+    (True, {}),
+    (False, {}),
+    # Continued transfer, after damaged one too
+    (True, {"target": "a.txt"}),
+    (True, {"archive": "C:/a.txt.tgz"}),
+    (True, {"target": None, "chunks": [], "archive": None, "sha256": None}),
+])
+def test_every_download_is_checked(tmp_path, monkeypatch, cache_enabled, entry):
+    monkeypatch.setattr(src.download_cache, "DOWNLOAD_CACHE_ENABLED", cache_enabled)
+    fake_transfer(monkeypatch, b"damaged", hashlib.sha256(b"content").hexdigest())
+    transfer_id = started(**entry)
+    with pytest.raises(IOError, match="damaged"):
+        download_cached(FakeClient(), Path("C:/a.txt"), tmp_path, transfer_id, remote={"size": 7})
+    assert not (tmp_path / "a.txt").exists()
+    assert journal.get(transfer_id)["sha256"] is None
+
+    fake_transfer(monkeypatch, b"content", hashlib.sha256(b"content").hexdigest())
+    assert download_cached(FakeClient(), Path("C:/a.txt"), tmp_path, transfer_id,
+                           remote={"size": 7}).read_bytes() == b"content"
+    journal.remove(transfer_id)
+
+
+def test_file_not_hashed_by_remote_pc_is_not_accepted(tmp_path, monkeypatch):
+    fake_transfer(monkeypatch, b"content", "")
+    transfer_id = started()
+    with pytest.raises(IOError, match="can't be checked"):
+        download_cached(FakeClient(), Path("C:/a.txt"), tmp_path, transfer_id, remote={"size": 7})
+    journal.remove(transfer_id)
+
+    fake_transfer(monkeypatch, b"", "")
+    transfer_id = started()
+    assert download_cached(FakeClient(), Path("C:/a.txt"), tmp_path, transfer_id, remote={"size": 0}).exists()
+    journal.remove(transfer_id)
+
+
+def test_large_file_is_taken_from_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.download_cache, "DOWNLOAD_CACHE_MIN_SIZE", 1)
+    downloads = fake_transfer(monkeypatch, b"content", hashlib.sha256(b"content").hexdigest())
+    remote = {"size": 7, "modification_time": 1.0}
+    for directory in ("first", "second"):
+        (tmp_path / directory).mkdir()
+        transfer_id = started()
+        assert download_cached(FakeClient(), Path("C:/a.txt"), tmp_path / directory, transfer_id,
+                               remote=remote).read_bytes() == b"content"
+        journal.remove(transfer_id)
+    assert len(downloads) == 1
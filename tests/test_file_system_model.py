@@ -0,0 +1,52 @@
+import pytest
+
+from src.config import FETCH_BATCH
+from src.file_system_model import FileSystemModel
+
+
+def entry(name: str, mtime: float = 0, size: int = 1) -> dict:
+    return {"name": name, "modification_time": mtime, "size": size}
+
+
+@pytest.fixture
+def model(qt_app):
+    model = FileSystemModel()
+    model.import_data(model.root, [entry("a", 1), entry("b", 1)], [entry("x.txt"), entry("y.txt")])
+    model.set_dir_sizes(model.root, {"a": 500, "b": 700})
+    return model
+
+
+def rows(model: FileSystemModel) -> dict:
+    node = model.root
+    return {name: (node.is_dir(row), node.mtimes[row], node.sizes[row]) for row, name in enumerate(node.names)}
+
+
+def record(model: FileSystemModel) -> list:
+    events = []
+    model.rowsRemoved.connect(lambda parent, first, last: events.append(("removed", first, last)))
+    model.rowsInserted.connect(lambda parent, first, last: events.append(("inserted", first, last)))
+    model.modelReset.connect(lambda: events.append(("reset",)))
+    return events
+
+
+def test_merge_keeps_rows_and_calculated_sizes(model):
+    events = record(model)
+    model.import_data(model.root, [entry("a", 1), entry("b", 2), entry("c", 1)], [entry("y.txt", 3, 5)])
+    assert rows(model) == {"a": (True, 1, 500), "b": (True, 2, -1), "c": (True, 1, -1), "y.txt": (False, 3, 5)}
+    # Changed directory b loses its calculated size. Only changed rows are touched: x.txt removed, c inserted
+    assert sorted(events) == [("inserted", 2, 2), ("removed", 2, 2)]
+    assert model.rowCount() == 4
+
+
+def test_entry_which_changed_kind_is_replaced(model):
+    model.import_data(model.root, [entry("a", 1), entry("b", 1), entry("x.txt", 1)], [entry("y.txt")])
+    assert rows(model)["x.txt"][0] is True
+    assert model.root.dir_count == 3
+
+
+def test_many_changes_replace_listing(model):
+    events = record(model)
+    files = [entry(f"file{number}.txt") for number in range(FETCH_BATCH + 10)]
+    model.import_data(model.root, [], files)
+    assert events[0] == ("removed", 0, 3)
+    assert len(model.root.names) == FETCH_BATCH + 10 and model.root.dir_count == 0
@@ -0,0 +1,36 @@
+import logging
+import sqlite3
+
+import pytest
+from PyQt6.QtCore import QCoreApplication, QEvent
+from PyQt6.QtWidgets import QApplication, QWidget
+
+from src.file_system_widget import FileSystemWidget
+
+
+class FakeClient:
+    device_id = "widget"
+
+    def list_files(self, path) -> dict:
+        return {"dirs": [], "files": []}
+
+    def cmd_command(self, command: str) -> dict:
+        return {"out": "Name\nC:\n", "err": ""}
+
+
+def test_closed_tab_closes_its_index(qt_app):
+    parent = QWidget()
+    parent.logger = logging.getLogger("test")
+    widget = FileSystemWidget(parent, FakeClient())
+    index = widget.search_index
+    widget.shutdown()
+    while not widget.is_idle():
+        QApplication.processEvents()
+    # Signals of finished workers come before deletion, as in main window which deletes tab by timer
+    QApplication.processEvents()
+    widget.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+    with pytest.raises(sqlite3.ProgrammingError):
+        index.connection.execute("SELECT 1")
+    with pytest.raises(sqlite3.ProgrammingError):
+        index.reader.execute("SELECT 1")
@@ -0,0 +1,43 @@
+import src.listing_cache
+from src.listing_cache import ListingCache
+
+
+def listing(name: str) -> dict:
+    return {"dirs": [], "files": [{"name": name, "size": 1, "modification_time": 0}]}
+
+
+def test_fresh_and_stale(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(src.listing_cache, "monotonic", lambda: now[0])
+    cache = ListingCache(ttl=30)
+    assert cache.get("C:/a") is None
+    cache.put("C:/a", listing("x"))
+    assert cache.get("C:/a") == (listing("x"), True)
+    now[0] += 31
+    # Stale listing is still returned, caller revalidates it
+    assert cache.get("C:/a") == (listing("x"), False)
+    cache.put("C:/a", listing("y"))
+    assert cache.get("C:/a") == (listing("y"), True)
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 1}
+
+
+def test_least_recently_used_is_dropped():
+    cache = ListingCache(max_size=2)
+    cache.put("C:/a", listing("a"))
+    cache.put("C:/b", listing("b"))
+    cache.get("C:/a")
+    cache.put("C:/c", listing("c"))
+    assert cache.get("C:/b") is None
+    assert cache.get("C:/a") is not None and cache.get("C:/c") is not None
+
+
+def test_invalidate():
+    cache = ListingCache()
+    for key in ("C:/a", "C:/a/b", "C:/a/b/c", "C:/ab", "D:/a"):
+        cache.put(key, listing(key))
+    cache.invalidate("C:/a/b")
+    assert cache.get("C:/a/b") is None and cache.get("C:/a/b/c") is not None
+    cache.invalidate("C:/a", recursive=True)
+    assert [key for key in ("C:/a", "C:/a/b/c", "C:/ab", "D:/a") if cache.get(key) is not None] == ["C:/ab", "D:/a"]
+    cache.clear()
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,53 @@
+import logging
+from time import monotonic
+
+from PyQt6.QtCore import QMimeData, QPointF, Qt, QUrl
+from PyQt6.QtGui import QDragEnterEvent, QDragMoveEvent, QDropEvent
+from PyQt6.QtWidgets import QApplication, QWidget
+
+from main import MainWindow, StartupTimer
+from src.dragndrop_tree_view import DragNDropTreeView
+
+
+def wait_until(condition, timeout: float = 3.0) -> bool:
+    deadline = monotonic() + timeout
+    while not condition() and monotonic() < deadline:
+        QApplication.processEvents()
+    return condition()
+
+
+def uri_list() -> QMimeData:
+    mime = QMimeData()
+    mime.setUrls([QUrl.fromLocalFile("/tmp/a.txt")])
+    return mime
+
+
+def test_drag_over_tab_of_other_pc_opens_it(qt_app):
+    window = MainWindow(StartupTimer(monotonic()))
+    window.tabWidget.addTab(QWidget(), "First PC")
+    window.tabWidget.addTab(QWidget(), "Second PC")
+    window.tabWidget.setCurrentIndex(0)
+    tab_bar = window.tabWidget.tabBar()
+    position = QPointF(tab_bar.tabRect(1).center())
+    mime = uri_list()
+    actions = Qt.DropAction.CopyAction
+    QApplication.sendEvent(tab_bar, QDragEnterEvent(position.toPoint(), actions, mime, Qt.MouseButton.LeftButton,
+                                                    Qt.KeyboardModifier.NoModifier))
+    QApplication.sendEvent(tab_bar, QDragMoveEvent(position.toPoint(), actions, mime, Qt.MouseButton.LeftButton,
+                                                   Qt.KeyboardModifier.NoModifier))
+    assert wait_until(lambda: window.tabWidget.currentIndex() == 1)
+    window.close()
+
+
+def test_drop_from_tree_of_other_pc_is_copied_between_pcs(qt_app):
+    parent = QWidget()
+    parent.logger = logging.getLogger("test")
+    dropped, copied = [], []
+    source = DragNDropTreeView(parent, lambda indexes: [], lambda *args: dropped.append(args))
+    target = DragNDropTreeView(parent, lambda indexes: [], lambda *args: dropped.append(args),
+                               lambda *args: copied.append(args))
+    event = QDropEvent(QPointF(1, 1), Qt.DropAction.CopyAction, uri_list(), Qt.MouseButton.NoButton,
+                       Qt.KeyboardModifier.NoModifier)
+    event.source = lambda: source
+    target.dropEvent(event)
+    assert copied == [(source, None)] and dropped == []
@@ -0,0 +1,88 @@
+import base64
+import os
+from pathlib import Path
+from urllib.parse import unquote
+
+import src.mirror
+from src.mirror import remote_hashes, make_plan, set_remote_mtime, PUSH, PULL
+
+HASH = "ab" * 32
+
+
+# Output of certutil for every hashed path, names are not case sensitive. New versions print hash without spaces, old ones split bytes
+class CertutilClient:
+    def __init__(self, hashes: dict):
+        self.hashes = {path.lower(): (path, digest) for path, digest in hashes.items()}
+        self.commands = []
+
+    def cmd_command(self, command: str) -> dict:
+        command = unquote(command)
+        self.commands.append(command)
+        out = []
+        for part in command.split(' & '):
+            path = part.split('"')[1].lower()
+            if path in self.hashes:
+                name, digest = self.hashes[path]
+                out += [f"SHA256 hash of {name}:", digest, "CertUtil: -hashfile command completed successfully."]
+            else:
+                out += ["CertUtil: -hashfile command FAILED: 0x80070002 (WIN32: 2 ERROR_FILE_NOT_FOUND)"]
+        return {'out': '\r\n'.join(out) + '\r\n'}
+
+
+def test_hashes_are_parsed():
+    spaced = ' '.join(HASH[i:i + 2] for i in range(0, len(HASH), 2)).upper()
+    client = CertutilClient({"C:\\dir\\a b.txt": HASH, "C:\\dir\\Old.TXT": spaced})
+    paths = [Path("C:/dir/a b.txt"), Path("C:/dir/old.txt"), Path("C:/dir/missing.txt")]
+    assert remote_hashes(client, paths) == {str(paths[0]): HASH, str(paths[1]): HASH, str(paths[2]): ''}
+    assert len(client.commands) == 1
+
+
+def test_commands_are_split_by_length_limit(monkeypatch):
+    monkeypatch.setattr(src.mirror, "CMD_LENGTH_LIMIT", 200)
+    paths = [Path(f"C:/dir/file{number}.txt") for number in range(10)]
+    client = CertutilClient({str(path).replace('/', '\\'): HASH for path in paths})
+    assert set(remote_hashes(client, paths).values()) == {HASH}
+    assert len(client.commands) > 1 and all(len(command) <= 200 for command in client.commands)
+
+
+# Remote tree kept as listings of directories, keyed by path relative to root
+class TreeClient:
+    def __init__(self, root: Path, listings: dict):
+        self.root = root
+        self.listings = listings
+        self.commands = []
+
+    def list_files(self, path: Path) -> dict:
+        relative = Path(path).relative_to(self.root).as_posix()
+        return self.listings.get(relative, {"dirs": [], "files": []})
+
+    def cmd_command(self, command: str) -> dict:
+        self.commands.append(unquote(command))
+        return {'out': ''}
+
+
+def test_plan_deletes_topmost_extra_dirs(tmp_path):
+    (tmp_path / "kept").mkdir()
+    (tmp_path / "kept" / "a.txt").write_bytes(b"a")
+    os.utime(tmp_path / "kept" / "a.txt", (100, 100))
+    remote = {
+        ".": {"dirs": [{"name": "kept"}, {"name": "old"}], "files": [{"name": "b.txt", "size": 1,
+                                                                       "modification_time": 5}]},
+        "kept": {"dirs": [], "files": [{"name": "a.txt", "size": 1, "modification_time": 100}]},
+        "old": {"dirs": [{"name": "deep"}], "files": [{"name": "c.txt", "size": 1, "modification_time": 5}]},
+    }
+    client = TreeClient(Path("C:/root"), remote)
+    plan = make_plan(client, tmp_path, Path("C:/root"), PUSH)
+    assert plan["copy"] == [] and plan["unchanged"] == 1
+    assert plan["delete"] == ["b.txt", "old/c.txt"]
+    assert plan["delete_dirs"] == ["old"]
+    assert make_plan(client, tmp_path, Path("C:/root"), PULL)["dirs"] == ["old", "old/deep"]
+
+
+def test_remote_mtime_is_set_by_encoded_script():
+    client = TreeClient(Path("C:/"), {})
+    set_remote_mtime(client, Path("C:/dir/it's 100%.txt"), 1700000000.5)
+    command = client.commands[0]
+    assert command.startswith("powershell ") and "%" not in command and "'" not in command
+    script = base64.b64decode(command.split()[-1]).decode('utf-16-le')
+    assert "-LiteralPath 'C:\\dir\\it''s 100%.txt'" in script and "AddSeconds(1700000000.5)" in script
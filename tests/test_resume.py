@@ -0,0 +1,108 @@
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+from time import monotonic, sleep
+
+import pytest
+import requests
+from filesocket.config import store_keeper
+
+import src.transfer
+from src.client_pool import PooledClient
+from src.transfer import download_resumable, _part_path
+from src.transfer_journal import journal
+
+MiB = 2 ** 20
+
+
+# Resume against real filesocket server of managed PC, started on free port in temp dir
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    pytest.importorskip("uvicorn")
+    work_dir = tmp_path_factory.mktemp("server")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "filesocket.managed_device_client:app",
+                                "--port", str(port)], cwd=work_dir, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(url, timeout=1)
+                break
+            except requests.RequestException:
+                sleep(0.1)
+        else:
+            pytest.skip("filesocket server didn't start")
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@pytest.fixture
+def client(server):
+    store_keeper.add_token("test")
+    client = PooledClient("test", "test")
+    client.device_ngrok_ip = server
+    client.last_used = monotonic() + 10 ** 6
+    return client
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _interrupt_after(limit: int):
+    def progress(done: int, total: int) -> None:
+        if done >= limit:
+            raise Interrupted
+
+    return progress
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_interrupted_download_fetches_only_missing_ranges(client, tmp_path, monkeypatch, parallel):
+    monkeypatch.setattr(src.transfer, "RESUMABLE_CHUNK_SIZE", MiB)
+    monkeypatch.setattr(src.transfer, "PARALLEL_THRESHOLD", 4 * MiB if parallel else 2 ** 40)
+    data = os.urandom(9 * MiB + MiB // 2)
+    remote = tmp_path / "remote" / "file.bin"
+    remote.parent.mkdir()
+    remote.write_bytes(data)
+    local = tmp_path / "local"
+    local.mkdir()
+
+    transfer_id = journal.add({"kind": "download", "pc": "test", "path": str(remote), "destination": str(local)})
+    with pytest.raises(IOError):
+        download_resumable(client, remote, local, transfer_id, _interrupt_after(4 * MiB))
+    entry = journal.get(transfer_id)
+    assert _part_path(local / "file.bin").exists()
+    written = sum(end - start for start, end, crc in entry['chunks'])
+    assert 0 < written < len(data)
+
+    requested = []
+    request_range = src.transfer._request_range
+
+    def recorded(client, path, start, end, etag):
+        requested.append((start, end))
+        return request_range(client, path, start, end, etag)
+
+    monkeypatch.setattr(src.transfer, "_request_range", recorded)
+    reported = []
+    target = download_resumable(client, remote, local, transfer_id, lambda done, total: reported.append(done))
+    assert target == local / "file.bin"
+    assert target.read_bytes() == data
+    assert journal.get(transfer_id)['sha256'] == hashlib.sha256(data).hexdigest()
+
+    # First request is open ended and is read only up to end of its piece, others are bounded
+    missing = src.transfer._missing_ranges(entry['chunks'], len(data))
+    assert requested[0] == (missing[0][0], None)
+    for start, end in requested[1:]:
+        assert end is not None and any(low <= start < end <= high for low, high in missing)
+    fetched = sum(end - start for start, end in missing)
+    assert reported[-1] == len(data) and reported[0] > len(data) - fetched
+    journal.remove(transfer_id)
@@ -0,0 +1,70 @@
+import pytest
+
+from src.search_index import SearchIndex
+
+
+def file(name: str, size: int = 1, mtime: float = 0) -> dict:
+    return {"name": name, "size": size, "modification_time": mtime}
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.search_index.SEARCH_INDEX_FILE", str(tmp_path / "index_{}.db"))
+    index = SearchIndex("test")
+    index.put_dir("C:", 1.0, [file("Docs"), file("Photos")], [file("notes.TXT"), file("a.py")])
+    index.put_dir("C:/Docs", 2.0, [file("ab")], [file("report.txt"), file("report.pdf"), file("ab_cd.md")])
+    yield index
+    index.close()
+
+
+def names(results: list) -> set:
+    return {(parent, name) for parent, name, is_dir, size, mtime in results}
+
+
+def test_extension_filter(index):
+    expected = {("C:", "notes.TXT"), ("C:/Docs", "report.txt")}
+    assert names(index.search("*.TXT")) == expected
+    assert names(index.search("*.txt")) == expected
+    assert names(index.search("EXT:txt")) == expected
+    assert names(index.search("report *.txt")) == {("C:/Docs", "report.txt")}
+
+
+def test_words_match_parts_of_name(index):
+    assert names(index.search("EPOR")) == {("C:/Docs", "report.txt"), ("C:/Docs", "report.pdf")}
+    # Short words are matched by LIKE, "_" is not wildcard there
+    assert names(index.search("b_")) == {("C:/Docs", "ab_cd.md")}
+    assert names(index.search("ab")) == {("C:/Docs", "ab"), ("C:/Docs", "ab_cd.md")}
+    assert index.search("ab")[0][2] is True
+    assert index.search('"') == [] and index.search("  ") == []
+
+
+def test_unknown_mtime_keeps_stored_one(index):
+    index.put_dir("C:/Docs", None, [], [file("report.txt")])
+    assert index.dir_mtime("C:/Docs") == 2.0
+    index.put_dir("C:/Docs", 3.0, [], [file("report.txt")])
+    assert index.dir_mtime("C:\\Docs\\") == 3.0
+
+
+def test_removed_directory_drops_its_tree(index):
+    index.put_dir("C:/Docs/ab", 5.0, [], [file("deep.txt")])
+    index.put_dir_sizes([("C:/Docs/ab", 5.0, 10)])
+    index.put_dir("C:/Docs", 6.0, [], [])
+    assert index.search("deep") == []
+    assert index.dir_mtime("C:/Docs/ab") is None
+    assert index.dir_size("C:/Docs/ab", 5.0) is None
+
+
+def test_dir_sizes_follow_mtime(index):
+    index.put_dir_sizes([("C:/Docs", 2.0, 100), ("C:/Photos", 1.0, 50)])
+    assert index.dir_size("C:/Docs", 2.0) == 100
+    assert index.dir_size("C:/Docs", 3.0) is None
+    assert index.dir_size("C:/Docs", None) is None
+    assert index.child_dir_sizes("C:", {"Docs": 2.0, "Photos": 9.0}) == {"Docs": 100}
+
+
+def test_reads_from_gui_do_not_wait_for_writes(index):
+    index.put_dir_sizes([("C:/Docs/ab", 0, 5)])
+    # Crawler holds writer lock while it replaces large directory
+    with index.lock:
+        assert index.child_dir_sizes("C:/Docs", {"ab": 0}) == {"ab": 5}
+        assert names(index.search("report.pdf")) == {("C:/Docs", "report.pdf")}
@@ -0,0 +1,158 @@
+from threading import Event, Lock
+from time import sleep
+
+from PyQt6.QtCore import Qt
+
+from src.task_scheduler import TaskScheduler, HIGH_PRIORITY, LOW_PRIORITY
+from src.task_thread import TaskThread
+
+DIRECT = Qt.ConnectionType.DirectConnection
+
+
+class BlockingTask(TaskThread):
+    def __init__(self, kind: str, log: list, release: Event, running: dict, lock: Lock):
+        super().__init__(None)
+        self.kind = kind
+        self.log = log
+        self.release = release
+        self.running = running
+        self.lock = lock
+
+    def execute(self) -> None:
+        with self.lock:
+            self.running[self.kind] = self.running.get(self.kind, 0) + 1
+            self.running["max_" + self.kind] = max(self.running.get("max_" + self.kind, 0), self.running[self.kind])
+            self.log.append(self.id)
+        self.release.wait(5)
+        with self.lock:
+            self.running[self.kind] -= 1
+        self.task_complete.emit(self.id)
+
+
+class FailingTask(TaskThread):
+    def execute(self) -> None:
+        raise KeyError("out")
+
+
+def wait_for(condition, timeout: float = 5) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        sleep(0.01)
+    raise TimeoutError
+
+
+def make_tasks(count: int, kind: str, release: Event, log: list, running: dict, lock: Lock) -> list:
+    return [BlockingTask(kind, log, release, running, lock) for _ in range(count)]
+
+
+def test_kind_limit_is_kept():
+    release, log, running, lock = Event(), [], dict(), Lock()
+    scheduler = TaskScheduler(6, {"download": 2, "command": 3})
+    tasks = make_tasks(5, "download", release, log, running, lock) + make_tasks(5, "command", release, log,
+                                                                                running, lock)
+    done = []
+    for task in tasks:
+        task.task_complete.connect(done.append, DIRECT)
+        scheduler.submit(task)
+    # Worker is counted before its task starts
+    wait_for(lambda: len(log) == 5)
+    sleep(0.05)
+    assert scheduler.active_workers() == 5
+    assert running == {"download": 2, "max_download": 2, "command": 3, "max_command": 3}
+    release.set()
+    wait_for(lambda: len(done) == 10)
+    assert running["max_download"] == 2 and running["max_command"] == 3
+    scheduler.shutdown()
+
+
+def test_priority_then_fifo():
+    release, log, running, lock = Event(), [], dict(), Lock()
+    scheduler = TaskScheduler(1)
+    first, low, normal, high = make_tasks(4, "command", release, log, running, lock)
+    scheduler.submit(first)
+    wait_for(lambda: log == [first.id])
+    scheduler.submit(low, LOW_PRIORITY)
+    scheduler.submit(normal)
+    scheduler.submit(high, HIGH_PRIORITY)
+    release.set()
+    wait_for(lambda: len(log) == 4)
+    assert log == [first.id, high.id, normal.id, low.id]
+    scheduler.shutdown()
+
+
+def test_pause_and_cancel_of_queued_tasks():
+    release, log, running, lock = Event(), [], dict(), Lock()
+    scheduler = TaskScheduler(1)
+    first, paused, cancelled, last = make_tasks(4, "command", release, log, running, lock)
+    scheduler.submit(first)
+    wait_for(lambda: log == [first.id])
+    for task in (paused, cancelled, last):
+        scheduler.submit(task)
+    scheduler.pause(paused.id)
+    assert scheduler.cancel(cancelled.id)
+    assert not scheduler.cancel(first.id)
+    release.set()
+    wait_for(lambda: len(log) == 2 and scheduler.active_workers() == 0)
+    assert log == [first.id, last.id]
+    assert scheduler.queue_depth() == 1
+
+    scheduler.resume(paused.id)
+    wait_for(lambda: len(log) == 3)
+    assert log[-1] == paused.id
+    scheduler.shutdown()
+
+
+def test_pause_all_holds_queue():
+    release, log, running, lock = Event(), [], dict(), Lock()
+    release.set()
+    scheduler = TaskScheduler(2)
+    scheduler.pause_all()
+    for task in make_tasks(3, "command", release, log, running, lock):
+        scheduler.submit(task)
+    sleep(0.1)
+    assert log == [] and scheduler.queue_depth() == 3
+    scheduler.resume_all()
+    wait_for(lambda: len(log) == 3)
+    scheduler.shutdown()
+
+
+def test_error_of_task_is_reported_as_failure():
+    scheduler = TaskScheduler(1)
+    task = FailingTask(None)
+    failures = []
+    task.task_failed.connect(lambda task_id, error: failures.append((task_id, error)), DIRECT)
+    scheduler.submit(task)
+    wait_for(lambda: failures)
+    assert failures == [(task.id, "('out',)")]
+    wait_for(lambda: scheduler.active_workers() == 0)
+    scheduler.shutdown()
+
+
+def test_shutdown_cancels_queue_and_ends_workers():
+    release, log, running, lock = Event(), [], dict(), Lock()
+    scheduler = TaskScheduler(1)
+    tasks = make_tasks(3, "command", release, log, running, lock)
+    for task in tasks:
+        scheduler.submit(task)
+    wait_for(lambda: log == [tasks[0].id])
+    assert sorted(scheduler.shutdown()) == sorted(task.id for task in tasks[1:])
+    release.set()
+    wait_for(lambda: not any(worker.is_alive() for worker in scheduler.workers))
+    assert log == [tasks[0].id]
+
+
+def test_state_of_tasks():
+    release, log, running, lock = Event(), [], dict(), Lock()
+    scheduler = TaskScheduler(1)
+    first, paused, queued = make_tasks(3, "command", release, log, running, lock)
+    for task in (first, paused, queued):
+        scheduler.submit(task)
+    wait_for(lambda: log == [first.id])
+    scheduler.pause(paused.id)
+    assert [scheduler.state(task.id) for task in (first, paused, queued)] == ["running", "paused", "queued"]
+    scheduler.resume(paused.id)
+    assert scheduler.state(paused.id) == "queued"
+    release.set()
+    wait_for(lambda: len(log) == 3)
+    scheduler.shutdown()
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import zlib
+
+import pytest
+
+import src.transfer
+from src.transfer import _missing_ranges, _verified_chunks, _split_ranges, _written_ranges, _OrderedHasher
+
+
+def test_missing_ranges():
+    assert _missing_ranges([], 100) == [[0, 100]]
+    assert _missing_ranges([[0, 100, 0]], 100) == []
+    assert _missing_ranges([[60, 80, 0], [10, 30, 0]], 100) == [[0, 10], [30, 60], [80, 100]]
+    # Overlapping chunks of two attempts
+    assert _missing_ranges([[0, 50, 0], [20, 40, 0], [50, 70, 0]], 100) == [[70, 100]]
+
+
+def test_written_ranges_drop_overlaps():
+    assert _written_ranges([[50, 70, 0], [0, 50, 0], [20, 40, 0], [60, 90, 0]]) == [[0, 50], [50, 70], [70, 90]]
+
+
+def _chunk(data: bytes, start: int, end: int) -> list:
+    return [start, end, zlib.crc32(data[start:end])]
+
+
+def test_verified_chunks(tmp_path):
+    data = os.urandom(1000)
+    part = tmp_path / "file.part"
+    assert _verified_chunks(part, [_chunk(data, 0, 100)]) == []
+    part.write_bytes(data)
+    chunks = [_chunk(data, 0, 100), _chunk(data, 100, 200), _chunk(data, 500, 600), [900, 1100, 0]]
+    assert _verified_chunks(part, chunks) == chunks[:3]
+
+    # Torn last chunk of run is dropped, chunk before it stays
+    torn = bytearray(data)
+    torn[150] ^= 0xFF
+    part.write_bytes(bytes(torn))
+    assert _verified_chunks(part, chunks) == [chunks[0], chunks[2]]
+
+
+def test_split_ranges(monkeypatch):
+    monkeypatch.setattr(src.transfer, "PARALLEL_THRESHOLD", 100)
+    monkeypatch.setattr(src.transfer, "RESUMABLE_CHUNK_SIZE", 10)
+    monkeypatch.setattr(src.transfer, "PARALLEL_STREAMS", 4)
+    assert _split_ranges([[0, 50]], 50) == [[0, 50]]
+    pieces = _split_ranges([[0, 400]], 400)
+    assert pieces == [[0, 100], [100, 200], [200, 300], [300, 400]]
+    # Pieces are not smaller than chunk
+    assert _split_ranges([[0, 15], [200, 220]], 400) == [[0, 10], [10, 15], [200, 210], [210, 220]]
+
+
+def test_ordered_hasher_out_of_order(tmp_path):
+    data = os.urandom(10000)
+    part = tmp_path / "file.part"
+    part.write_bytes(data)
+    hasher = _OrderedHasher(part)
+    # Range of previous attempt, then ranges of current one in any order
+    hasher.written(0, 2000)
+    for start, end in [(6000, 10000), (2000, 4000), (4000, 6000)]:
+        hasher.feed(start, data[start:end])
+    assert hasher.hexdigest(len(data)) == hashlib.sha256(data).hexdigest()
+
+
+def test_ordered_hasher_gap(tmp_path):
+    data = os.urandom(100)
+    part = tmp_path / "file.part"
+    part.write_bytes(data)
+    hasher = _OrderedHasher(part)
+    hasher.feed(0, data[:40])
+    hasher.feed(60, data[60:])
+    with pytest.raises(IOError):
+        hasher.hexdigest(len(data))